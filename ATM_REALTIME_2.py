@@ -4,15 +4,11 @@
 
 import sys
 import asyncio
-import json
-import ssl
 import threading
 import queue
 import os
 from datetime import datetime, timezone
 
-import requests
-import websockets
 import numpy as np
 
 from dotenv import load_dotenv
@@ -47,89 +43,52 @@ data_queue = queue.Queue()
 # ==========================================
 # UPSTOX HELPERS
 # ==========================================
-def get_market_data_feed_authorize_v3():
-    headers = {
-        "Accept": "application/json",
-        "Authorization": f"Bearer {ACCESS_TOKEN}"
-    }
-    url = "https://api.upstox.com/v3/feed/market-data-feed/authorize"
-    return requests.get(url, headers=headers, timeout=10).json()
-
-
 def decode_protobuf(buffer):
     feed_response = pb.FeedResponse()
     feed_response.ParseFromString(buffer)
     return feed_response
 
 
+def on_message(msg, recv=None):
+    decoded = decode_protobuf(msg)
+    data = MessageToDict(decoded)
+
+    if "feeds" not in data:
+        return
+
+    ts = float(datetime.now(timezone.utc).timestamp())
+
+    for ins, feed in data["feeds"].items():
+        flwg = feed.get("firstLevelWithGreeks", {})
+
+        if ins == EQ_KEY:
+            try:
+                price = float((feed.get("ltpc") or flwg["ltpc"])["ltp"])
+                data_queue.put((ts, "EQ", price))
+            except Exception:
+                pass
+
+        elif ins == FO_1:
+            oi = flwg.get("oi")
+            if oi is not None:
+                data_queue.put((ts, "FO1", float(oi)))
+
+        elif ins == FO_2:
+            oi = flwg.get("oi")
+            if oi is not None:
+                data_queue.put((ts, "FO2", float(oi)))
+
+
 # ==========================================
-# ASYNC WEBSOCKET (WITH KEEPALIVE + RECONNECT)
+# ASYNC WEBSOCKET (SESSION: KEEPALIVE + FAST RECONNECT)
 # ==========================================
 async def fetch_market_data():
-    ssl_context = ssl.create_default_context()
-    ssl_context.check_hostname = False
-    ssl_context.verify_mode = ssl.CERT_NONE
-
-    while True:  # 🔁 reconnect loop
-        try:
-            auth = get_market_data_feed_authorize_v3()
-            ws_url = auth["data"]["authorized_redirect_uri"]
-
-            async with websockets.connect(
-                ws_url,
-                ssl=ssl_context,
-                ping_interval=20,
-                ping_timeout=20,
-                close_timeout=10
-            ) as websocket:
-
-                print("✅ WebSocket connected")
-
-                sub_payload = {
-                    "guid": "live-dashboard",
-                    "method": "sub",
-                    "data": {
-                        "mode": "option_greeks",
-                        "instrumentKeys": [EQ_KEY, FO_1, FO_2]
-                    }
-                }
-
-                await websocket.send(json.dumps(sub_payload).encode())
-
-                while True:
-                    msg = await websocket.recv()
-                    decoded = decode_protobuf(msg)
-                    data = MessageToDict(decoded)
-
-                    if "feeds" not in data:
-                        continue
-
-                    ts = float(datetime.now(timezone.utc).timestamp())
-
-                    for ins, feed in data["feeds"].items():
-                        flwg = feed.get("firstLevelWithGreeks", {})
-
-                        if ins == EQ_KEY:
-                            try:
-                                price = float(flwg["ltpc"]["ltp"])
-                                data_queue.put((ts, "EQ", price))
-                            except Exception:
-                                pass
-
-                        elif ins == FO_1:
-                            oi = flwg.get("oi")
-                            if oi is not None:
-                                data_queue.put((ts, "FO1", float(oi)))
-
-                        elif ins == FO_2:
-                            oi = flwg.get("oi")
-                            if oi is not None:
-                                data_queue.put((ts, "FO2", float(oi)))
-
-        except Exception as e:
-            print(f"⚠ WebSocket error: {e}")
-            print("🔁 Reconnecting in 5 seconds...")
-            await asyncio.sleep(5)
+    from session import UpstoxSession
+
+    # the underlying only needs its LTP; the options carry OI
+    session = UpstoxSession({EQ_KEY: "ltpc", FO_1: "option_greeks", FO_2: "option_greeks"}, on_message=on_message,
+                            token=ACCESS_TOKEN, guid="live-dashboard")
+    await session.run()
 
 
 def start_ws():
@@ -138,6 +97,25 @@ def start_ws():
     loop.run_until_complete(fetch_market_data())
 
 
+# ==========================================
+# OR: READ TICKS FROM ingest.py's SHARED-MEMORY BUS
+# ==========================================
+def start_tick_bus():
+    from tick_bus import TickBusReader, follow
+
+    reader = TickBusReader()
+    series = {EQ_KEY: "EQ", FO_1: "FO1", FO_2: "FO2"}
+    print("✅ Attached to tick bus")
+
+    for batch in follow(reader, interval=0.01):
+        for rec in batch:
+            typ = series.get(reader.key(int(rec["iid"])))
+            if typ == "EQ":
+                data_queue.put((float(rec["ts"]), typ, float(rec["ltp"])))
+            elif typ:
+                data_queue.put((float(rec["ts"]), typ, float(rec["oi"])))
+
+
 # ==========================================
 # PYQTGRAPH DASHBOARD
 # ==========================================
@@ -229,7 +207,9 @@ class LiveDashboard(QMainWindow):
 # MAIN
 # ==========================================
 if __name__ == "__main__":
-    ws_thread = threading.Thread(target=start_ws, daemon=True)
+    # TICK_BUS=1 → share ingest.py's feed instead of opening a second websocket
+    feed_source = start_tick_bus if os.getenv("TICK_BUS") == "1" else start_ws
+    ws_thread = threading.Thread(target=feed_source, daemon=True)
     ws_thread.start()
 
     app = QApplication(sys.argv)
@@ -1,6 +1,4 @@
 import asyncio
-import aiohttp
-import async_timeout
 import pandas as pd
 import numpy as np
 import time
@@ -21,7 +19,8 @@ HEADERS = {
 
 
 
-API_URL = "https://api.upstox.com/v3/market-quote/ltp?instrument_key="
+BASE_URL = os.getenv("UPSTOX_BASE_URL", "https://api.upstox.com").rstrip("/")
+API_URL = f"{BASE_URL}/v3/market-quote/ltp?instrument_key="
 CSV_PATH = "companies_only.csv"
 
 # ===============================
@@ -55,6 +54,8 @@ async def rate_limit():
 # ASYNC LTP FETCH (DETERMINISTIC)
 # ===============================
 async def fetch_ltp(session, instrument_key):
+    import async_timeout
+
     url = API_URL + instrument_key
 
     for attempt in range(RETRY_LIMIT):
@@ -80,6 +81,8 @@ async def fetch_ltp(session, instrument_key):
     return instrument_key, None
 
 async def fetch_all_ltps(keys):
+    import aiohttp  # only the fetch needs it; build_atm_table imports without it
+
     async with aiohttp.ClientSession() as session:
         tasks = [fetch_ltp(session, k) for k in keys]
         results = await asyncio.gather(*tasks)
@@ -15,7 +15,8 @@ HEADERS = {
 }
 
 UNDERLYING_KEYS_FILE = "underlying_keys.txt"
-API_URL = "https://api.upstox.com/v3/market-quote/ltp?instrument_key="
+BASE_URL = os.getenv("UPSTOX_BASE_URL", "https://api.upstox.com").rstrip("/")
+API_URL = f"{BASE_URL}/v3/market-quote/ltp?instrument_key="
 
 MAX_CONCURRENT_REQUESTS = 40
 RETRY_LIMIT = 5
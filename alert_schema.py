@@ -0,0 +1,67 @@
+import json
+import time
+
+import msgpack
+
+# =========================================================
+# ALERT WIRE FORMAT (RabbitMQ 'insider_alerts')
+# =========================================================
+# One AMQP message carries a batch of alerts as msgpack:
+#
+#   [version, [row, row, ...]]      row = values in FIELDS[version] order
+#
+# Timestamps are epoch nanoseconds, categories are small ints, and rows are
+# positional, so a batch is a fraction of the JSON size and decodes in one
+# msgpack.unpackb call. Add fields by appending to a new version's tuple;
+# decoders keep every version they know.
+SCHEMA_VERSION = 2
+CONTENT_TYPE = "application/x-msgpack"
+MESSAGE_TYPE = f"alerts.v{SCHEMA_VERSION}"
+MAX_BATCH = 256
+
+FIELDS = {
+    1: ("ts_ns", "iid", "instrument_key", "ticker", "strike", "option_type", "category",
+        "value", "price_move", "oi", "ltp"),
+}
+# v2: coalescer.AlertCoalescer episode fields (None for uncoalesced alerts)
+FIELDS[2] = FIELDS[1] + ("alert_id", "seq", "status", "count", "first_ts_ns")
+CATEGORIES = ("AGGRESSIVE_BUYING", "BULK_SELLING", "STAGNANT_ABSORPTION",
+              "AGGRESSOR_BUYING", "AGGRESSOR_SELLING")     # append only: codes are positions
+CATEGORY_CODES = {c: i for i, c in enumerate(CATEGORIES)}
+
+
+def to_row(alert, fields=FIELDS[SCHEMA_VERSION]):
+    row = [alert.get(f) for f in fields]
+    if row[0] is None:
+        row[0] = time.time_ns()
+    cat = fields.index("category")
+    row[cat] = CATEGORY_CODES.get(row[cat], row[cat])     # unknown categories travel as strings
+    return row
+
+
+def encode_batch(alerts):
+    return msgpack.packb([SCHEMA_VERSION, [to_row(a) for a in alerts]], use_bin_type=True)
+
+
+def decode_rows(body, content_type=CONTENT_TYPE):
+    """(field names, rows) of one message, categories decoded; for columnar consumers."""
+    if content_type != CONTENT_TYPE:
+        legacy = json.loads(body)       # pre-schema producers: one JSON alert per message
+        return tuple(legacy), [tuple(legacy.values())]
+    version, rows = msgpack.unpackb(body, raw=False)
+    fields = FIELDS[version]
+    cat = fields.index("category")
+    for row in rows:
+        if isinstance(row[cat], int):
+            row[cat] = CATEGORIES[row[cat]]
+    return fields, rows
+
+
+def decode_batch(body, content_type=CONTENT_TYPE):
+    """Every alert in one message as dicts, with the display ``timestamp`` (HH:MM:SS) added."""
+    fields, rows = decode_rows(body, content_type)
+    alerts = [dict(zip(fields, row)) for row in rows]
+    for a in alerts:
+        if "timestamp" not in a and a.get("ts_ns"):
+            a["timestamp"] = time.strftime("%H:%M:%S", time.localtime(a["ts_ns"] / 1e9))
+    return alerts
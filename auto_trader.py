@@ -0,0 +1,115 @@
+import asyncio
+import time
+
+from metrics import Histogram
+from paper_engine import BUY, MARKET, OPEN, SELL, SL_M, TRIGGER_PENDING
+
+# =========================================================
+# ALERT → PAPER ORDER RULES
+# =========================================================
+class Rule:
+    """Turn one alert category into an entry order plus a protective stop.
+
+    ``side`` is the entry side on the flagged option itself; the stop is an
+    SL-M on the opposite side ``stop_pct`` away from the fill.
+    """
+
+    def __init__(self, category, side=BUY, option_types=("CE", "PE"), lots=1, stop_pct=0.10):
+        self.category = category
+        self.side = side
+        self.option_types = option_types
+        self.lots = lots
+        self.stop_pct = stop_pct
+
+    def matches(self, alert):
+        return alert.get("category") == self.category and alert.get("option_type") in self.option_types
+
+
+DEFAULT_RULES = [
+    Rule("AGGRESSIVE_BUYING", BUY, option_types=("CE",), lots=1, stop_pct=0.10),
+]
+
+# Stage pairs reported by AutoTrader.report(); stamps are perf_counter() seconds.
+STAGES = (("recv", "detect"), ("detect", "order"), ("order", "fill"), ("recv", "order"), ("recv", "fill"))
+
+
+class AutoTrader:
+    """Alert sink that places paper orders and tracks the latency budget.
+
+    Each order carries the alert's stamps (frame receipt, detection) plus its
+    own order/fill stamps, so we can see how much of the move the Python
+    pipeline eats before we are in.
+    """
+
+    def __init__(self, engine, rules=None, lot_sizes=None, one_position_per_key=True):
+        self.engine = engine
+        self.rules = DEFAULT_RULES if rules is None else rules
+        self.lot_sizes = engine.lot_sizes if lot_sizes is None else lot_sizes
+        self.one_position_per_key = one_position_per_key
+        self.entries = {}       # key -> last entry order; a resting one still counts as the position
+        self.latency = {f"{a}→{b}": Histogram(f"{a}_{b}") for a, b in STAGES}
+        engine.on_fill.append(self._on_fill)
+
+    def __call__(self, alert):
+        key = alert.get("instrument_key")
+        if not key:
+            return
+        for rule in self.rules:
+            if rule.matches(alert):
+                self._enter(rule, key, alert)
+                break
+
+    def _enter(self, rule, key, alert):
+        engine = self.engine
+        if self.one_position_per_key:
+            iid = engine.pipeline.registry.id_of(key)
+            if iid is not None and iid < len(engine.net_qty) and engine.net_qty[iid] != 0:
+                return
+            entry = self.entries.get(key)
+            if entry is not None and entry.status in (OPEN, TRIGGER_PENDING):
+                return
+        lot = self.lot_sizes.get(key)
+        if lot is None:
+            return
+
+        stamps = dict(alert.get("stamps") or {})
+        stamps["order"] = time.perf_counter()
+        # A marketable order can fill (and call _on_fill) inside place_order.
+        tag = {"stamps": stamps, "alert": alert, "stop_pct": rule.stop_pct}
+        self.entries[key] = engine.place_order(key, rule.side, lot * rule.lots, MARKET, tag=tag)
+        self._record(stamps, "detect")
+        self._record(stamps, "order")
+
+    def _on_fill(self, order):
+        tag = order.tag
+        if not tag or "stamps" not in tag:
+            return
+        stamps = tag["stamps"]
+        stamps["fill"] = time.perf_counter()
+        self._record(stamps, "fill")
+
+        stop_pct = tag.get("stop_pct")
+        if stop_pct:
+            side = SELL if order.side == BUY else BUY
+            trigger = round(order.fill_price * (1 - stop_pct * order.side), 2)
+            self.engine.place_order(order.key, side, order.qty, SL_M, trigger=trigger, tag={"stop_for": order.oid})
+
+    def _record(self, stamps, upto):
+        for a, b in STAGES:
+            if b == upto and a in stamps:
+                self.latency[f"{a}→{b}"].record(stamps[b] - stamps[a])
+
+    def report(self):
+        lines = ["⏱️ alert→order latency (p50 / p99 / max, n)"]
+        for name, h in self.latency.items():
+            if h.count:
+                lines.append(f"   {name:<14} {h.percentile(50) * 1e3:9.3f} ms {h.percentile(99) * 1e3:9.3f} ms "
+                             f"{h.max * 1e3:9.3f} ms  n={h.count}")
+        return "\n".join(lines)
+
+
+async def report_loop(trader, interval=60):
+    while True:
+        await asyncio.sleep(interval)
+        if any(h.count for h in trader.latency.values()):
+            print(trader.report(), flush=True)
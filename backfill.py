@@ -0,0 +1,96 @@
+import asyncio
+import os
+import threading
+import time
+from datetime import datetime
+from urllib.parse import quote
+
+import requests
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# =========================================================
+# CONFIG
+# =========================================================
+# Same endpoint as GETTING_INTRADAY_HISTORICAL_VALUES.py, intraday flavour:
+# today's 1-minute candles, newest first, [ts, open, high, low, close, volume, oi].
+BASE_URL = os.getenv("UPSTOX_BASE_URL", "https://api.upstox.com").rstrip("/")
+INTRADAY_URL = BASE_URL + "/v3/historical-candle/intraday/{key}/minutes/1"
+CONCURRENCY = 8          # requests in flight
+RATE_LIMIT = 20.0        # requests/s, under Upstox's ~25/s per token
+BURST = 5
+
+
+def parse_candle(row):
+    """Upstox candle row → (start_ms, o, h, l, c, volume, oi)."""
+    start = int(datetime.fromisoformat(row[0]).timestamp() * 1000)
+    oi = float(row[6]) if len(row) > 6 else 0.0
+    return (start, float(row[1]), float(row[2]), float(row[3]), float(row[4]), int(row[5]), oi)
+
+
+class TokenBucket:
+    """``rate`` tokens per second, up to ``burst`` saved; ``take`` waits for one (one event loop)."""
+
+    def __init__(self, rate=RATE_LIMIT, burst=BURST):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.stamp = time.monotonic()
+
+    async def take(self):
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+            self.stamp = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class Backfiller:
+    """Fetches the 1-minute candles that fall inside a feed gap, many instruments at once.
+
+    Requests run in worker threads, each on its own pooled requests.Session,
+    at most ``concurrency`` in flight and started no faster than ``rate``
+    per second; an instrument that fails is logged and returned with no
+    candles rather than failing the whole fill.
+    """
+
+    def __init__(self, token=None, concurrency=CONCURRENCY, url=INTRADAY_URL, rate=RATE_LIMIT, burst=BURST):
+        self.url = url
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.bucket = TokenBucket(rate, burst)
+        self.headers = {"Accept": "application/json", "Authorization": f"Bearer {token or os.getenv('token')}"}
+        self.local = threading.local()
+
+    @property
+    def http(self):
+        """This worker thread's session (requests.Session is not meant to be shared across threads)."""
+        http = getattr(self.local, "http", None)
+        if http is None:
+            http = self.local.http = requests.Session()
+            http.headers.update(self.headers)
+        return http
+
+    def candles(self, key, start, end):
+        """Candles of ``key`` whose minute overlaps [start, end) (epoch seconds), oldest first."""
+        r = self.http.get(self.url.format(key=quote(key, safe="")), timeout=10)
+        r.raise_for_status()
+        rows = [parse_candle(c) for c in r.json()["data"]["candles"]]
+        lo, hi = (int(start) // 60) * 60_000, end * 1000
+        return sorted(c for c in rows if lo <= c[0] < hi)
+
+    async def _one(self, key, start, end):
+        async with self.semaphore:
+            await self.bucket.take()
+            try:
+                return key, await asyncio.to_thread(self.candles, key, start, end)
+            except Exception as e:
+                print(f"⚠️ back-fill {key} failed: {e}", flush=True)
+                return key, []
+
+    async def fill(self, keys, start, end):
+        """{key: candles} for every key, fetched concurrently."""
+        return dict(await asyncio.gather(*(self._one(k, start, end) for k in keys)))
@@ -0,0 +1,239 @@
+import argparse
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from recorder import FLAG_GAP, list_days, load_day
+
+# =========================================================
+# DEFAULT GRID (live detector values are in the middle)
+# =========================================================
+WINDOWS = (2.0, 3.0, 5.0)
+CHECK_INTERVALS = (0.0,)   # 0 = evaluated on every trade, as the event-driven detector does
+THRESHOLDS = (50_000, 100_000, 200_000, 500_000)
+MIN_PRICE_MOVES = (0.0,)
+ABSORPTION_MOVES = (0.0, 0.05, 0.10)
+HORIZONS = (30, 60, 300)
+
+CATEGORIES = ("AGGRESSIVE_BUYING", "BULK_SELLING", "STAGNANT_ABSORPTION")
+
+
+# =========================================================
+# DAY → COLUMNAR TRADES
+# =========================================================
+class DayData:
+    """One recorded day, sorted by (instrument, time), with the trade prints
+    EnergySurgeDetector.on_tick would have appended.
+
+    ``*key`` arrays are ``iid * SPAN + seconds since t0`` so one
+    searchsorted finds a time inside one instrument's slice.
+
+    The derived columns are saved to ``<day>/prepared/`` on first use and
+    memory-mapped from there afterwards, so sweep workers share the page
+    cache instead of each re-sorting the raw day.
+    """
+
+    SPAN = 1e6
+    PREPARED = ("tick_iid", "tick_ltp", "tick_key", "iid", "t", "price", "value", "key", "cum_value")
+
+    def __init__(self, path, mmap=True, use_prepared=True):
+        self.path = path
+        prepared = os.path.join(path, "prepared")
+        if use_prepared and self._prepared_is_fresh(prepared):
+            self._load_prepared(prepared)
+            return
+        self._build(path, mmap)
+        if use_prepared:
+            self._save_prepared(prepared)
+
+    def _prepared_is_fresh(self, prepared):
+        meta = os.path.join(prepared, "t0.npy")
+        raw = os.path.join(self.path, "ts.f8")
+        return os.path.exists(meta) and os.path.exists(raw) and os.path.getmtime(meta) >= os.path.getmtime(raw)
+
+    def _load_prepared(self, prepared):
+        for name in self.PREPARED:
+            setattr(self, name, np.load(os.path.join(prepared, f"{name}.npy"), mmap_mode="r"))
+        self.t0 = float(np.load(os.path.join(prepared, "t0.npy")))
+        with open(os.path.join(self.path, "keys.txt")) as f:
+            self.keys = f.read().splitlines()
+
+    def _save_prepared(self, prepared):
+        os.makedirs(prepared, exist_ok=True)
+        for name in self.PREPARED:
+            np.save(os.path.join(prepared, f"{name}.npy"), getattr(self, name))
+        np.save(os.path.join(prepared, "t0.npy"), np.float64(self.t0))
+
+    def _build(self, path, mmap):
+        cols, self.keys = load_day(path, mmap=mmap)
+        order = np.lexsort((cols["ts"], cols["iid"]))
+        iid = np.asarray(cols["iid"])[order].astype(np.int64)
+        ts = np.asarray(cols["ts"])[order]
+        ltt = np.asarray(cols["ltt"])[order]
+        vtt = np.asarray(cols["vtt"])[order]
+        ltp = np.asarray(cols["ltp"])[order]
+        ltq = np.asarray(cols["ltq"])[order]
+        gap = (np.asarray(cols["flags"])[order] & FLAG_GAP) != 0
+        self.t0 = float(ts.min()) if len(ts) else 0.0
+
+        # Previous tick of the same instrument (0 at each instrument's first tick).
+        same = np.zeros(len(iid), dtype=bool)
+        same[1:] = iid[1:] == iid[:-1]
+        prev_vtt = np.where(same, np.roll(vtt, 1), 0)
+        prev_ltt = np.where(same, np.roll(ltt, 1), 0)
+        progress = (ltt > prev_ltt) | (vtt > prev_vtt)
+        new_qty = np.where(prev_vtt > 0, vtt - prev_vtt, ltq)
+        # A gap tick (first after a reconnect / stall) only re-baselines, as live
+        # (Pipeline.mark_stale → Tick.gap): its vtt jump spans the whole gap.
+        is_trade = progress & (new_qty > 0) & ~gap
+
+        self.tick_iid, self.tick_ltp = iid, ltp
+        self.tick_key = iid * self.SPAN + (ts - self.t0)
+
+        self.iid = iid[is_trade]
+        self.t = ts[is_trade] - self.t0
+        self.price = ltp[is_trade]
+        self.value = ltp[is_trade] * new_qty[is_trade]
+        self.key = self.iid * self.SPAN + self.t
+        self.cum_value = np.concatenate(([0.0], np.cumsum(self.value)))
+
+    def window_sums(self, window, check_interval):
+        """Value and price move in the window at every check that follows a trade.
+
+        The monitor wakes every ``check_interval``; between trades a window
+        sum only shrinks, so the checks right after trades are the only ones
+        that can fire. ``check_interval`` 0 checks at every trade time.
+        """
+        check = np.ceil(self.t / check_interval) * check_interval if check_interval > 0 else self.t
+        last_in_run = np.ones(len(check), dtype=bool)
+        last_in_run[:-1] = (self.iid[1:] != self.iid[:-1]) | (check[1:] != check[:-1])
+        hi = np.flatnonzero(last_in_run) + 1
+        iid, check = self.iid[hi - 1], check[hi - 1]
+        lo = np.searchsorted(self.key, iid * self.SPAN + (check - window), side="left")
+        value = self.cum_value[hi] - self.cum_value[lo]
+        change = self.price[hi - 1] - self.price[lo]
+        return iid, check, lo, hi, value, change
+
+    def price_at(self, iid, t):
+        """Last traded price of ``iid`` at or before ``t`` (seconds since t0)."""
+        idx = np.searchsorted(self.tick_key, iid * self.SPAN + t, side="right") - 1
+        idx = np.clip(idx, 0, len(self.tick_key) - 1)
+        return np.where(self.tick_iid[idx] == iid, self.tick_ltp[idx], np.nan)
+
+
+# =========================================================
+# RULE EVALUATION FOR A GRID
+# =========================================================
+def fire(iid, lo, hi, value, cum_value, threshold, price=None, min_move=0.0):
+    """Apply gemini5's 'clear history after an alert' rule for one threshold.
+
+    Only checks whose unrestricted sum clears the threshold can fire, so the
+    sequential pass runs over those candidates, not over every check.
+    ``min_move`` is gemini2's MIN_PRICE_MOVE: the window's price move must
+    also reach it (in either direction) for the check to fire.
+    """
+    cand = np.flatnonzero(value >= threshold)
+    fired = []
+    last_iid, cleared_to = -1, 0
+    for i in cand:
+        if iid[i] != last_iid:
+            last_iid, cleared_to = iid[i], 0
+        start = max(lo[i], cleared_to)
+        if cum_value[hi[i]] - cum_value[start] < threshold:
+            continue
+        if min_move and abs(price[hi[i] - 1] - price[start]) < min_move:
+            continue
+        fired.append((i, start))
+        cleared_to = hi[i]
+    if not fired:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    idx, start = np.array(fired).T
+    return idx, start
+
+
+def evaluate(day, window, check_interval, thresholds=THRESHOLDS, absorptions=ABSORPTION_MOVES,
+             horizons=HORIZONS, sums=None, min_moves=MIN_PRICE_MOVES):
+    iid, check, lo, hi, value, _ = sums if sums is not None else day.window_sums(window, check_interval)
+    rows = []
+    for threshold, min_move in itertools.product(thresholds, min_moves):
+        idx, start = fire(iid, lo, hi, value, day.cum_value, threshold, day.price, min_move)
+        a_iid, a_t = iid[idx], check[idx]
+        entry = day.price[hi[idx] - 1]
+        change = entry - day.price[start]
+        fwd = {h: day.price_at(a_iid, a_t + h) / entry - 1.0 for h in horizons}
+
+        for absorption in absorptions:
+            direction = np.where(change > 0, 1.0, -1.0)
+            direction[np.abs(change) < absorption] = 0.0
+            row = {"day": day.path, "window": window, "check_interval": check_interval,
+                   "min_value": threshold, "min_move": min_move, "absorption": absorption,
+                   "alerts": int(len(idx)),
+                   "buying": int((direction > 0).sum()), "selling": int((direction < 0).sum()),
+                   "absorption_alerts": int((direction == 0).sum())}
+            directional = direction != 0
+            for h, ret in fwd.items():
+                signed = (ret * direction)[directional & ~np.isnan(ret)]
+                row[f"edge_{h}s"] = float(signed.mean()) if len(signed) else float("nan")
+                row[f"hit_{h}s"] = float((signed > 0).mean()) if len(signed) else float("nan")
+            rows.append(row)
+    return rows
+
+
+def _grid_job(args):
+    path, window, check_interval, thresholds, absorptions, horizons, min_moves = args
+    return evaluate(DayData(path), window, check_interval, thresholds, absorptions, horizons, min_moves=min_moves)
+
+
+def run_grid(path, windows=WINDOWS, check_intervals=CHECK_INTERVALS, thresholds=THRESHOLDS,
+             absorptions=ABSORPTION_MOVES, horizons=HORIZONS, workers=0, min_moves=MIN_PRICE_MOVES):
+    """Every (window, check_interval) pair is one job; thresholds, price-move
+    floors and absorption cut-offs are evaluated inside it off the same
+    window sums. Multi-day / resumable sweeps live in sweep.py."""
+    pairs = list(itertools.product(windows, check_intervals))
+    if workers and len(pairs) > 1:
+        DayData(path)       # build <day>/prepared once before the workers map it
+        jobs = [(path, w, ci, thresholds, absorptions, horizons, min_moves) for w, ci in pairs]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            return [row for rows in pool.map(_grid_job, jobs) for row in rows]
+    day = DayData(path)
+    return [row for w, ci in pairs
+            for row in evaluate(day, w, ci, thresholds, absorptions, horizons, min_moves=min_moves)]
+
+
+def print_rows(rows, horizons=HORIZONS):
+    h = horizons[min(1, len(horizons) - 1)]
+    print(f"{'window':>6} {'check':>5} {'min_value':>10} {'move':>5} {'absorb':>6} {'alerts':>7} {'buy':>5} "
+          f"{'sell':>5} {'stag':>5} {f'edge_{h}s':>10} {f'hit_{h}s':>8}")
+    for r in rows:
+        print(f"{r['window']:>6} {r['check_interval']:>5} {r['min_value']:>10,.0f} {r.get('min_move', 0.0):>5} "
+              f"{r['absorption']:>6} "
+              f"{r['alerts']:>7} {r['buying']:>5} {r['selling']:>5} {r['absorption_alerts']:>5} "
+              f"{r[f'edge_{h}s'] * 1e4:>8.1f}bp {r[f'hit_{h}s']:>8.1%}")
+
+
+def _floats(text):
+    return tuple(float(x) for x in text.split(","))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay recorded ticks through the energy-surge rule")
+    parser.add_argument("day", nargs="?", help="ticks/YYYY-MM-DD (default: latest recorded day)")
+    parser.add_argument("--windows", type=_floats, default=WINDOWS)
+    parser.add_argument("--check-intervals", type=_floats, default=CHECK_INTERVALS)
+    parser.add_argument("--thresholds", type=_floats, default=THRESHOLDS)
+    parser.add_argument("--min-moves", type=_floats, default=MIN_PRICE_MOVES)
+    parser.add_argument("--absorptions", type=_floats, default=ABSORPTION_MOVES)
+    parser.add_argument("--workers", type=int, default=0, help="process pool size (0 = in-process)")
+    args = parser.parse_args()
+
+    day = args.day or (list_days() or [None])[-1]
+    if day is None:
+        raise SystemExit("no recorded days under ticks/ (enable ENABLE_RECORDER in ingest.py)")
+    t0 = time.perf_counter()
+    rows = run_grid(day, args.windows, args.check_intervals, args.thresholds, args.absorptions,
+                    workers=args.workers, min_moves=args.min_moves)
+    print_rows(rows)
+    print(f"\n⏱️ {len(rows)} settings on {day} in {time.perf_counter() - t0:.2f}s")
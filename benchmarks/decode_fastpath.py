@@ -0,0 +1,75 @@
+"""Full decode vs fingerprint fast path on option_greeks frames.
+
+    python benchmarks/decode_fastpath.py [frames] [instruments] [change_prob]
+
+Most option_greeks frames repeat instruments whose ltt/vtt/oi did not move;
+this reports how many feeds the fast path drops and the time that saves.
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import MarketDataFeedV3_pb2 as pb  # noqa: E402
+from instruments import InstrumentRegistry  # noqa: E402
+from pipeline import FIELD_DEPTH, FIELD_GREEKS, FIELD_UNCHANGED, Decoder  # noqa: E402
+
+ALL_FIELDS = (FIELD_GREEKS, FIELD_DEPTH, FIELD_UNCHANGED)
+
+
+def make_frames(n_frames=2000, n_instruments=200, feeds_per_frame=40, change_prob=0.3, seed=7):
+    rng = random.Random(seed)
+    keys = [f"NSE_FO|{100000 + i}" for i in range(n_instruments)]
+    state = {k: [rng.uniform(5, 300), 1_700_000_000_000, 0, rng.randint(1000, 50000) * 50.0] for k in keys}
+    frames = []
+    for f in range(n_frames):
+        msg = pb.FeedResponse(type=pb.live_feed, currentTs=1_700_000_000_000 + f * 50)
+        for key in rng.sample(keys, feeds_per_frame):
+            st = state[key]
+            if rng.random() < change_prob:
+                st[0] = max(0.05, st[0] + rng.choice((-0.05, 0.05, 0.1)))
+                st[1] += rng.randint(1, 500)
+                st[2] += rng.randint(1, 20) * 50
+                st[3] += rng.choice((-50, 0, 50))
+            flwg = msg.feeds[key].firstLevelWithGreeks
+            flwg.ltpc.ltp, flwg.ltpc.ltt, flwg.ltpc.ltq, flwg.ltpc.cp = st[0], st[1], 50, st[0] * 0.98
+            flwg.vtt, flwg.oi, flwg.iv = st[2], st[3], rng.uniform(0.1, 0.4)
+            g = flwg.optionGreeks
+            g.delta, g.theta, g.gamma, g.vega = rng.random(), -rng.random(), rng.random() / 100, rng.random()
+            flwg.firstDepth.bidP, flwg.firstDepth.askP = st[0] - 0.05, st[0] + 0.05
+            flwg.firstDepth.bidQ, flwg.firstDepth.askQ = 500, 700
+        frames.append(msg.SerializeToString())
+    return frames
+
+
+def run(label, decode, frames):
+    t0 = time.perf_counter()
+    ticks = 0
+    for buf in frames:
+        ticks += len(decode(buf, 1.0)[1])
+    elapsed = time.perf_counter() - t0
+    print(f"{label:<28} {elapsed * 1e6 / len(frames):8.1f} us/frame  {ticks:>8} ticks out")
+    return elapsed
+
+
+def main():
+    n_frames = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    n_instruments = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    change_prob = float(sys.argv[3]) if len(sys.argv) > 3 else 0.3
+    frames = make_frames(n_frames, n_instruments, change_prob=change_prob)
+    print(f"{n_frames} frames x 40 feeds, {n_instruments} instruments, change_prob={change_prob}\n")
+
+    full = run("full decode", Decoder(InstrumentRegistry(), ALL_FIELDS).decode, frames)
+    greeks = Decoder(InstrumentRegistry(), (FIELD_GREEKS,))
+    run("fast path + greeks", greeks.decode, frames)
+    fast = Decoder(InstrumentRegistry())
+    fast_t = run("fast path (ltpc/vtt/oi only)", fast.decode, frames)
+
+    print(f"\nhit rate : {fast.hit_rate:.1%} of feeds skipped as unchanged")
+    print(f"saved    : {(full - fast_t) * 1e6 / n_frames:.1f} us/frame ({1 - fast_t / full:.1%})")
+
+
+if __name__ == "__main__":
+    main()
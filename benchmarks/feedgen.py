@@ -0,0 +1,272 @@
+"""Synthetic Upstox v3 feed: realistic instrument counts, tick rates and OI/vtt dynamics.
+
+    market = Market()                        # 200 underlyings x 21 strikes x CE/PE + spot
+    frames = market.frames(seconds=10)      # [(t, FeedResponse bytes)], initial_feed first
+
+Any mode the websocket serves can be produced per key (``fill``), and keys
+outside the generated universe are added on first use, which is how
+mock_upstox.py serves real instrument keys.
+
+Underlyings get Zipf-like liquidity, and an option's trade rate decays
+with its distance from the ATM strike, so a few names and near-money
+strikes carry most of the ticks, as on the exchange. Spot is a random walk
+in 0.05 steps (ltpc feeds). Options are priced off it and arrive as
+option_greeks feeds: vtt grows in whole lots with occasional block
+trades, OI drifts up or down with the trades, and iv/greeks/first depth
+follow the price.
+
+    python benchmarks/feedgen.py            # prints the shape of one generated minute
+"""
+import math
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import MarketDataFeedV3_pb2 as pb  # noqa: E402
+
+# =========================================================
+# CONFIG
+# =========================================================
+N_UNDERLYINGS = 200          # NSE stock F&O universe
+N_STRIKES = 21               # strikes listed around spot per underlying
+TICKS_PER_SECOND = 2000      # feeds across the whole universe (option_greeks + ltpc)
+FRAME_MS = 50                # one FeedResponse per interval
+SPOT_SHARE = 0.15            # share of feeds that are spot ltpc updates
+ATM_DECAY = 2.5              # strikes away from ATM per e-fold drop in trade rate
+LOT_NOTIONAL = 750_000      # ₹ of underlying per lot (NSE sizes lots to roughly this)
+BLOCK_PROB = 0.002           # chance a trade is a block of 20-100 lots
+BASE_TS = 1_700_000_000_000  # ms
+
+LTPC, OPTION_GREEKS, FULL, FULL_D30 = "ltpc", "option_greeks", "full", "full_d30"    # subscription modes
+
+
+def _tick(price):
+    return max(0.05, round(round(price / 0.05) * 0.05, 2))
+
+
+def _nice(x):
+    """Strike step: x rounded down to 1, 2, 2.5 or 5 x 10^k."""
+    scale = 10 ** math.floor(math.log10(x))
+    return max(m for m in (1, 2, 2.5, 5) if m * scale <= x) * scale
+
+
+class Market:
+    """Spot + CE/PE ladders for ``n_underlyings``, with per-instrument trade rates."""
+
+    def __init__(self, n_underlyings=N_UNDERLYINGS, n_strikes=N_STRIKES, ticks_per_second=TICKS_PER_SECOND,
+                 seed=7):
+        self.rng = rng = random.Random(seed)
+        self.ticks_per_second = ticks_per_second
+        self.last_feeds = 0         # feeds in the last live_frame
+        self.option_map = {}        # underlying -> [(strike, ce_key, pe_key)], as instruments.load_option_map
+        self.underlying_info = {}   # underlying -> symbol
+        self.info = {}              # option key -> {name, strike, type, lot_size}, as load_instrument_map
+        self.spot = {}              # underlying -> current spot
+        self.state = {}             # option key -> [underlying, strike, is_call, lot, vtt, oi, iv, ltt]
+        self.spot_keys, self.option_keys = [], []
+        weights = []                # per instrument, same order as self.keys
+        option_weights = []
+        next_token = 40000
+        for u in range(n_underlyings):
+            underlying = f"NSE_EQ|INE{u:06d}01"
+            name = f"SYM{u:03d}"
+            liquidity = 1.0 / (u + 1) ** 0.8
+            spot = math.exp(rng.uniform(math.log(80), math.log(8000)))
+            step = _nice(spot * rng.uniform(0.01, 0.025))
+            atm = round(spot / step) * step
+            lot = max(1, round(LOT_NOTIONAL * rng.uniform(0.7, 1.4) / spot / 25)) * 25
+            self.spot[underlying] = spot
+            self.underlying_info[underlying] = name
+            self.spot_keys.append(underlying)
+            weights.append(liquidity)
+            ladder = []
+            for s in range(n_strikes):
+                strike = round(atm + (s - n_strikes // 2) * step, 2)
+                if strike <= 0:
+                    continue
+                ce, pe = f"NSE_FO|{next_token}", f"NSE_FO|{next_token + 1}"
+                next_token += 2
+                ladder.append((strike, ce, pe))
+                rate = liquidity * math.exp(-abs(s - n_strikes // 2) / ATM_DECAY)
+                for key, typ in ((ce, "CE"), (pe, "PE")):
+                    self.info[key] = {"name": name, "strike": strike, "type": typ, "lot_size": lot}
+                    oi = rng.randint(20, 2000) * lot * liquidity + lot
+                    self.state[key] = [underlying, strike, typ == "CE", lot, 0, float(oi // lot * lot),
+                                       rng.uniform(0.15, 0.45), BASE_TS]
+                    self.option_keys.append(key)
+                    option_weights.append(rate)
+            self.option_map[underlying] = ladder
+        self.keys = self.spot_keys + self.option_keys
+        total_spot, total_opt = sum(weights), sum(option_weights)
+        rates = [w / total_spot * SPOT_SHARE for w in weights] + \
+                [w / total_opt * (1 - SPOT_SHARE) for w in option_weights]
+        self.weight = dict(zip(self.keys, rates))      # key -> share of all ticks
+        self.cum_rates = self.cumulative(self.keys)
+
+    # -------------------------------
+    # PRICING
+    # -------------------------------
+    def option_price(self, key):
+        underlying, strike, is_call = self.state[key][:3]
+        spot = self.spot[underlying]
+        intrinsic = max(0.0, spot - strike if is_call else strike - spot)
+        width = spot * 0.04
+        return _tick(intrinsic + spot * 0.015 * math.exp(-((spot - strike) / width) ** 2) + 0.05)
+
+    def delta(self, key):
+        underlying, strike, is_call = self.state[key][:3]
+        spot = self.spot[underlying]
+        d = 1.0 / (1.0 + math.exp(-(spot - strike) / (spot * 0.02)))
+        return d if is_call else d - 1.0
+
+    # -------------------------------
+    # FEEDS
+    # -------------------------------
+    def add(self, key):
+        """Start ticking a key that is not in the generated universe (e.g. a real key
+        subscribed against mock_upstox.py): options get a one-strike underlying of their own."""
+        rng = self.rng
+        if key in self.spot or key in self.state:
+            return
+        if "_FO|" not in key:
+            self.spot[key] = _tick(math.exp(rng.uniform(math.log(80), math.log(8000))))
+            self.weight[key] = rng.uniform(0.2, 1.0) * SPOT_SHARE / len(self.keys)
+            return
+        underlying = f"MOCK|{key}"
+        spot = self.spot[underlying] = _tick(math.exp(rng.uniform(math.log(80), math.log(8000))))
+        lot = max(1, round(LOT_NOTIONAL / spot / 25)) * 25
+        self.info[key] = {"name": key, "strike": spot, "type": "CE", "lot_size": lot}
+        self.state[key] = [underlying, spot, True, lot, 0, float(rng.randint(20, 2000) * lot),
+                           rng.uniform(0.15, 0.45), BASE_TS]
+        self.weight[key] = rng.uniform(0.2, 1.0) * (1 - SPOT_SHARE) / len(self.keys)
+
+    def fill(self, feed, key, ts, mode=None, trade=True):
+        """Advance ``key`` and write its update into ``feed`` in subscription ``mode``
+        (ltpc / option_greeks / full / full_d30; default option_greeks for options, ltpc for spot)."""
+        if key not in self.state and key not in self.spot:
+            self.add(key)
+        if key in self.state:
+            self._fill_option(feed, key, ts, trade, mode or OPTION_GREEKS)
+        else:
+            self._fill_spot(feed, key, ts, mode or LTPC, move=trade)
+
+    def _depth(self, levels, price, lot, n):
+        rng = self.rng
+        for k in range(n):
+            levels.add(bidQ=lot * rng.randint(1, 40), bidP=_tick(price - 0.05 * (k + 1)),
+                       askQ=lot * rng.randint(1, 40), askP=_tick(price + 0.05 * (k + 1)))
+
+    def _fill_spot(self, feed, key, ts, mode=LTPC, move=True):
+        rng = self.rng
+        spot = self.spot[key]
+        if move:
+            spot = self.spot[key] = _tick(spot * (1 + rng.gauss(0, 0.0003)))
+        ltpc = dict(ltp=spot, ltt=ts, ltq=rng.randint(1, 200), cp=round(spot * 0.995, 2))
+        if mode not in (FULL, FULL_D30):
+            feed.ltpc.CopyFrom(pb.LTPC(**ltpc))
+        elif "INDEX|" in key:
+            feed.fullFeed.indexFF.ltpc.CopyFrom(pb.LTPC(**ltpc))
+        else:
+            m = feed.fullFeed.marketFF
+            m.ltpc.CopyFrom(pb.LTPC(**ltpc))
+            self._depth(m.marketLevel.bidAskQuote, spot, 1, 30 if mode == FULL_D30 else 5)
+            m.atp, m.vtt = spot, rng.randint(10_000, 5_000_000)
+            m.tbq, m.tsq = rng.randint(1000, 100_000), rng.randint(1000, 100_000)
+
+    def _fill_option(self, feed, key, ts, trade=True, mode=OPTION_GREEKS):
+        rng = self.rng
+        st = self.state[key]
+        lot = st[3]
+        if trade:
+            lots = rng.randint(20, 100) if rng.random() < BLOCK_PROB else 1 + int(rng.expovariate(2.0))
+            st[4] += lots * lot
+            if rng.random() < 0.6:
+                st[5] = max(float(lot), st[5] + rng.choice((-1, 1, 1)) * rng.randint(1, lots) * lot)
+            st[6] = min(1.5, max(0.05, st[6] + rng.gauss(0, 0.002)))
+            st[7] = ts
+        price = self.option_price(key)
+        ltpc = pb.LTPC(ltp=price, ltt=st[7], ltq=lot, cp=_tick(price * 0.97))
+        if mode == LTPC:
+            feed.ltpc.CopyFrom(ltpc)
+            return
+        greeks = pb.OptionGreeks(delta=self.delta(key), gamma=0.001, theta=-price * 0.02, vega=price * 0.1)
+        if mode == OPTION_GREEKS:
+            flwg = feed.firstLevelWithGreeks
+            flwg.ltpc.CopyFrom(ltpc)
+            flwg.vtt, flwg.oi, flwg.iv = st[4], st[5], round(st[6], 4)
+            flwg.optionGreeks.CopyFrom(greeks)
+            d = flwg.firstDepth
+            d.bidP, d.askP = _tick(price - 0.05), _tick(price + 0.05)
+            d.bidQ, d.askQ = lot * rng.randint(1, 40), lot * rng.randint(1, 40)
+            return
+        m = feed.fullFeed.marketFF
+        m.ltpc.CopyFrom(ltpc)
+        self._depth(m.marketLevel.bidAskQuote, price, lot, 30 if mode == FULL_D30 else 5)
+        m.optionGreeks.CopyFrom(greeks)
+        m.atp, m.vtt, m.oi, m.iv = price, st[4], st[5], round(st[6], 4)
+        m.tbq, m.tsq = lot * rng.randint(100, 4000), lot * rng.randint(100, 4000)
+
+    def snapshot(self, ts=BASE_TS, modes=None):
+        """initial_feed frame, as sent right after subscribing: every instrument, or the
+        {key: mode} given."""
+        msg = pb.FeedResponse(type=pb.initial_feed, currentTs=ts)
+        for key, mode in (modes or dict.fromkeys(self.keys)).items():
+            self.fill(msg.feeds[key], key, ts, mode, trade=False)
+        return msg.SerializeToString()
+
+    def live_frame(self, keys, cum, n, ts, modes=None):
+        """One live_feed frame with ``n`` draws from ``keys`` weighted by ``cum`` (cumulative rates)."""
+        msg = pb.FeedResponse(type=pb.live_feed, currentTs=ts)
+        for i in sorted(set(self.rng.choices(range(len(keys)), cum_weights=cum, k=n))):
+            key = keys[i]
+            self.fill(msg.feeds[key], key, ts, modes.get(key) if modes else None)
+        self.last_feeds = len(msg.feeds)
+        return msg.SerializeToString()
+
+    def cumulative(self, keys):
+        """Cumulative trade rates of ``keys`` (for live_frame), unknown keys added on the way."""
+        cum, acc = [], 0.0
+        for key in keys:
+            if key not in self.weight:
+                self.add(key)
+            acc += self.weight[key]
+            cum.append(acc)
+        return cum
+
+    def frames(self, seconds=10.0, frame_ms=FRAME_MS, initial=True, start=BASE_TS):
+        """[(t seconds, serialized FeedResponse)]: one live_feed frame per ``frame_ms``."""
+        rng = self.rng
+        per_frame = self.ticks_per_second * frame_ms / 1000
+        out = [(start / 1000, self.snapshot(start))] if initial else []
+        for f in range(int(seconds * 1000 / frame_ms)):
+            ts = start + (f + 1) * frame_ms
+            n = max(1, int(rng.gauss(per_frame, per_frame ** 0.5)))
+            out.append((ts / 1000, self.live_frame(self.keys, self.cum_rates, n, ts)))
+        return out
+
+    # -------------------------------
+    # CSV-SHAPED VIEWS
+    # -------------------------------
+    def companies_rows(self):
+        """Rows in companies_only.csv layout (one per strike)."""
+        return [{"name": self.underlying_info[u], "asset_symbol": self.underlying_info[u], "underlying_key": u,
+                 "strike_price": strike, "ce_instrument_key": ce, "pe_instrument_key": pe,
+                 "lot_size": self.info[ce]["lot_size"]}
+                for u, ladder in self.option_map.items() for strike, ce, pe in ladder]
+
+    def ltp_map(self):
+        return dict(self.spot)
+
+
+if __name__ == "__main__":
+    market = Market()
+    frames = market.frames(seconds=60)
+    live = frames[1:]
+    sizes = [len(b) for _, b in live]
+    feeds = [len(pb.FeedResponse.FromString(b).feeds) for _, b in live[:200]]
+    print(f"{len(market.spot_keys)} underlyings, {len(market.option_keys)} options, "
+          f"snapshot {len(frames[0][1]) / 1e6:.1f} MB")
+    print(f"{len(live)} frames/min, {sum(feeds) / len(feeds):.0f} feeds/frame, "
+          f"{sum(sizes) / len(sizes) / 1e3:.1f} kB/frame, {sum(sizes) / 60 / 1e6:.2f} MB/s")
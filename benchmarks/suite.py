@@ -0,0 +1,438 @@
+"""Hot-path benchmarks on the synthetic feed, saved per commit for comparison.
+
+    python benchmarks/suite.py                   # run every case, save results/<commit>.json
+    python benchmarks/suite.py -k decode -k atm  # only cases whose name contains one of these
+    python benchmarks/suite.py --quick           # smaller feed, fewer repeats
+    python benchmarks/suite.py --compare         # the two latest saved runs
+    python benchmarks/suite.py --compare 7caac0e 86b1201   # or two commits / result files
+
+Each case builds its input once from feedgen.Market, then runs its whole
+workload ``repeat`` times, with untimed state reset before every repeat
+(as asv's setup). The results file records the min and median per run and
+per unit (frame, tick, lookup...), the feed parameters, the commit and whether
+the tree was dirty.
+"""
+import argparse
+import asyncio
+import contextlib
+import gc
+import glob
+import importlib.util
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, HERE)
+
+import MarketDataFeedV3_pb2 as pb  # noqa: E402
+from feedgen import Market  # noqa: E402
+from instruments import InstrumentRegistry  # noqa: E402
+from pipeline import FIELD_BOOK, FIELD_GREEKS, FIELD_UNCHANGED, Decoder, Pipeline  # noqa: E402
+
+# =========================================================
+# CONFIG
+# =========================================================
+RESULTS_DIR = os.path.join(HERE, "results")
+SECONDS = 10.0          # feed time generated per run (20 frames/s, ~180 feeds/frame)
+REPEAT = 5
+QUICK_SECONDS = 2.0
+QUICK_REPEAT = 2
+THRESHOLD = 0.10        # --compare flags changes beyond ±10%
+
+CASES = []
+
+
+def case(name, unit):
+    """Register ``fn(data) -> (run, reset, n_units)``; reset may be None."""
+    def register(fn):
+        CASES.append((name, unit, fn))
+        return fn
+    return register
+
+
+def load_script(filename, name):
+    """Import a top-level script whose file name is not a module name (e.g. GETTING_ATM+2_ATM-2.py)."""
+    spec = importlib.util.spec_from_file_location(name, os.path.join(ROOT, filename))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class Data:
+    """Everything the cases share, generated once per suite run."""
+
+    def __init__(self, seconds, seed=7):
+        self.market = Market(seed=seed)
+        self.frames = self.market.frames(seconds=seconds)
+        self.snapshot = self.frames[0]
+        self.live = self.frames[1:]
+        self.registry_keys = self.market.spot_keys + self.market.option_keys
+        self._ticks = None
+
+    def registry(self):
+        return InstrumentRegistry(self.registry_keys, self.market.info)
+
+    def ticks(self):
+        """Live ticks (fast-path decode, greeks on), decoded once for the detector cases."""
+        if self._ticks is None:
+            decoder = Decoder(self.registry(), (FIELD_GREEKS,))
+            decoder.decode(self.snapshot[1], self.snapshot[0])
+            self._ticks = [t for now, buf in self.live for t in decoder.decode(buf, now)[1]]
+        return self._ticks
+
+    def spot_ticks(self):
+        option_map = self.market.option_map
+        return [(t.key, t.ltp) for t in self.ticks() if t.key in option_map]
+
+
+# =========================================================
+# DECODE
+# =========================================================
+@case("decode.parse", "frame")
+def bench_parse(data):
+    frames = [buf for _, buf in data.live]
+
+    def run():
+        for buf in frames:
+            pb.FeedResponse.FromString(buf)
+    return run, None, len(frames)
+
+
+def _decode_case(data, fields):
+    holder = []
+
+    def reset():
+        holder[:] = [Decoder(data.registry(), fields)]
+        holder[0].decode(data.snapshot[1], data.snapshot[0])
+
+    def run():
+        decode = holder[0].decode
+        for now, buf in data.live:
+            decode(buf, now)
+    return run, reset, len(data.live)
+
+
+@case("decode.full", "frame")
+def bench_decode_full(data):
+    return _decode_case(data, (FIELD_GREEKS, FIELD_BOOK, FIELD_UNCHANGED))
+
+
+@case("decode.fastpath", "frame")
+def bench_decode_fastpath(data):
+    return _decode_case(data, ())
+
+
+# =========================================================
+# ENERGY SURGE: gemini5.queue_worker / energy_monitor and the pipeline detector
+# =========================================================
+def _gemini5(data):
+    import gemini5 as g
+    from coalescer import AlertCoalescer
+    from detectors import TradeState
+    from timer_wheel import TimerWheel
+
+    def reset_state():
+        g.REGISTRY = data.registry()
+        g.INSTRUMENT_MAP = data.market.info
+        g.trade_state = [TradeState() for _ in g.REGISTRY.keys]
+        g.stale_ids.clear()
+        g.dirty_ids.clear()
+        g.expiry = TimerWheel(resolution=g.CHECK_INTERVAL)
+        g.coalescer = AlertCoalescer(cooldown=5.0, hysteresis=0.5, sinks=[lambda alert: None])
+    return g, reset_state, TradeState
+
+
+@case("gemini5.queue_worker", "frame")
+def bench_queue_worker(data):
+    g, reset_state, _ = _gemini5(data)
+    loop = asyncio.new_event_loop()
+    devnull = open(os.devnull, "w")
+
+    async def drain(frames):
+        g.data_queue = asyncio.Queue()
+        worker = asyncio.ensure_future(g.queue_worker())
+        for buf in frames:
+            g.data_queue.put_nowait(buf)
+        await g.data_queue.join()
+        worker.cancel()
+
+    def reset():
+        reset_state()
+        loop.run_until_complete(drain([data.snapshot[1]]))     # initial_feed: baselines only
+
+    def run():
+        with contextlib.redirect_stdout(devnull):   # check_energy prints every alert
+            loop.run_until_complete(drain([buf for _, buf in data.live]))
+    return run, reset, len(data.live)
+
+
+@case("gemini5.energy_monitor", "window")
+def bench_energy_monitor(data):
+    """energy_monitor's sweep (expiry.advance + clear) over one window per option, without the sleeps."""
+    g, reset_state, _ = _gemini5(data)
+    t0 = data.snapshot[0]
+    n = len(data.market.option_keys)
+    steps = int((g.WINDOW_TIME + 2 * g.CHECK_INTERVAL) / g.CHECK_INTERVAL)
+
+    def reset():
+        reset_state()
+        first = len(data.market.spot_keys)
+        for i in range(n):
+            iid, when = first + i, t0 + g.WINDOW_TIME * i / n
+            g.trade_state[iid].trades.append((when, 1.0, 1.0, 0.0))
+            g.expiry.schedule(iid, when + g.WINDOW_TIME)
+
+    def run():
+        expiry, trade_state = g.expiry, g.trade_state
+        for step in range(steps + int(g.WINDOW_TIME / g.CHECK_INTERVAL)):
+            for iid in expiry.advance(t0 + step * g.CHECK_INTERVAL):
+                trade_state[iid].clear()
+    return run, reset, n
+
+
+@case("pipeline.energy_surge", "frame")
+def bench_pipeline_energy(data):
+    from detectors import EnergySurgeDetector
+
+    holder = []
+
+    def reset():
+        pipeline = Pipeline(data.registry())
+        pipeline.register(EnergySurgeDetector())
+        pipeline.add_sink(lambda alert: None)
+        pipeline.process(data.snapshot[1], data.snapshot[0])
+        holder[:] = [pipeline]
+
+    def run():
+        process = holder[0].process
+        for now, buf in data.live:
+            process(buf, now)
+    return run, reset, len(data.live)
+
+
+# =========================================================
+# OI INCREASE (STORING_OI_VALUES.detect_oi_increase)
+# =========================================================
+@case("detect_oi_increase", "tick")
+def bench_oi_increase(data):
+    from detectors import OiIncreaseDetector
+
+    ticks = data.ticks()
+    holder = []
+
+    def reset():
+        detector = OiIncreaseDetector(verbose=False)
+        detector.resize(len(data.registry_keys))
+        holder[:] = [detector]
+
+    def run():
+        on_tick = holder[0].on_tick
+        for tick in ticks:
+            on_tick(tick)
+    return run, reset, len(ticks)
+
+
+# =========================================================
+# ATM
+# =========================================================
+@case("find_atm_with_index", "lookup")
+def bench_find_atm(data):
+    from detectors import find_atm_with_index
+
+    option_map = data.market.option_map
+    spots = [(option_map[key], spot) for key, spot in data.spot_ticks()] * 20
+
+    def run():
+        for options, spot in spots:
+            find_atm_with_index(options, spot)
+    return run, None, len(spots)
+
+
+@case("find_atm_with_index.cached_strikes", "lookup")
+def bench_find_atm_cached(data):
+    from detectors import find_atm_with_index
+
+    option_map = data.market.option_map
+    strikes = {k: [o[0] for o in options] for k, options in option_map.items()}
+    spots = [(option_map[key], spot, strikes[key]) for key, spot in data.spot_ticks()] * 20
+
+    def run():
+        for options, spot, s in spots:
+            find_atm_with_index(options, spot, s)
+    return run, None, len(spots)
+
+
+@case("ladders.update", "lookup")
+def bench_ladder(data):
+    from ladders import LadderManager
+
+    spots = data.spot_ticks() * 20
+    holder = []
+
+    def reset():
+        holder[:] = [LadderManager(data.market.option_map)]
+
+    def run():
+        update = holder[0].update
+        for key, spot in spots:
+            update(key, spot)
+    return run, reset, len(spots)
+
+
+@case("build_atm_table", "underlying")
+def bench_build_atm_table(data):
+    import pandas as pd
+
+    build_atm_table = load_script("GETTING_ATM+2_ATM-2.py", "getting_atm").build_atm_table
+    df = pd.DataFrame(data.market.companies_rows())
+    ltp_map = data.market.ltp_map()
+
+    def run():
+        build_atm_table(df, ltp_map)
+    return run, None, len(data.market.option_map)
+
+
+# =========================================================
+# RUNNER
+# =========================================================
+def measure(run, reset, repeat):
+    times = []
+    for _ in range(repeat):
+        if reset is not None:
+            reset()
+        gc.collect()
+        t0 = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - t0)
+    return times
+
+
+def git_info():
+    def git(*args):
+        try:
+            return subprocess.run(("git", *args), cwd=ROOT, capture_output=True, text=True, timeout=30).stdout.strip()
+        except (OSError, subprocess.SubprocessError):
+            return ""
+    return git("rev-parse", "--short", "HEAD") or "unknown", bool(git("status", "--porcelain", "--untracked-files=no"))
+
+
+def run_suite(patterns=(), seconds=SECONDS, repeat=REPEAT):
+    selected = [c for c in CASES if not patterns or any(p in c[0] for p in patterns)]
+    t0 = time.perf_counter()
+    data = Data(seconds)
+    print(f"📦 feed: {len(data.market.spot_keys)} underlyings, {len(data.market.option_keys)} options, "
+          f"{len(data.live)} frames over {seconds:g}s ({time.perf_counter() - t0:.1f}s to generate)\n", flush=True)
+    commit, dirty = git_info()
+    results = {
+        "commit": commit, "dirty": dirty, "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(), "machine": platform.machine(), "platform": platform.platform(),
+        "params": {"seconds": seconds, "repeat": repeat, "underlyings": len(data.market.spot_keys),
+                   "options": len(data.market.option_keys), "frames": len(data.live)},
+        "cases": {},
+    }
+    print(f"{'case':<38} {'per unit':>12} {'min run':>10} {'median':>10}  units", flush=True)
+    for name, unit, setup in selected:
+        try:
+            run, reset, n = setup(data)
+            times = measure(run, reset, repeat)
+        except ImportError as e:
+            print(f"{name:<38} skipped: {e}", flush=True)
+            results["cases"][name] = {"unit": unit, "skipped": str(e)}
+            continue
+        best, median = min(times), statistics.median(times)
+        results["cases"][name] = {"unit": unit, "n": n, "min_s": best, "median_s": median,
+                                  "per_unit_us": best / n * 1e6, "per_second": n / best}
+        print(f"{name:<38} {best / n * 1e6:>9.2f} µs {best * 1e3:>8.1f}ms {median * 1e3:>8.1f}ms  "
+              f"{n} {unit}s", flush=True)
+    return results
+
+
+def save(results):
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f"{results['commit']}{'-dirty' if results['dirty'] else ''}.json")
+    if os.path.exists(path):
+        with open(path) as f:
+            earlier = json.load(f)
+        if earlier.get("params") == results["params"]:    # a -k rerun updates its cases, keeps the rest
+            results["cases"] = {**earlier["cases"], **results["cases"]}
+    with open(path, "w") as f:
+        json.dump(results, f, indent=1)
+    print(f"\n💾 saved {os.path.relpath(path)}", flush=True)
+    return path
+
+
+def find_result(ref):
+    if os.path.exists(ref):
+        return ref
+    matches = sorted(glob.glob(os.path.join(RESULTS_DIR, f"{ref}*.json")), key=os.path.getmtime)
+    if not matches:
+        sys.exit(f"no saved results for {ref!r} in {RESULTS_DIR}")
+    return matches[-1]
+
+
+def compare(old_path, new_path):
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    print(f"\n{old['commit']}{'*' if old['dirty'] else ''} → {new['commit']}{'*' if new['dirty'] else ''}"
+          f"   (per unit, best of {new['params']['repeat']})")
+    if old["params"] != new["params"]:
+        print(f"⚠️ different feed parameters: {old['params']} vs {new['params']}")
+    for name, after in new["cases"].items():
+        before = old["cases"].get(name)
+        if not before or "per_unit_us" not in before or "per_unit_us" not in after:
+            continue
+        ratio = after["per_unit_us"] / before["per_unit_us"]
+        mark = "🔴 slower" if ratio > 1 + THRESHOLD else "🟢 faster" if ratio < 1 - THRESHOLD else ""
+        print(f"{name:<38} {before['per_unit_us']:>9.2f} → {after['per_unit_us']:>9.2f} µs  {ratio:>5.2f}x  {mark}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-k", dest="patterns", action="append", default=[], help="run cases containing this")
+    parser.add_argument("--seconds", type=float, default=None, help=f"feed seconds (default {SECONDS:g})")
+    parser.add_argument("--repeat", type=int, default=None, help=f"runs per case (default {REPEAT})")
+    parser.add_argument("--quick", action="store_true")
+    parser.add_argument("--no-save", action="store_true")
+    parser.add_argument("--list", action="store_true")
+    parser.add_argument("--compare", nargs="*", metavar="REF", help="compare two saved runs (commit or file)")
+    args = parser.parse_args()
+
+    if args.list:
+        for name, unit, _ in CASES:
+            print(f"{name:<38} per {unit}")
+        return
+    if args.compare is not None:
+        refs = args.compare
+        if len(refs) < 2:
+            saved = sorted(glob.glob(os.path.join(RESULTS_DIR, "*.json")), key=os.path.getmtime)
+            saved = [p for p in saved if not refs or os.path.abspath(p) != os.path.abspath(find_result(refs[0]))]
+            paths = ([find_result(refs[0])] + saved[-1:]) if refs else saved[-2:]
+            if len(paths) < 2:
+                sys.exit("need two saved runs to compare")
+        else:
+            paths = [find_result(r) for r in refs[:2]]
+        compare(*paths)
+        return
+
+    seconds = args.seconds or (QUICK_SECONDS if args.quick else SECONDS)
+    repeat = args.repeat or (QUICK_REPEAT if args.quick else REPEAT)
+    results = run_suite(args.patterns, seconds, repeat)
+    if not args.no_save:
+        path = save(results)
+        previous = [p for p in sorted(glob.glob(os.path.join(RESULTS_DIR, "*.json")), key=os.path.getmtime)
+                    if os.path.abspath(p) != os.path.abspath(path)]
+        if previous:
+            compare(previous[-1], path)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,7 @@ from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 import pika
 import json
 import threading
+from alert_schema import decode_batch
 
 app = FastAPI()
 
@@ -31,11 +32,17 @@ def start_rabbitmq_consumer(loop):
     channel.queue_declare(queue='insider_alerts')
 
     def callback(ch, method, properties, body):
-        # When a trade arrives, tell the FastAPI loop to broadcast it
-        message = body.decode()
+        # One AMQP message = a batch of alerts; forward it to the browsers as one JSON array
+        message = json.dumps(decode_batch(body, properties.content_type))
         asyncio.run_coroutine_threadsafe(manager.broadcast(message), loop)
 
+    def scanner_callback(ch, method, properties, body):
+        # scanner.py rankings are already JSON: {"type": "scanner", "rows": [...]}
+        asyncio.run_coroutine_threadsafe(manager.broadcast(body.decode("utf-8")), loop)
+
+    channel.queue_declare(queue='scanner_top')
     channel.basic_consume(queue='insider_alerts', on_message_callback=callback, auto_ack=True)
+    channel.basic_consume(queue='scanner_top', on_message_callback=scanner_callback, auto_ack=True)
     print("🚀 Bridge connected to RabbitMQ. Waiting for trades...")
     channel.start_consuming()
 
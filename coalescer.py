@@ -0,0 +1,119 @@
+import asyncio
+import itertools
+import time
+
+from timer_wheel import TimerWheel
+
+# =========================================================
+# CONFIG
+# =========================================================
+COOLDOWN = 5.0           # seconds without a new alert before an instrument's episode closes
+HYSTERESIS = 0.5         # republish once cumulative value grows by this fraction since last publish
+RESOLUTION = 0.1         # timer wheel slot width (seconds)
+
+
+class Episode:
+    """One evolving alert: consecutive alerts for the same instrument merged."""
+
+    __slots__ = ("alert_id", "alert", "first_ts_ns", "start_price", "value", "count", "seq",
+                 "published_value", "published_category", "dirty")
+
+    def __init__(self, alert_id, alert):
+        self.alert_id = alert_id
+        self.alert = dict(alert)
+        self.first_ts_ns = alert.get("ts_ns") or time.time_ns()
+        self.start_price = (alert.get("ltp") or 0.0) - (alert.get("price_move") or 0.0)
+        self.value = alert.get("value", 0.0)
+        self.count = 1
+        self.seq = 0
+        self.published_value = 0.0
+        self.published_category = None
+        self.dirty = True
+
+
+class AlertCoalescer:
+    """Per-instrument cooldown between the detectors and the alert sinks.
+
+    The first alert for an instrument goes out at once (``status="new"``).
+    Alerts that follow within ``cooldown`` seconds are merged into it:
+    cumulative value, price move from the episode's start price, count,
+    latest category/OI/LTP. The merged alert is republished
+    (``status="update"``) only when the value has grown by ``hysteresis``
+    since the last publish or the category flipped, and once more
+    (``status="final"``) when the instrument has been quiet for
+    ``cooldown`` and something was merged since. Every version carries
+    the same ``alert_id`` and an increasing ``seq``.
+    """
+
+    def __init__(self, cooldown=COOLDOWN, hysteresis=HYSTERESIS, resolution=RESOLUTION, sinks=()):
+        self.cooldown = cooldown
+        self.hysteresis = hysteresis
+        self.wheel = TimerWheel(resolution)
+        self.episodes = {}
+        self.sinks = list(sinks)
+        self.ids = itertools.count(1)
+        self.received = 0
+        self.published = 0
+        self._wake = None
+
+    def add_sink(self, sink):
+        self.sinks.append(sink)
+        return sink
+
+    def __call__(self, alert):
+        self.received += 1
+        key = alert.get("instrument_key") or (alert.get("ticker"), alert.get("strike"), alert.get("option_type"))
+        now = time.time()
+        ep = self.episodes.get(key)
+        if ep is None:
+            ep = self.episodes[key] = Episode(next(self.ids), alert)
+            self._publish(ep, "new")
+        else:
+            self._merge(ep, alert)
+            grown = ep.value >= ep.published_value * (1 + self.hysteresis)
+            if grown or ep.alert.get("category") != ep.published_category:
+                self._publish(ep, "update")
+        self.wheel.schedule(key, now + self.cooldown)
+        if self._wake is not None:
+            self._wake.set()
+
+    def _merge(self, ep, alert):
+        ep.value += alert.get("value", 0.0)
+        ep.count += 1
+        ep.dirty = True
+        a = ep.alert
+        a.update(alert)
+        a["value"] = round(ep.value, 2)
+        if a.get("ltp") is not None:
+            a["price_move"] = round(a["ltp"] - ep.start_price, 2)
+
+    def _publish(self, ep, status):
+        a = ep.alert
+        a["alert_id"], a["seq"], a["status"] = ep.alert_id, ep.seq, status
+        a["count"], a["first_ts_ns"] = ep.count, ep.first_ts_ns
+        ep.seq += 1
+        ep.published_value = ep.value
+        ep.published_category = a.get("category")
+        ep.dirty = False
+        self.published += 1
+        out = dict(a)
+        for sink in self.sinks:
+            sink(out)
+
+    def expire(self, now=None):
+        """Close every episode whose cooldown has run out."""
+        for key in self.wheel.advance(now or time.time()):
+            ep = self.episodes.pop(key, None)
+            if ep is not None and ep.dirty:
+                ep.alert["ts_ns"] = time.time_ns()
+                self._publish(ep, "final")
+
+    async def run(self):
+        """Drive expiry: ticks at the wheel resolution while episodes are open, sleeps otherwise."""
+        self._wake = asyncio.Event()
+        while True:
+            if not self.episodes:
+                self._wake.clear()
+                await self._wake.wait()
+            await asyncio.sleep(self.wheel.resolution)
+            self.expire()
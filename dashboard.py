@@ -1,7 +1,7 @@
 import streamlit as st
 import pika
-import json
 import pandas as pd
+from alert_schema import decode_batch
 
 st.set_page_config(page_title="Insider Trade Detector", layout="wide")
 st.title("🕵️ Live Equity Option Insider Detector")
@@ -16,7 +16,7 @@ def consume_data():
     # Get one message at a time without blocking the UI
     method_frame, header_frame, body = channel.basic_get(queue='insider_alerts', auto_ack=True)
     if body:
-        st.session_state.alerts.append(json.loads(body))
+        st.session_state.alerts.extend(decode_batch(body, header_frame.content_type))
 
 # Run the consumer
 consume_data()
@@ -1,8 +1,8 @@
 import streamlit as st
 import pika
-import json
 import pandas as pd
 import time
+from alert_schema import decode_batch
 
 st.set_page_config(page_title="Insider Trade Detector", layout="wide")
 
@@ -24,7 +24,7 @@ def consume_data():
         while True:
             method_frame, header_frame, body = channel.basic_get(queue='insider_alerts', auto_ack=True)
             if body:
-                st.session_state.alerts.append(json.loads(body))
+                st.session_state.alerts.extend(decode_batch(body, header_frame.content_type))
             else:
                 break
         connection.close()
@@ -0,0 +1,267 @@
+import bisect
+import time
+from collections import defaultdict, deque
+
+from instruments import grow
+from ladders import Ladder
+from pipeline import Detector
+from timer_wheel import TimerWheel
+
+
+# =========================================================
+# ENERGY SURGE (gemini5.queue_worker + energy_monitor)
+# =========================================================
+class TradeState:
+    __slots__ = ("ltt", "vtt", "oi", "trades", "value")
+
+    def __init__(self):
+        self.ltt = 0
+        self.vtt = 0
+        self.oi = 0.0
+        self.trades = deque()   # (recv_ts, value, price, oi, recv perf_counter)
+        self.value = 0.0        # running sum of trades[*][1]
+
+    def expire(self, cutoff):
+        """Drop trades older than ``cutoff``; returns the window value left."""
+        trades = self.trades
+        while trades and trades[0][0] < cutoff:
+            self.value -= trades.popleft()[1]
+        if not trades:
+            self.value = 0.0    # no float drift carried across windows
+        return self.value
+
+    def clear(self):
+        self.trades.clear()
+        self.value = 0.0
+
+
+class EnergySurgeDetector(Detector):
+    """Value traded in a rolling window, classified by the price move across it.
+
+    Event driven: ticks mark their instrument dirty and, once the frame has
+    been dispatched, only dirty instruments are evaluated. A window sum only
+    shrinks between trades, so nothing can fire in between and an alert
+    goes out on the frame that completes the surge. Idle windows are
+    emptied by a timer wheel; the old fixed-interval scan is gone.
+    ``check_interval`` is the wheel's expiry sweep, not an alert cadence.
+    """
+
+    name = "energy_surge"
+
+    def __init__(self, window_time=3.0, check_interval=0.5, min_value=100000, absorption_move=0.05):
+        super().__init__()
+        self.window_time = window_time
+        self.interval = check_interval
+        self.min_value = min_value
+        self.absorption_move = absorption_move
+        self.state = []
+        self.dirty = set()
+        self.now = 0.0
+        self.wheel = TimerWheel(resolution=check_interval)
+
+    def resize(self, n_instruments):
+        grow(self.state, n_instruments, TradeState)
+
+    def on_tick(self, tick):
+        if not tick.has_greeks:
+            return
+        st = self.state[tick.iid]
+        if tick.gap:
+            # vtt moved across a reconnect/stall: re-baseline, don't book it as a burst
+            st.ltt, st.vtt, st.oi = tick.ltt, tick.vtt, tick.oi
+            return
+        if tick.ltt > st.ltt or tick.vtt > st.vtt:
+            new_qty = tick.vtt - st.vtt if st.vtt > 0 else tick.ltq
+            if new_qty > 0:
+                value = tick.ltp * new_qty
+                st.trades.append((tick.ts, value, tick.ltp, tick.oi, tick.recv))
+                st.value += value
+                self.dirty.add(tick.iid)
+                self.now = tick.ts
+            st.ltt, st.vtt, st.oi = tick.ltt, tick.vtt, tick.oi
+
+    def end_frame(self):
+        if not self.dirty:
+            return
+        now, window = self.now, self.window_time
+        for iid in self.dirty:
+            self.evaluate(iid, now)
+            if self.state[iid].trades:
+                self.wheel.schedule(iid, now + window)
+        self.dirty.clear()
+
+    def on_timer(self, now):
+        """Empty windows whose last trade has aged out (O(expired), not O(instruments))."""
+        for iid in self.wheel.advance(now):
+            self.state[iid].clear()
+
+    def evaluate(self, iid, now):
+        st = self.state[iid]
+        if st.expire(now - self.window_time) < self.min_value:
+            return
+        trades = st.trades
+        val, change = st.value, trades[-1][2] - trades[0][2]
+        info = self.pipeline.registry.info[iid]
+        category = "AGGRESSIVE_BUYING" if change > 0 else "BULK_SELLING"
+        if abs(change) < self.absorption_move:
+            category = "STAGNANT_ABSORPTION"
+
+        self.emit({
+            "timestamp": time.strftime('%H:%M:%S'), "ts_ns": time.time_ns(), "iid": iid,
+            "ticker": info['name'], "strike": info['strike'], "option_type": info['type'],
+            "value": round(val, 2), "price_move": round(change, 2),
+            "category": category, "oi": trades[-1][3],
+            "instrument_key": self.pipeline.registry.keys[iid], "ltp": trades[-1][2],
+            # perf_counter() stamps: frame that completed the surge, and detection
+            "stamps": {"recv": trades[-1][4], "detect": time.perf_counter()},
+        })
+        st.clear()
+
+
+# =========================================================
+# OI INCREASE (STORING_OI_VALUES.detect_oi_increase)
+# =========================================================
+class OiIncreaseDetector(Detector):
+    name = "oi_increase"
+
+    def __init__(self, verbose=True):
+        super().__init__()
+        self.prev_oi = []       # iid -> last OI (None until first observation)
+        self.verbose = verbose
+
+    def resize(self, n_instruments):
+        grow(self.prev_oi, n_instruments, None)
+
+    def on_tick(self, tick):
+        if not tick.has_greeks or not tick.ltq:
+            return
+        prev = self.prev_oi[tick.iid]
+        self.prev_oi[tick.iid] = tick.oi
+        if prev is not None and tick.oi > prev and self.verbose:
+            print(f"{tick.key} | {tick.ltq * tick.ltp:.2f}", flush=True)
+
+
+# =========================================================
+# ATM CHANGE LOGGER (LIVE_LOGGING_OF_ALL_COMPANIES)
+# =========================================================
+def find_atm_with_index(option_list, spot, strikes=None):
+    if strikes is None:
+        strikes = [x[0] for x in option_list]
+    idx = bisect.bisect_left(strikes, spot)
+
+    if idx == 0:
+        return option_list[0], 0
+    if idx == len(strikes):
+        return option_list[-1], len(strikes) - 1
+
+    before, after = option_list[idx - 1], option_list[idx]
+    if abs(before[0] - spot) <= abs(after[0] - spot):
+        return before, idx - 1
+    return after, idx
+
+
+class AtmChangeLogger(Detector):
+    name = "atm_change"
+
+    def __init__(self, option_map, underlying_info, offsets=(2, -2)):
+        super().__init__()
+        self.option_map = option_map
+        self.underlying_info = underlying_info
+        self.offsets = offsets
+        self.ladders = []       # iid -> ladders.Ladder for underlyings, else None
+
+    def resize(self, n_instruments):
+        keys = self.pipeline.registry.keys
+        for iid in range(len(self.ladders), n_instruments):
+            option_list = self.option_map.get(keys[iid])
+            self.ladders.append(Ladder(keys[iid], option_list) if option_list else None)
+
+    def on_tick(self, tick):
+        ladder = self.ladders[tick.iid]
+        if ladder is None or not ladder.update(tick.ltp):
+            return      # ATM unchanged: spot is still inside its midpoint band
+        atm_strike, atm_ce, atm_pe = ladder.atm
+
+        print(f"{time.strftime('%H:%M:%S')} | {self.underlying_info.get(tick.key, tick.key)}")
+        print(f"  Spot      : {tick.ltp:.2f}")
+        print(f"  ATM       : {atm_strike} | CE={atm_ce} | PE={atm_pe}")
+        for off in self.offsets:
+            label = f"ATM {'+' if off > 0 else '-'} {abs(off)}"
+            row = ladder.at(off)
+            if row:
+                strike, ce, pe = row
+                print(f"  {label:<10}: {strike} | CE={ce} | PE={pe}")
+            else:
+                print(f"  {label:<10}: N/A")
+        print("-" * 80, flush=True)
+
+
+# =========================================================
+# BAR BUILDER
+# =========================================================
+class BarBuilder(Detector):
+    """OHLCV + closing OI bars per instrument, bucketed on exchange time (ltt)."""
+
+    name = "bar_builder"
+
+    def __init__(self, bar_seconds=60, max_bars=500, on_bar=None):
+        super().__init__()
+        self.bar_ms = int(bar_seconds * 1000)
+        self.max_bars = max_bars
+        self.on_bar = on_bar
+        self.current = []           # iid -> [start_ms, o, h, l, c, volume, oi]
+        self.last_vtt = []
+        self.bars = defaultdict(list)   # key -> closed bars
+
+    def resize(self, n_instruments):
+        grow(self.current, n_instruments, None)
+        grow(self.last_vtt, n_instruments, 0)
+
+    def on_tick(self, tick):
+        iid = tick.iid
+        ts_ms = tick.ltt or int(tick.ts * 1000)
+        start = ts_ms - ts_ms % self.bar_ms
+        prev_vtt = self.last_vtt[iid]
+        self.last_vtt[iid] = tick.vtt
+        qty = tick.vtt - prev_vtt if prev_vtt and tick.vtt >= prev_vtt and not tick.gap else 0
+
+        bar = self.current[iid]
+        if bar is None or start > bar[0]:
+            if bar is not None:
+                self._close(tick.key, bar)
+            self.current[iid] = [start, tick.ltp, tick.ltp, tick.ltp, tick.ltp, qty, tick.oi]
+            return
+        if tick.ltp > bar[2]:
+            bar[2] = tick.ltp
+        if tick.ltp < bar[3]:
+            bar[3] = tick.ltp
+        bar[4] = tick.ltp
+        bar[5] += qty
+        bar[6] = tick.oi
+
+    def backfill_ids(self):
+        return [iid for iid, bar in enumerate(self.current) if bar is not None] if self.bar_ms == 60_000 else []
+
+    def on_backfill(self, iid, candles):
+        """Insert the exchange's 1-minute candles for minutes the gap left empty."""
+        if self.bar_ms != 60_000:
+            return
+        key = self.pipeline.registry.keys[iid]
+        bars = self.bars[key]
+        have = {b[0] for b in bars}
+        current = self.current[iid]
+        if current is not None:
+            have.add(current[0])
+        new = [c for c in candles if c[0] not in have]
+        if new:
+            bars.extend(new)
+            bars.sort()
+            del bars[:-self.max_bars]
+
+    def _close(self, key, bar):
+        bars = self.bars[key]
+        bars.append(tuple(bar))
+        if len(bars) > self.max_bars:
+            del bars[0]
+        if self.on_bar:
+            self.on_bar(key, bar)
@@ -1,32 +1,42 @@
 import asyncio
-import json
-import ssl
-import websockets
-import requests
 import os
-import pandas as pd
 import time
-import pika
-from collections import defaultdict
 from dotenv import load_dotenv
 import MarketDataFeedV3_pb2 as pb
+import metrics
+import profiler
+from alert_schema import CONTENT_TYPE, MAX_BATCH, MESSAGE_TYPE, encode_batch
+from coalescer import AlertCoalescer
+from session import UpstoxSession
+from timer_wheel import TimerWheel
+from detectors import TradeState
+from instruments import InstrumentRegistry, grow, load_instrument_map, load_watch_keys
 
 load_dotenv()
 ACCESS_TOKEN = os.getenv("token")
 
 # --- ENERGY SETTINGS ---
 WINDOW_TIME = 3.0           
-CHECK_INTERVAL = 0.5        
+CHECK_INTERVAL = 0.5        # timer-wheel sweep for idle windows; alerts fire on the tick path
 MIN_VAL_THRESHOLD = 100000  # ₹1 Lakh
 MIN_PRICE_MOVE = 0.00001    
+ERROR_LOG_INTERVAL = 10.0   # at most one "tick processing failed" line per interval
 
 # --- GLOBAL STATE ---
-trade_history = defaultdict(list)
 INSTRUMENT_MAP = {}
-# Track OI globally so we have a value even if a specific tick misses it
-last_trade_info = defaultdict(lambda: {"ltt": 0, "vtt": 0, "oi": 0})
+# Keys are interned to dense ids at subscription; per-instrument state
+# (last ltt/vtt/oi + trade window) lives in a list indexed by that id.
+REGISTRY = InstrumentRegistry()
+trade_state = []
+stale_ids = set()   # ids whose next tick re-baselines after a reconnect
+dirty_ids = set()   # ids that traded in the frame being processed
+expiry = TimerWheel(resolution=CHECK_INTERVAL)
+WORKER_ERRORS = metrics.counter("detector_energy_surge_errors_total", "Frames whose detector / coalescer / sink step raised")
+error_log = [0.0, 0]    # [last logged (monotonic), errors since]
 data_queue = asyncio.Queue()
 alert_queue = asyncio.Queue()  
+# Sustained sweeps on one strike become one evolving alert instead of one per CHECK_INTERVAL
+coalescer = AlertCoalescer(cooldown=5.0, hysteresis=0.5, sinks=[alert_queue.put_nowait])
 
 # --- ASYNC RABBITMQ WORKER ---
 class RabbitMQWorker:
@@ -35,9 +45,12 @@ class RabbitMQWorker:
         self.queue_name = queue_name
         self.connection = None
         self.channel = None
+        self.properties = None
 
     def connect(self):
+        import pika     # only once the worker runs: keeps pika off the path to the first tick
         try:
+            self.properties = pika.BasicProperties(content_type=CONTENT_TYPE, type=MESSAGE_TYPE)
             self.connection = pika.BlockingConnection(pika.ConnectionParameters(host=self.host))
             self.channel = self.connection.channel()
             self.channel.queue_declare(queue=self.queue_name)
@@ -52,132 +65,178 @@ class RabbitMQWorker:
             print("⚠️ RabbitMQ offline. Alerts will be logged but not sent.", flush=True)
 
         while True:
-            alert_data = await alert_queue.get()
+            # Everything queued since the last wake-up goes out as one msgpack batch
+            batch = [await alert_queue.get()]
+            while len(batch) < MAX_BATCH and not alert_queue.empty():
+                batch.append(alert_queue.get_nowait())
             try:
                 if self.channel and not self.channel.is_closed:
+                    t0 = time.perf_counter()
                     self.channel.basic_publish(
                         exchange='',
                         routing_key=self.queue_name,
-                        body=json.dumps(alert_data)
+                        body=encode_batch(batch),
+                        properties=self.properties
                     )
+                    elapsed = time.perf_counter() - t0
+                    metrics.PUBLISH_TIME.record(elapsed)
+                    profiler.PUBLISH.record(elapsed)
             except Exception as e:
                 print(f"⚠️ Failed to publish: {e}. Attempting reconnect...", flush=True)
                 self.connect()
             finally:
-                alert_queue.task_done()
+                for _ in batch:
+                    alert_queue.task_done()
 
 mq_worker = RabbitMQWorker()
 
-def get_market_data_feed_authorize_v3():
-    headers = {"Accept": "application/json", "Authorization": f"Bearer {ACCESS_TOKEN}"}
-    url = "https://api.upstox.com/v3/feed/market-data-feed/authorize"
-    r = requests.get(url, headers=headers)
-    return r.json()
-
 def create_optimized_lookup(active_keys):
     print("🔄 Building optimized instrument map...", flush=True)
-    if not os.path.exists("companies_only.csv"):
-        return {}
-    master_df = pd.read_csv("companies_only.csv")
-    lookup = {}
-    active_set = set(active_keys)
-    for _, row in master_df.iterrows():
-        name, strike = row['name'], row['strike_price']
-        ce_key, pe_key = str(row['ce_instrument_key']), str(row['pe_instrument_key'])
-        if ce_key in active_set: lookup[ce_key] = {"name": name, "strike": strike, "type": "CE"}
-        if pe_key in active_set: lookup[pe_key] = {"name": name, "strike": strike, "type": "PE"}
-    return lookup
+    return load_instrument_map(active_keys)
 
 async def queue_worker():
     while True:
         message = await data_queue.get()
         feed_response = pb.FeedResponse()
         try:
-            feed_response.ParseFromString(message)
+            t0 = time.perf_counter()
+            try:
+                feed_response.ParseFromString(message)
+            except Exception:
+                metrics.DECODE_ERRORS.inc() # Counted, not printed, to prevent log spamming
+                continue
+            t1 = time.perf_counter()
+            profiler.DECODE.record(t1 - t0)
             now = time.time()
+            metrics.record_lag(feed_response.currentTs, now)
+            metrics.FEEDS.inc(len(feed_response.feeds))
+            metrics.FEEDS_PER_FRAME.record(len(feed_response.feeds))
+            # Snapshot after (re)subscribe: vtt jumps across the gap are not trades.
+            initial = feed_response.type == pb.initial_feed
             for key, feed in feed_response.feeds.items():
                 if not feed.HasField('firstLevelWithGreeks'): continue
-                
+
+                iid = REGISTRY.ids.get(key)
+                if iid is None:
+                    iid = REGISTRY.intern(key)
+                    grow(trade_state, len(REGISTRY), TradeState)
+                st = trade_state[iid]
+
                 flwg = feed.firstLevelWithGreeks
                 ltpc = flwg.ltpc
-                vtt, ltt, price = float(flwg.vtt), int(ltpc.ltt), float(ltpc.ltp)
-                
+                vtt, ltt, price = flwg.vtt, ltpc.ltt, ltpc.ltp
+
                 # FIXED: OI is directly under flwg, not inside optionGreeks
-                current_oi = float(flwg.oi) if hasattr(flwg, 'oi') else last_trade_info[key]["oi"]
+                current_oi = flwg.oi
 
-                if ltt > last_trade_info[key]["ltt"] or vtt > last_trade_info[key]["vtt"]:
-                    new_qty = vtt - last_trade_info[key]["vtt"] if last_trade_info[key]["vtt"] > 0 else float(ltpc.ltq)
+                if initial or iid in stale_ids:
+                    stale_ids.discard(iid)
+                    st.ltt, st.vtt, st.oi = ltt, vtt, current_oi
+                    continue
+
+                if ltt > st.ltt or vtt > st.vtt:
+                    new_qty = vtt - st.vtt if st.vtt > 0 else ltpc.ltq
+                    metrics.TRADE_LAG.record(now - ltt / 1000.0)
                     if new_qty > 0:
                         # Append time, value, price, and OI to history
-                        trade_history[key].append((now, price * new_qty, price, current_oi))
-                    
-                    last_trade_info[key].update({"ltt": ltt, "vtt": vtt, "oi": current_oi})
-        except Exception:
-            pass # Silent fail to prevent log spamming
+                        st.trades.append((now, price * new_qty, price, current_oi))
+                        st.value += price * new_qty
+                        dirty_ids.add(iid)
+
+                    st.ltt, st.vtt, st.oi = ltt, vtt, current_oi
+            t2 = time.perf_counter()
+            metrics.DECODE_TIME.record(t2 - t0)
+            profiler.UPDATE.record(t2 - t1)
+            if dirty_ids:
+                for iid in dirty_ids:
+                    check_energy(iid, now)
+                dirty_ids.clear()
+                elapsed = time.perf_counter() - t2
+                metrics.DETECTOR_TIME.record(elapsed)
+                profiler.MONITOR.record(elapsed)
+        except Exception as e:
+            worker_error(e)
         finally:
             data_queue.task_done()
 
+def worker_error(exc):
+    """Detector / coalescer / sink bug on the tick path: counted, logged at most once per ERROR_LOG_INTERVAL."""
+    WORKER_ERRORS.inc()
+    error_log[1] += 1
+    now = time.monotonic()
+    if now - error_log[0] >= ERROR_LOG_INTERVAL:
+        print(f"⚠️ tick processing failed ({error_log[1]}x in the last {ERROR_LOG_INTERVAL:g}s): {exc!r}", flush=True)
+        error_log[0], error_log[1] = now, 0
+
+def check_energy(iid, now):
+    """Evaluate one instrument's window right after it traded (only dirty ids get here)."""
+    st = trade_state[iid]
+    val = st.expire(now - WINDOW_TIME)
+    if val < MIN_VAL_THRESHOLD:
+        expiry.schedule(iid, now + WINDOW_TIME)
+        return
+
+    current_trades = st.trades
+    change = current_trades[-1][2] - current_trades[0][2]
+    
+    # Get latest OI snapshot from the trade history
+    latest_oi = current_trades[-1][3]
+    info = REGISTRY.info[iid]
+    
+    # Original category logic preserved exactly
+    category = "AGGRESSIVE_BUYING" if change > 0 else "BULK_SELLING"
+    if abs(change) < 0.05: category = "STAGNANT_ABSORPTION"
+
+    alert_data = {
+        "ts_ns": time.time_ns(), "iid": iid, "instrument_key": REGISTRY.keys[iid],
+        "ticker": info['name'], "strike": info['strike'], "option_type": info['type'],
+        "value": round(val, 2), "price_move": round(change, 2), 
+        "category": category, "oi": latest_oi, "ltp": current_trades[-1][2]
+    }
+
+    coalescer(alert_data)
+    metrics.ALERTS.inc()
+    
+    # Terminal print with OI
+    print(f" [📤 SENT] {info['name']} {info['type']} | {category} | ₹{val:,.0f} | OI: {latest_oi:,.0f} | {time.strftime('%H:%M:%S')}", flush=True)
+    st.clear()
+
 async def energy_monitor():
-    print("⚡ Real-time Monitor Active (Unbuffered Logs with OI)...", flush=True)
+    """No per-key scan: the wheel hands back only windows whose last trade aged out."""
+    print("⚡ Real-time Monitor Active (event-driven, Unbuffered Logs with OI)...", flush=True)
     while True:
         await asyncio.sleep(CHECK_INTERVAL)
-        now = time.time()
-        for key in list(trade_history.keys()):
-            trade_history[key] = [t for t in trade_history[key] if now - t[0] <= WINDOW_TIME]
-            if not trade_history[key]: continue
-                
-            current_trades = trade_history[key]
-            val, change = sum(t[1] for t in current_trades), current_trades[-1][2] - current_trades[0][2]
-            
-            # Get latest OI snapshot from the trade history
-            latest_oi = current_trades[-1][3]
-            
-            if val >= MIN_VAL_THRESHOLD:
-                info = INSTRUMENT_MAP.get(key, {"name": key, "strike": "", "type": ""})
-                
-                # Original category logic preserved exactly
-                category = "AGGRESSIVE_BUYING" if change > 0 else "BULK_SELLING"
-                if abs(change) < 0.05: category = "STAGNANT_ABSORPTION"
-
-                alert_data = {
-                    "timestamp": time.strftime('%H:%M:%S'),
-                    "ticker": info['name'], "strike": info['strike'], "option_type": info['type'],
-                    "value": round(val, 2), "price_move": round(change, 2), 
-                    "category": category, "oi": latest_oi 
-                }
-
-                alert_queue.put_nowait(alert_data)
-                
-                # Terminal print with OI
-                print(f" [📤 SENT] {info['name']} {info['type']} | {category} | ₹{val:,.0f} | OI: {latest_oi:,.0f} | {time.strftime('%H:%M:%S')}", flush=True)
-                trade_history[key].clear() 
+        t0 = time.perf_counter()
+        for iid in expiry.advance(time.time()):
+            trade_state[iid].clear()
+        profiler.MONITOR.record(time.perf_counter() - t0)
+
+def on_gap(gap):
+    stale_ids.update(range(len(trade_state)))
+
+def enqueue_frame(message, recv=None):
+    data_queue.put_nowait(message)
+    metrics.FRAMES.inc()
+    metrics.QUEUE_DEPTH.set(data_queue.qsize())
 
 async def fetch_market_data(instrument_list):
-    ssl_ctx = ssl.create_default_context()
-    ssl_ctx.check_hostname = ssl_ctx.verify_mode = False
-    
     asyncio.create_task(queue_worker())
     asyncio.create_task(energy_monitor())
     asyncio.create_task(mq_worker.run())
+    asyncio.create_task(coalescer.run())
 
-    while True:
-        try:
-            auth_res = get_market_data_feed_authorize_v3()
-            async with websockets.connect(auth_res["data"]["authorized_redirect_uri"], ssl=ssl_ctx) as ws:
-                print(f"🚀 Streaming {len(instrument_list)} options...", flush=True)
-                # Ensure mode is set to 'option_greeks' to get OI data
-                sub_msg = {"guid": "surge", "method": "sub", "data": {"mode": "option_greeks", "instrumentKeys": instrument_list}}
-                await ws.send(json.dumps(sub_msg).encode("utf-8"))
-                while True:
-                    data_queue.put_nowait(await ws.recv())
-        except Exception as e:
-            print(f"❌ Connection Error: {e}. Reconnecting...", flush=True)
-            await asyncio.sleep(5)
+    print(f"🚀 Streaming {len(instrument_list)} options...", flush=True)
+    # Ensure mode is set to 'option_greeks' to get OI data
+    session = UpstoxSession(instrument_list, "option_greeks", on_message=enqueue_frame, on_gap=on_gap, token=ACCESS_TOKEN, guid="surge")
+    await session.run()
 
 if __name__ == "__main__":
-    df = pd.read_csv("atm_option_table.csv")
-    cols = ["atm_plus_2_ce_instrument","atm_minus_2_pe_instrument"]
-    keys = [str(x) for x in set(df[cols].values.flatten().tolist()) if str(x) != 'nan']
+    # csv module instead of pandas: pandas alone took longer to import than the feed takes to subscribe
+    keys = load_watch_keys()
     if keys:
         INSTRUMENT_MAP = create_optimized_lookup(keys)
+        REGISTRY = InstrumentRegistry(keys, INSTRUMENT_MAP)
+        trade_state = [TradeState() for _ in keys]
+        metrics.start()
+        profiler.install()
         asyncio.run(fetch_market_data(keys))
\ No newline at end of file
@@ -0,0 +1,139 @@
+import asyncio
+import os
+
+from dotenv import load_dotenv
+
+import metrics
+import profiler
+from detectors import AtmChangeLogger, BarBuilder, EnergySurgeDetector, OiIncreaseDetector
+from instruments import InstrumentRegistry, load_instrument_map, load_option_map, load_watch_keys
+from pipeline import Pipeline
+from session import UpstoxSession
+from sinks import RabbitMQSink, print_sink
+
+# =========================================================
+# ONE WEBSOCKET, ONE DECODE, EVERY DETECTOR
+# =========================================================
+# Replaces running gemini*.py, STORING_OI_VALUES.py and new.py side by side:
+# each frame is decoded once and handed to every registered detector.
+load_dotenv()
+ACCESS_TOKEN = os.getenv("token")
+
+# --- DETECTORS TO RUN ---
+ENABLE_ENERGY_SURGE = True
+ENABLE_OI_INCREASE = True
+ENABLE_ATM_LOGGER = False   # also subscribes every underlying from companies_only.csv
+ENABLE_BAR_BUILDER = True
+ENABLE_ORDER_FLOW = False   # aggressor side / book imbalance from depth (orderflow.py), needs FEED_MODE full
+ENABLE_TICK_BUS = False     # mirror ticks into shared memory for tick_bus.TickBusReader
+ENABLE_RECORDER = False     # append ticks to ticks/YYYY-MM-DD/ for backtest.py
+ENABLE_OI_STORE = False     # per-minute OI/volume/value in oi_store.sqlite (python oi_store.py top|surge)
+ENABLE_PAPER_ENGINE = False # paper order simulator, see paper_engine.py
+ENABLE_AUTO_TRADER = False  # alerts → paper orders (needs ENABLE_PAPER_ENGINE)
+USE_RABBITMQ = True
+COALESCE_ALERTS = True      # per-instrument cooldown: one evolving alert per episode (coalescer.py)
+BACKFILL_GAPS = True        # fetch 1-min candles for gaps ≥ pipeline.BACKFILL_MIN_SECONDS
+# per-key modes (subscriptions.py): ltpc for spot/index keys, option_greeks for options,
+# full depth for strikes under alert until they go quiet
+PLAN_SUBSCRIPTIONS = True
+# otherwise one mode for everything: "option_greeks" (level-1 quote), "full" (5-level depth + tbq/tsq)
+# or "full_d30" (30 levels, Upstox Plus); full modes carry greeks/vtt/oi too, so every detector keeps working
+FEED_MODE = "full" if ENABLE_ORDER_FLOW else "option_greeks"
+
+
+def build_pipeline():
+    keys = load_watch_keys()
+    option_map, underlying_info = load_option_map() if ENABLE_ATM_LOGGER else ({}, {})
+    keys = keys + sorted(set(option_map) - set(keys))
+
+    # Intern every subscribed key once; detectors index their state by these ids.
+    pipeline = Pipeline(InstrumentRegistry(keys, load_instrument_map(keys)))
+
+    if ENABLE_ENERGY_SURGE:
+        pipeline.register(EnergySurgeDetector())
+    if ENABLE_OI_INCREASE:
+        pipeline.register(OiIncreaseDetector())
+    if ENABLE_ATM_LOGGER:
+        pipeline.register(AtmChangeLogger(option_map, underlying_info))
+    if ENABLE_BAR_BUILDER:
+        pipeline.register(BarBuilder())
+    if ENABLE_ORDER_FLOW:
+        from orderflow import OrderFlowDetector
+        pipeline.register(OrderFlowDetector(depth=30 if FEED_MODE == "full_d30" else 5))
+    if ENABLE_RECORDER:
+        from recorder import TickRecorder
+        pipeline.register(TickRecorder())
+    if ENABLE_OI_STORE:
+        from oi_store import OiStore
+        pipeline.register(OiStore())
+    if ENABLE_TICK_BUS:
+        from tick_bus import TickBusPublisher, TickBusWriter
+        pipeline.register(TickBusPublisher(TickBusWriter(registry=pipeline.registry)))
+    # Downstream consumers hang off pipeline.alerts: the coalescer when enabled.
+    pipeline.alerts = pipeline
+    if COALESCE_ALERTS:
+        from coalescer import AlertCoalescer
+        pipeline.alerts = pipeline.add_sink(AlertCoalescer())
+    pipeline.alerts.add_sink(print_sink)
+    if ENABLE_PAPER_ENGINE:
+        from paper_engine import PaperEngine
+        engine = pipeline.register(PaperEngine(report_interval=30))
+        if ENABLE_AUTO_TRADER:
+            from auto_trader import AutoTrader
+            pipeline.trader = pipeline.add_sink(AutoTrader(engine))
+    return pipeline, keys
+
+
+def start_background(pipeline, mq_sink=None):
+    """Detector timers, alert publishing and reporting tasks (needs a running loop)."""
+    pipeline.start_timers()
+    if mq_sink:
+        asyncio.create_task(mq_sink.run())
+    if pipeline.alerts is not pipeline:
+        asyncio.create_task(pipeline.alerts.run())
+    if getattr(pipeline, "trader", None):
+        from auto_trader import report_loop
+        asyncio.create_task(report_loop(pipeline.trader))
+
+
+async def fetch_market_data(pipeline, instrument_list, mq_sink=None, on_message=None, mode=FEED_MODE,
+                            plan=PLAN_SUBSCRIPTIONS, backfill=BACKFILL_GAPS):
+    """``on_message`` replaces pipeline.process, e.g. runmode.ThreadDecoder.submit;
+    ``mode``/``plan``/``backfill`` default to the flags above (upstox_paper.py passes its own)."""
+    start_background(pipeline, mq_sink)
+    names = ", ".join(d.name for d in pipeline.detectors)
+    print(f"🚀 Streaming {len(instrument_list)} instruments → [{names}]", flush=True)
+    if backfill:
+        from backfill import Backfiller
+        pipeline.backfiller = Backfiller(ACCESS_TOKEN)
+    session = UpstoxSession(() if plan else instrument_list, mode,
+                            on_message=on_message or pipeline.process, on_gap=pipeline.on_gap,
+                            feed_clock=lambda: pipeline.last_ts, token=ACCESS_TOKEN, guid="ingest")
+    pipeline.session = session
+    if plan:
+        await start_planner(pipeline, session, instrument_list, mode)
+    await session.run()
+
+
+async def start_planner(pipeline, session, instrument_list, mode=FEED_MODE):
+    """Per-key modes for ``session`` (subscriptions.py), promoted by pipeline.alerts."""
+    from subscriptions import FULL, FULL_D30, LTPC, SubscriptionPlanner, base_mode
+
+    def base(key):      # spot stays on ltpc; options start in ``mode`` (full depth for order flow)
+        return LTPC if base_mode(key) == LTPC else mode
+    planner = pipeline.alerts.add_sink(SubscriptionPlanner(session, FULL_D30 if mode == FULL_D30 else FULL,
+                                                           base=base))
+    await planner.assign(instrument_list)
+    asyncio.create_task(planner.run())
+    return planner
+
+
+if __name__ == "__main__":
+    pipeline, keys = build_pipeline()
+    mq_sink = pipeline.alerts.add_sink(RabbitMQSink()) if USE_RABBITMQ else None
+    if keys:
+        metrics.start()
+        profiler.install()
+        asyncio.run(fetch_market_data(pipeline, keys, mq_sink))
+    else:
+        print("no instrument keys")
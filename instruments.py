@@ -0,0 +1,133 @@
+import csv
+import os
+from collections import defaultdict
+
+COMPANIES_CSV = "companies_only.csv"
+ATM_TABLE_CSV = "atm_option_table.csv"
+
+
+# =========================================================
+# CSV LOADERS (RUN ONCE AT STARTUP)
+# =========================================================
+def read_rows(path):
+    with open(path, newline="") as f:
+        return list(csv.DictReader(f))
+
+
+def _clean(value):
+    value = (value or "").strip()
+    return value if value and value.lower() != "nan" else None
+
+
+def load_watch_keys(path=ATM_TABLE_CSV, cols=("atm_plus_2_ce_instrument", "atm_minus_2_pe_instrument")):
+    """Unique option keys from the ATM table built by GETTING_ATM+2_ATM-2.py."""
+    keys = set()
+    for row in read_rows(path):
+        for col in cols:
+            key = _clean(row.get(col))
+            if key:
+                keys.add(key)
+    return sorted(keys)
+
+
+def load_instrument_map(active_keys, path=COMPANIES_CSV):
+    """option key -> {name, strike, type, lot_size} for ONLY the keys we watch."""
+    if not os.path.exists(path):
+        return {}
+    active = set(active_keys)
+    lookup = {}
+    for row in read_rows(path):
+        name, strike = row["name"], float(row["strike_price"])
+        lot = int(float(row.get("lot_size") or 1))
+        for col, typ in (("ce_instrument_key", "CE"), ("pe_instrument_key", "PE")):
+            key = _clean(row.get(col))
+            if key in active:
+                lookup[key] = {"name": name, "strike": strike, "type": typ, "lot_size": lot}
+    return lookup
+
+
+def load_lot_sizes(path=COMPANIES_CSV):
+    """option key -> lot size for every CE/PE in companies_only.csv."""
+    lots = {}
+    for row in read_rows(path):
+        lot = int(float(row.get("lot_size") or 1))
+        for col in ("ce_instrument_key", "pe_instrument_key"):
+            key = _clean(row.get(col))
+            if key:
+                lots[key] = lot
+    return lots
+
+
+def load_option_map(path=COMPANIES_CSV):
+    """underlying_key -> [(strike, ce_key, pe_key)] sorted by strike, plus underlying -> symbol."""
+    option_map = defaultdict(list)
+    underlying_info = {}
+    for row in read_rows(path):
+        strike = _clean(row.get("strike_price"))
+        if strike is None:
+            continue
+        underlying = row["underlying_key"]
+        underlying_info.setdefault(underlying, row.get("asset_symbol") or row["name"])
+        option_map[underlying].append(
+            (float(strike), _clean(row.get("ce_instrument_key")), _clean(row.get("pe_instrument_key")))
+        )
+    for k in option_map:
+        option_map[k].sort(key=lambda x: x[0])
+    return dict(option_map), underlying_info
+
+
+# =========================================================
+# INTERNED INSTRUMENT IDS
+# =========================================================
+class InstrumentRegistry:
+    """Maps "NSE_FO|148243"-style keys to dense ints, once, at subscription time.
+
+    Hot-path state is then kept in lists / NumPy arrays indexed by that id
+    instead of dicts keyed by strings.
+    """
+
+    def __init__(self, keys=(), instrument_map=None):
+        self.ids = {}
+        self.keys = []
+        self.info = []
+        self.instrument_map = instrument_map or {}
+        self.intern_all(keys)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        return key in self.ids
+
+    def intern(self, key):
+        iid = self.ids.get(key)
+        if iid is None:
+            iid = self.ids[key] = len(self.keys)
+            self.keys.append(key)
+            self.info.append(self.instrument_map.get(key, {"name": key, "strike": "", "type": ""}))
+        return iid
+
+    def intern_all(self, keys):
+        return [self.intern(k) for k in keys]
+
+    def id_of(self, key):
+        return self.ids.get(key)
+
+    def key(self, iid):
+        return self.keys[iid]
+
+    def array(self, dtype="f8", fill=0, size=None):
+        """Per-instrument column sized for every id registered so far."""
+        import numpy as np
+        return np.full(size or len(self.keys), fill, dtype=dtype)
+
+
+def grow(column, size, fill=0):
+    """Return ``column`` extended to ``size`` entries (NumPy array or list)."""
+    if len(column) >= size:
+        return column
+    if not isinstance(column, list):     # an ndarray: numpy is loaded already, only its users pay the import
+        import numpy as np
+        return np.concatenate((column, np.full(size - len(column), fill, dtype=column.dtype)))
+    column.extend(fill() if callable(fill) else fill for _ in range(size - len(column)))
+    return column
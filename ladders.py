@@ -0,0 +1,194 @@
+"""Option ladders per underlying: O(1) ATM tracking and lazy leg subscriptions.
+
+Each Ladder keeps its strikes and the midpoints between neighbouring
+strikes. The ATM index only changes when spot leaves the current
+(lower-midpoint, upper-midpoint] band, so a spot tick costs two float
+comparisons; the bisect over the midpoints runs only on a crossing.
+(Ties go to the lower strike, as in detectors.find_atm_with_index.)
+
+LadderManager subscribes the option legs (e.g. ATM CE/PE, ATM+2 CE,
+ATM-2 PE) of an underlying only once its spot has ticked, shifts them when
+the ATM moves, and keeps the total number of leg keys within ``budget``
+by releasing the underlyings whose ATM has been quiet longest.
+
+    python ladders.py --check
+"""
+import bisect
+from collections import OrderedDict
+
+# =========================================================
+# CONFIG
+# =========================================================
+LEGS = ((0, "CE"), (0, "PE"), (2, "CE"), (-2, "PE"))     # (strike offset from ATM, side)
+LADDER_BUDGET = 1000     # option keys subscribed across all ladders
+
+
+class Ladder:
+    """One underlying's strikes (ascending) with the ATM cached between midpoint boundaries."""
+
+    __slots__ = ("underlying", "options", "strikes", "mids", "atm_idx", "lo", "hi")
+
+    def __init__(self, underlying, options):
+        self.underlying = underlying
+        self.options = options          # [(strike, ce_key, pe_key)] sorted by strike
+        self.strikes = [o[0] for o in options]
+        self.mids = [(a + b) / 2 for a, b in zip(self.strikes, self.strikes[1:])]
+        self.atm_idx = -1
+        self.lo = self.hi = float("nan")    # nothing cached: the first update always moves
+
+    def update(self, spot):
+        """True when ``spot`` moved the ATM strike (or set it for the first time)."""
+        if self.lo < spot <= self.hi:
+            return False
+        i = bisect.bisect_left(self.mids, spot)
+        self.lo = self.mids[i - 1] if i > 0 else float("-inf")
+        self.hi = self.mids[i] if i < len(self.mids) else float("inf")
+        if i == self.atm_idx:
+            return False
+        self.atm_idx = i
+        return True
+
+    @property
+    def atm(self):
+        """(strike, ce_key, pe_key) at the money, None before the first update."""
+        return self.options[self.atm_idx] if self.atm_idx >= 0 else None
+
+    def at(self, offset):
+        i = self.atm_idx + offset
+        return self.options[i] if self.atm_idx >= 0 and 0 <= i < len(self.options) else None
+
+    def legs(self, legs=LEGS):
+        keys = []
+        for offset, side in legs:
+            row = self.at(offset)
+            key = row and row[1 if side == "CE" else 2]
+            if key:
+                keys.append(key)
+        return keys
+
+
+class LadderManager:
+    """Ladders for every underlying in ``option_map`` plus their subscribed legs.
+
+    ``update(underlying_key, spot)`` is the spot-tick hook and returns the
+    Ladder when its ATM moved (else None). Leg changes go to
+    ``subscriber.add(keys)`` / ``subscriber.remove(keys)``, a
+    subscriptions.SubscriptionPlanner in the live scripts.
+    """
+
+    def __init__(self, option_map, subscriber=None, legs=LEGS, budget=LADDER_BUDGET):
+        self.ladders = {k: Ladder(k, options) for k, options in option_map.items() if options}
+        self.subscriber = subscriber
+        self.legs = legs
+        self.budget = budget
+        self.active = OrderedDict()     # underlying -> subscribed leg keys, least recently moved first
+        self.n_keys = 0
+        self.moves = 0
+        self.evictions = 0
+
+    def __getitem__(self, underlying):
+        return self.ladders[underlying]
+
+    def update(self, underlying, spot):
+        ladder = self.ladders.get(underlying)
+        if ladder is None or not ladder.update(spot):
+            return None
+        self.moves += 1
+        self._resubscribe(ladder)
+        return ladder
+
+    def _resubscribe(self, ladder):
+        old = self.active.pop(ladder.underlying, [])
+        new = ladder.legs(self.legs)
+        self.active[ladder.underlying] = new
+        self.n_keys += len(new) - len(old)
+        keep, had = set(new), set(old)
+        drop = [k for k in old if k not in keep]
+        add = [k for k in new if k not in had]
+        while self.n_keys > self.budget and len(self.active) > 1:
+            _, evicted = self.active.popitem(last=False)
+            self.n_keys -= len(evicted)
+            self.evictions += 1
+            drop.extend(evicted)
+        if self.subscriber is not None:
+            if drop:
+                self.subscriber.remove(drop)
+            if add:
+                self.subscriber.add(add)
+
+    def release(self, underlying):
+        """Unsubscribe one underlying's legs (they come back on its next ATM move)."""
+        keys = self.active.pop(underlying, [])
+        self.n_keys -= len(keys)
+        if keys and self.subscriber is not None:
+            self.subscriber.remove(keys)
+
+    def keys(self):
+        return [k for keys in self.active.values() for k in keys]
+
+
+# =========================================================
+# SELF-CHECK
+# =========================================================
+def _check(n=200_000):
+    import random
+    import time
+
+    from detectors import find_atm_with_index
+
+    rng = random.Random(5)
+    options = [(1000.0 + 10 * s + (5 if s > 20 else 0), f"CE{s}", f"PE{s}") for s in range(60)]
+    ladder = Ladder("NSE_EQ|X", options)
+    spot, moves = 1250.0, 0
+    spots = []
+    for _ in range(n):
+        spot = min(max(spot + rng.gauss(0, 0.8), 980.0), 1620.0)
+        spots.append(round(spot, 1) if rng.random() < 0.3 else spot)     # hit exact midpoints too
+    for s in spots[:20_000]:
+        moves += ladder.update(s)
+        assert ladder.atm == find_atm_with_index(options, s)[0], (s, ladder.atm)
+    strikes = ladder.strikes
+    t0 = time.perf_counter()
+    for s in spots:
+        find_atm_with_index(options, s, strikes)
+    t_bisect = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    for s in spots:
+        ladder.update(s)
+    t_ladder = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    for s in spots:
+        find_atm_with_index(options, s)
+    t_rebuild = time.perf_counter() - t0
+
+    class Subscriber:
+        def __init__(self):
+            self.keys = set()
+
+        def add(self, keys):
+            self.keys.update(keys)
+
+        def remove(self, keys):
+            self.keys.difference_update(keys)
+
+    sub = Subscriber()
+    option_map = {f"U{u}": [(100.0 + s, f"U{u}CE{s}", f"U{u}PE{s}") for s in range(20)] for u in range(50)}
+    manager = LadderManager(option_map, sub, budget=40)
+    for u in range(50):
+        manager.update(f"U{u}", 110.0)
+    assert len(sub.keys) == manager.n_keys <= 40 and set(manager.keys()) == sub.keys, (len(sub.keys), manager.n_keys)
+    manager.update("U49", 112.0)
+    assert set(manager["U49"].legs()) <= sub.keys and sub.keys == set(manager.keys())
+    print(f"✅ ladder ok: {moves} ATM moves in 20k ticks match find_atm_with_index; per tick "
+          f"{t_ladder / n * 1e9:.0f} ns cached vs {t_bisect / n * 1e9:.0f} ns bisect vs "
+          f"{t_rebuild / n * 1e9:.0f} ns rebuilding strikes; budget 40 → {len(sub.keys)} keys, "
+          f"{manager.evictions} evictions")
+
+
+if __name__ == "__main__":
+    import sys
+
+    if "--check" in sys.argv:
+        _check()
+    else:
+        print(__doc__)
@@ -0,0 +1,272 @@
+import os
+import sys
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl
+from dotenv import load_dotenv
+
+# =========================================================
+# CONFIG
+# =========================================================
+# Everything here is a no-op unless METRICS=1 is set in the env / .env,
+# so the feed scripts can call into it unconditionally.
+load_dotenv()
+ENABLED = os.getenv("METRICS", "0") == "1"
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))
+LOG_INTERVAL = float(os.getenv("METRICS_LOG_INTERVAL", "10"))
+
+# HDR-style layout: 32 linear buckets, then 16 sub-buckets per power of two
+# (~6% relative error) up to 2**MAX_EXPONENT recorded units.
+SUB_BUCKETS = 16
+LINEAR_LIMIT = 2 * SUB_BUCKETS
+MAX_EXPONENT = 40
+
+
+# =========================================================
+# METRIC TYPES
+# =========================================================
+class Counter:
+    __slots__ = ("name", "help", "value")
+    kind = "counter"
+
+    def __init__(self, name, help=""):
+        self.name = name
+        self.help = help
+        self.value = 0
+
+    def inc(self, n=1):
+        self.value += n
+
+
+class Gauge:
+    __slots__ = ("name", "help", "value")
+    kind = "gauge"
+
+    def __init__(self, name, help=""):
+        self.name = name
+        self.help = help
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+
+class Histogram:
+    """Log-linear bucketed histogram; ``scale`` converts values to integer units."""
+
+    __slots__ = ("name", "help", "scale", "counts", "count", "total", "max")
+    kind = "summary"
+
+    def __init__(self, name, help="", scale=1_000_000):
+        self.name = name
+        self.help = help
+        self.scale = scale
+        self.counts = [0] * (SUB_BUCKETS * (MAX_EXPONENT + 2))
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, value):
+        if value < 0:
+            value = 0.0
+        units = int(value * self.scale)
+        if units < LINEAR_LIMIT:
+            idx = units
+        else:
+            exp = units.bit_length() - 5
+            if exp > MAX_EXPONENT:
+                exp, units = MAX_EXPONENT, (LINEAR_LIMIT << MAX_EXPONENT) - 1
+            idx = exp * SUB_BUCKETS + (units >> exp)
+        self.counts[idx] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, q):
+        if not self.count:
+            return 0.0
+        target = q / 100.0 * self.count
+        seen = 0
+        for idx, c in enumerate(self.counts):
+            if not c:
+                continue
+            seen += c
+            if seen >= target:
+                return min(_bucket_upper(idx) / self.scale, self.max)
+        return self.max
+
+    def reset(self):
+        self.counts = [0] * len(self.counts)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+
+def _bucket_upper(idx):
+    if idx < LINEAR_LIMIT:
+        return idx + 1
+    exp = idx // SUB_BUCKETS - 1
+    return (idx - exp * SUB_BUCKETS + 1) << exp
+
+
+class _NullMetric:
+    """Stand-in returned while metrics are disabled: every call is a no-op."""
+
+    __slots__ = ()
+    value = 0
+    count = 0
+
+    def inc(self, n=1):
+        pass
+
+    def set(self, value):
+        pass
+
+    def record(self, value):
+        pass
+
+    def percentile(self, q):
+        return 0.0
+
+
+_NULL = _NullMetric()
+REGISTRY = {}
+
+
+def _register(cls, name, help, **kw):
+    if not ENABLED:
+        return _NULL
+    metric = REGISTRY.get(name)
+    if metric is None:
+        metric = REGISTRY[name] = cls(name, help, **kw)
+    return metric
+
+
+def counter(name, help=""):
+    return _register(Counter, name, help)
+
+
+def gauge(name, help=""):
+    return _register(Gauge, name, help)
+
+
+def histogram(name, help="", scale=1_000_000):
+    return _register(Histogram, name, help, scale=scale)
+
+
+# =========================================================
+# SHARED FEED METRICS (same names in every consumer)
+# =========================================================
+FRAMES = counter("feed_frames_total", "Websocket frames received")
+FEEDS = counter("feed_feeds_total", "Instrument feeds decoded")
+DECODE_ERRORS = counter("feed_decode_errors_total", "Frames that failed to decode (protobuf parse)")
+FEEDS_PER_FRAME = histogram("feed_feeds_per_frame", "Instrument feeds per frame", scale=1)
+DECODE_TIME = histogram("feed_decode_seconds", "Protobuf decode + field extraction time")
+FRAME_LAG = histogram("feed_frame_lag_seconds", "Wall clock minus FeedResponse.currentTs")
+TRADE_LAG = histogram("feed_trade_lag_seconds", "Wall clock minus ltpc.ltt")
+QUEUE_DEPTH = gauge("feed_queue_depth", "Frames waiting in the decode queue")
+DETECTOR_TIME = histogram("detector_cycle_seconds", "Detector time per evaluation cycle")
+ALERTS = counter("alerts_total", "Alerts produced by detectors")
+PUBLISH_TIME = histogram("publish_seconds", "Alert publish latency")
+
+
+def record_lag(current_ts_ms, now=None):
+    """Exchange-to-receive lag from an epoch-ms stamp (currentTs / ltt)."""
+    if ENABLED and current_ts_ms:
+        FRAME_LAG.record((now or time.time()) - current_ts_ms / 1000.0)
+
+
+# =========================================================
+# EXPORT: PROMETHEUS TEXT + PERIODIC LOG LINE
+# =========================================================
+QUANTILES = (50, 90, 99, 99.9)
+
+
+def render_prometheus():
+    lines = []
+    for name, m in sorted(REGISTRY.items()):
+        if m.help:
+            lines.append(f"# HELP {name} {m.help}")
+        lines.append(f"# TYPE {name} {m.kind}")
+        if m.kind == "summary":
+            for q in QUANTILES:
+                lines.append(f'{name}{{quantile="{q / 100:g}"}} {m.percentile(q):.9g}')
+            lines.append(f"{name}_sum {m.total:.9g}")
+            lines.append(f"{name}_count {m.count}")
+        else:
+            lines.append(f"{name} {m.value}")
+    return "\n".join(lines) + "\n"
+
+
+# Extra GET paths served next to /metrics: path -> fn(query dict) -> (status, content type, body bytes)
+ROUTES = {}
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        path, _, query = self.path.partition("?")
+        if path in ROUTES:
+            try:
+                status, content_type, body = ROUTES[path](dict(parse_qsl(query)))
+            except Exception as e:
+                status, content_type, body = 500, "text/plain", f"{e}\n".encode()
+        elif path == "/metrics":
+            status, content_type, body = 200, "text/plain; version=0.0.4", render_prometheus().encode()
+        else:
+            self.send_error(404)
+            return
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, fmt, *args):
+        pass
+
+
+def summary_line(prev, elapsed):
+    """One compact line; ``prev`` holds counter values from the previous call."""
+    parts = []
+    for name, m in sorted(REGISTRY.items()):
+        short = name.replace("_total", "").replace("_seconds", "")
+        if m.kind == "counter":
+            rate = (m.value - prev.get(name, 0)) / elapsed if elapsed > 0 else 0.0
+            prev[name] = m.value
+            parts.append(f"{short}={rate:,.1f}/s")
+        elif m.kind == "gauge":
+            parts.append(f"{short}={m.value}")
+        elif m.count:
+            if m.scale == 1:
+                parts.append(f"{short} p50={m.percentile(50):.0f} p99={m.percentile(99):.0f}")
+            else:
+                parts.append(
+                    f"{short} p50={m.percentile(50) * 1e3:.2f}ms p99={m.percentile(99) * 1e3:.2f}ms"
+                )
+    return " | ".join(parts)
+
+
+def _log_loop(interval):
+    prev = {}
+    last = time.monotonic()
+    while True:
+        time.sleep(interval)
+        now = time.monotonic()
+        print(f"📊 {time.strftime('%H:%M:%S')} {summary_line(prev, now - last)}", file=sys.stderr, flush=True)
+        last = now
+
+
+def start(port=None, log_interval=None):
+    """Start the /metrics endpoint and the periodic log thread (no-op when disabled)."""
+    if not ENABLED:
+        return None
+    server = ThreadingHTTPServer((METRICS_HOST, METRICS_PORT if port is None else port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True, name="metrics-http").start()
+    interval = LOG_INTERVAL if log_interval is None else log_interval
+    if interval > 0:
+        threading.Thread(target=_log_loop, args=(interval,), daemon=True, name="metrics-log").start()
+    print(f"📊 Metrics on http://{METRICS_HOST}:{server.server_address[1]}/metrics", flush=True)
+    return server
@@ -0,0 +1,440 @@
+"""Local stand-in for api.upstox.com: REST + protobuf market-data websocket on one port.
+
+    python mock_upstox.py --rate 20000 --disconnect-every 30 --latency-ms 40
+    UPSTOX_BASE_URL=http://127.0.0.1:8765 python ingest.py       # any consumer, no token needed
+
+Serves
+    GET /v3/feed/market-data-feed/authorize          → ws://host:port/v3/feed/market-data-feed?code=N
+    GET /v3/market-quote/ltp?instrument_key=A,B      → last_price / cp / volume per key
+    GET /v3/historical-candle/intraday/{key}/minutes/1   → one session of 1-minute candles up to now (backfill.py)
+    WS  /v3/feed/market-data-feed                    → market_info, then FeedResponse frames
+
+The websocket speaks the v3 protocol: binary JSON {"guid", "method":
+sub|unsub|change_mode, "data": {"mode", "instrumentKeys"}}; every sub or
+change_mode is answered with an initial_feed snapshot of those keys, then
+live_feed frames carry ``rate`` ticks/s per connection over the subscribed
+keys, each in its own mode (a key updates at most once per frame, so a
+small subscription needs a shorter ``--frame-ms`` to reach the rate). Prices, vtt and OI come from
+benchmarks/feedgen.Market (ATM-heavy rates, lots, drifting OI); real
+instrument keys are accepted and ticked as well.
+
+Fault injection: ``--latency-ms``/``--jitter-ms`` hold each frame back that
+long after its currentTs (order kept), ``--disconnect-every S`` drops every
+connection after S seconds ±50% (``--disconnect-mode abort`` kills the TCP
+connection without a close frame).
+
+    python mock_upstox.py --write-csv mock_data   # companies_only.csv + atm_option_table.csv for the universe
+    python mock_upstox.py --check                 # session + pipeline against it, ticks/s reached
+"""
+import argparse
+import asyncio
+import csv
+import http
+import json
+import math
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from urllib.parse import parse_qsl, unquote
+
+import websockets
+from dotenv import load_dotenv
+from websockets.datastructures import Headers
+from websockets.http11 import Response
+
+import MarketDataFeedV3_pb2 as pb
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks"))
+from feedgen import Market  # noqa: E402
+
+# =========================================================
+# CONFIG
+# =========================================================
+load_dotenv()
+MOCK_HOST = os.getenv("MOCK_HOST", "127.0.0.1")
+MOCK_PORT = int(os.getenv("MOCK_PORT", "8765"))
+MOCK_TOKEN = os.getenv("MOCK_TOKEN")           # when set, REST calls must carry "Bearer <MOCK_TOKEN>"
+RATE = 10_000            # ticks/s per connection
+FRAME_MS = 50
+UNDERLYINGS = 200
+STRIKES = 21
+STATS_EVERY = 5.0
+
+FEED_PATH = "/v3/feed/market-data-feed"
+AUTHORIZE_PATH = "/v3/feed/market-data-feed/authorize"
+LTP_PATH = "/v3/market-quote/ltp"
+INTRADAY_PREFIX = "/v3/historical-candle/intraday/"
+IST = timezone(timedelta(hours=5, minutes=30))
+
+
+def _json(status, payload):
+    body = json.dumps(payload).encode()
+    headers = Headers([("Content-Type", "application/json"), ("Content-Length", str(len(body))),
+                       ("Connection", "close")])
+    return Response(status, http.HTTPStatus(status).phrase, headers, body)
+
+
+class MockUpstox:
+    """One shared Market ticked to every connected websocket."""
+
+    def __init__(self, market=None, rate=RATE, frame_ms=FRAME_MS, latency_ms=0.0, jitter_ms=0.0,
+                 disconnect_every=0.0, disconnect_mode="close", token=MOCK_TOKEN):
+        self.market = market or Market(UNDERLYINGS, STRIKES)
+        self.rate = rate
+        self.frame_ms = frame_ms
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.disconnect_every = disconnect_every
+        self.disconnect_mode = disconnect_mode
+        self.token = token
+        self.host = self.port = None
+        self.codes = 0
+        self.connections = 0
+        self.open = 0
+        self.frames = 0
+        self.ticks = 0
+        self.disconnects = 0
+        self.requests = {}      # method/path -> count
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}"
+
+    # -------------------------------
+    # REST
+    # -------------------------------
+    def process_request(self, connection, request):
+        path, _, query = request.path.partition("?")
+        if path == FEED_PATH:
+            return None         # websocket upgrade
+        self.requests[path] = self.requests.get(path, 0) + 1
+        if self.token and request.headers.get("Authorization") != f"Bearer {self.token}":
+            return _json(401, {"status": "error", "errors": [{"errorCode": "UDAPI100050",
+                                                               "message": "Invalid token used to access API"}]})
+        if path == AUTHORIZE_PATH:
+            self.codes += 1
+            uri = f"ws://{self.host}:{self.port}{FEED_PATH}?code={self.codes}"
+            return _json(200, {"status": "success", "data": {"authorizedRedirectUri": uri,
+                                                              "authorized_redirect_uri": uri}})
+        if path == LTP_PATH:
+            keys = dict(parse_qsl(query)).get("instrument_key", "")
+            return _json(200, {"status": "success", "data": self.ltp([k for k in keys.split(",") if k])})
+        if path.startswith(INTRADAY_PREFIX):
+            key = unquote(path[len(INTRADAY_PREFIX):].split("/")[0])
+            return _json(200, {"status": "success", "data": {"candles": self.intraday(key)}})
+        return _json(404, {"status": "error", "errors": [{"message": f"no mock for {path}"}]})
+
+    def _price(self, key):
+        market = self.market
+        if key not in market.spot and key not in market.state:
+            market.add(key)
+        return market.option_price(key) if key in market.state else market.spot[key]
+
+    def ltp(self, keys):
+        market = self.market
+        out = {}
+        for key in keys:
+            price = self._price(key)
+            name = market.underlying_info.get(key) or market.info.get(key, {}).get("name") or key.split("|")[-1]
+            out[f"{key.split('|')[0]}:{name}"] = {
+                "last_price": price, "instrument_token": key, "ltq": 1, "cp": round(price * 0.99, 2),
+                "volume": market.state[key][4] if key in market.state else 0,
+            }
+        return out
+
+    def intraday(self, key, now=None):
+        """Newest-first [ts, o, h, l, c, volume, oi] for the 375 minutes (one NSE session) up to now,
+        whatever the wall-clock hour, so back-fills work outside market hours too."""
+        rng = random.Random(key)
+        now = datetime.fromtimestamp(now or time.time(), IST).replace(second=0, microsecond=0)
+        minute = now - timedelta(minutes=374)
+        price = self._price(key)
+        oi = self.market.state[key][5] if key in self.market.state else 0.0
+        rows = []
+        while minute <= now:
+            o = price
+            c = max(0.05, round(o * (1 + rng.gauss(0, 0.002)), 2))
+            rows.append([minute.isoformat(), o, max(o, c) * 1.001, min(o, c) * 0.999, c, rng.randint(0, 50_000), oi])
+            price = c
+            minute += timedelta(minutes=1)
+        return rows[::-1]
+
+    # -------------------------------
+    # WEBSOCKET
+    # -------------------------------
+    async def handler(self, ws):
+        self.connections += 1
+        self.open += 1
+        subs = {}                       # key -> mode
+        view = {"keys": [], "cum": []}
+        loop = asyncio.get_running_loop()
+        outbox = asyncio.Queue()
+        tasks = [asyncio.create_task(self._read(ws, subs, view, outbox)),
+                 asyncio.create_task(self._send(ws, outbox))]
+        info = pb.FeedResponse(type=pb.market_info, currentTs=int(time.time() * 1000))
+        for segment in ("NSE_EQ", "NSE_FO", "NSE_INDEX", "BSE_EQ", "BSE_FO", "MCX_FO"):
+            info.marketInfo.segmentStatus[segment] = pb.NORMAL_OPEN
+        outbox.put_nowait((0.0, info.SerializeToString()))
+        until = loop.time() + self.disconnect_every * random.uniform(0.5, 1.5) if self.disconnect_every else math.inf
+        tasks.append(asyncio.create_task(self._stream(ws, subs, view, outbox, until)))
+        try:
+            # client gone (read ends), send failed or scheduled disconnect: whichever comes first
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            self.open -= 1
+            for task in tasks:
+                task.cancel()
+
+    async def _read(self, ws, subs, view, outbox):
+        market = self.market
+        try:
+            async for raw in ws:
+                msg = json.loads(raw)
+                data = msg.get("data", {})
+                keys, mode = data.get("instrumentKeys", []), data.get("mode")
+                method = msg.get("method")
+                if method == "sub":
+                    subs.update(dict.fromkeys(keys, mode))
+                elif method == "change_mode":
+                    keys = [k for k in keys if k in subs]
+                    subs.update(dict.fromkeys(keys, mode))
+                elif method == "unsub":
+                    for k in keys:
+                        subs.pop(k, None)
+                    keys = []
+                else:
+                    continue
+                view["keys"] = list(subs)
+                view["cum"] = market.cumulative(view["keys"])
+                if keys:
+                    ts = int(time.time() * 1000)
+                    outbox.put_nowait((0.0, market.snapshot(ts, {k: subs[k] for k in keys})))
+        except websockets.ConnectionClosed:
+            pass
+
+    async def _send(self, ws, outbox):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                due, frame = await outbox.get()
+                wait = due - loop.time()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                await ws.send(frame)
+        except websockets.ConnectionClosed:
+            pass
+
+    async def _stream(self, ws, subs, view, outbox, until):
+        loop = asyncio.get_running_loop()
+        rng = random.Random()
+        market = self.market
+        frame_s = self.frame_ms / 1000
+        per_frame = self.rate * frame_s
+        next_at = due = loop.time()
+        while True:
+            next_at += frame_s
+            delay = next_at - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                next_at = loop.time()       # generation fell behind: slower, not bursty
+            now = loop.time()
+            if now >= until:
+                await self._disconnect(ws)
+                return
+            keys = view["keys"]
+            if not keys:
+                continue
+            n = max(1, int(rng.gauss(per_frame, math.sqrt(per_frame))))
+            frame = market.live_frame(keys, view["cum"], n, int(time.time() * 1000), subs)
+            self.frames += 1
+            self.ticks += market.last_feeds
+            due = max(due, now + self.latency + (rng.uniform(0, self.jitter) if self.jitter else 0.0))
+            outbox.put_nowait((due, frame))
+            if outbox.qsize() > 1000:
+                await asyncio.sleep(0)      # client not reading: don't grow without bound
+
+    async def _disconnect(self, ws):
+        self.disconnects += 1
+        if self.disconnect_mode == "abort":
+            ws.transport.abort()
+        else:
+            await ws.close(1001, "mock disconnect")
+
+    # -------------------------------
+    # SERVER
+    # -------------------------------
+    async def start(self, host=MOCK_HOST, port=MOCK_PORT):
+        server = await websockets.serve(self.handler, host, port, process_request=self.process_request,
+                                        max_size=None, compression=None)
+        self.host, self.port = host, server.sockets[0].getsockname()[1]
+        return server
+
+    async def stats(self, every=STATS_EVERY):
+        last_ticks, last_frames = self.ticks, self.frames
+        while True:
+            await asyncio.sleep(every)
+            ticks, frames = self.ticks, self.frames
+            print(f"📡 {time.strftime('%H:%M:%S')} {self.open} open / {self.connections} connections | "
+                  f"{(ticks - last_ticks) / every:,.0f} ticks/s in {(frames - last_frames) / every:,.0f} frames/s | "
+                  f"{self.disconnects} injected disconnects", flush=True)
+            last_ticks, last_frames = ticks, frames
+
+    async def run(self, host=MOCK_HOST, port=MOCK_PORT):
+        server = await self.start(host, port)
+        print(f"🧪 mock Upstox on {self.base_url}: {len(self.market.keys)} instruments, {self.rate:,} ticks/s "
+              f"per connection, latency {self.latency * 1e3:g}±{self.jitter * 1e3:g} ms, disconnect every "
+              f"{self.disconnect_every or '∞'} s ({self.disconnect_mode})", flush=True)
+        print(f"   UPSTOX_BASE_URL={self.base_url}", flush=True)
+        asyncio.create_task(self.stats())
+        await server.serve_forever()
+
+
+# =========================================================
+# CSVs FOR THE CONSUMERS
+# =========================================================
+def write_csv(market, out_dir):
+    """companies_only.csv and atm_option_table.csv for ``market``, in the layouts instruments.py reads."""
+    os.makedirs(out_dir, exist_ok=True)
+    rows = market.companies_rows()
+    with open(os.path.join(out_dir, "companies_only.csv"), "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    atm_rows = []
+    for underlying, ladder in market.option_map.items():
+        spot = market.spot[underlying]
+        i = min(range(len(ladder)), key=lambda j: abs(ladder[j][0] - spot))
+        atm_rows.append({
+            "name": market.underlying_info[underlying], "underlying_key": underlying, "spot_price": round(spot, 2),
+            "atm_ce_instrument": ladder[i][1], "atm_plus_2_ce_instrument": ladder[min(i + 2, len(ladder) - 1)][1],
+            "atm_minus_2_pe_instrument": ladder[max(i - 2, 0)][2],
+        })
+    with open(os.path.join(out_dir, "atm_option_table.csv"), "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(atm_rows[0]))
+        writer.writeheader()
+        writer.writerows(atm_rows)
+    print(f"📝 {len(rows)} strikes → {out_dir}/companies_only.csv, {len(atm_rows)} underlyings → "
+          f"{out_dir}/atm_option_table.csv", flush=True)
+
+
+# =========================================================
+# SELF-CHECK
+# =========================================================
+async def _check(rate=20_000, seconds=4.0):
+    mock = MockUpstox(rate=rate, disconnect_every=1.5, latency_ms=20, jitter_ms=10)
+    server = await mock.start(port=0)
+    os.environ["UPSTOX_BASE_URL"] = mock.base_url      # read by session.py / backfill.py at import
+
+    import requests
+
+    from backfill import Backfiller
+    from detectors import EnergySurgeDetector
+    from instruments import InstrumentRegistry
+    from pipeline import FIELD_BOOK, Detector, Pipeline
+    from session import UpstoxSession
+
+    r = await asyncio.to_thread(requests.get, f"{mock.base_url}{LTP_PATH}", timeout=5,
+                                params={"instrument_key": ",".join(mock.market.spot_keys[:3])})
+    quotes = r.json()["data"]
+    assert len(quotes) == 3 and all(q["last_price"] > 0 for q in quotes.values()), quotes
+    candles = await Backfiller(url=f"{mock.base_url}{INTRADAY_PREFIX}{{key}}/minutes/1").fill(
+        mock.market.option_keys[:2], time.time() - 600, time.time())
+    assert all(len(rows) >= 10 for rows in candles.values()), candles
+
+    class Books(Detector):
+        name = "books"
+        fields = (FIELD_BOOK,)
+
+        def __init__(self):
+            super().__init__()
+            self.keys = set()
+
+        def on_tick(self, tick):
+            if tick.book is not None:
+                self.keys.add(tick.key)
+
+    keys = mock.market.option_keys[:3000] + mock.market.spot_keys
+    pipeline = Pipeline(InstrumentRegistry(keys, mock.market.info))
+    pipeline.register(EnergySurgeDetector())
+    books = pipeline.register(Books())
+    alerts = pipeline.add_sink(lambda alert: None)
+    counted = {"ticks": 0}
+    unsubscribed = set(mock.market.option_keys[2000:3000])
+    late = set()
+
+    def on_message(buffer, recv=None):
+        ticks = pipeline.process(buffer, recv=recv)
+        counted["ticks"] += len(ticks)
+        if counted.get("unsubscribed"):
+            late.update(t.key for t in ticks if t.key in unsubscribed)
+
+    session = UpstoxSession({**dict.fromkeys(mock.market.option_keys[:3000], "option_greeks"),
+                             **dict.fromkeys(mock.market.spot_keys, "ltpc")},
+                            on_message=on_message, on_gap=pipeline.on_gap, feed_clock=lambda: pipeline.last_ts,
+                            guid="mock")
+    task = asyncio.create_task(session.run())
+    await session.connected.wait()
+    hot = mock.market.option_keys[:10]
+    await session.change_mode(hot, "full")
+    await session.unsubscribe(unsubscribed)
+    await asyncio.sleep(0.2)        # frames already in flight
+    counted["unsubscribed"] = True
+    t0 = time.perf_counter()
+    start_ticks = counted["ticks"]
+    await asyncio.sleep(seconds)
+    elapsed = time.perf_counter() - t0
+    rate_seen = (counted["ticks"] - start_ticks) / elapsed
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+    server.close()
+    await server.wait_closed()
+
+    print(f"REST: authorize x{mock.requests.get(AUTHORIZE_PATH, 0)}, ltp {len(quotes)} quotes, "
+          f"intraday {sum(map(len, candles.values()))} candles")
+    print(f"WS: {mock.connections} connections, {mock.disconnects} injected disconnects, "
+          f"{session.reconnects} reconnects, {len(session.gaps)} gaps reported")
+    print(f"change_mode full → book ticks on {len(books.keys & set(hot))}/{len(hot)} keys, "
+          f"{len(books.keys - set(hot))} others; unsub'd keys ticking after: {len(late)}")
+    print(f"throughput: {rate_seen:,.0f} ticks/s through session + pipeline (mock asked {rate:,}/s)")
+    assert session.reconnects >= 1 and mock.disconnects >= 1
+    assert books.keys and books.keys <= set(hot), books.keys - set(hot)
+    assert rate_seen > 10_000 and not late, (rate_seen, len(late))
+    assert alerts is not None
+    print("✅ mock ok")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local Upstox REST + market-data websocket stand-in")
+    parser.add_argument("--host", default=MOCK_HOST)
+    parser.add_argument("--port", type=int, default=MOCK_PORT)
+    parser.add_argument("--rate", type=int, default=RATE, help="ticks/s per connection")
+    parser.add_argument("--frame-ms", type=int, default=FRAME_MS)
+    parser.add_argument("--underlyings", type=int, default=UNDERLYINGS)
+    parser.add_argument("--strikes", type=int, default=STRIKES)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--disconnect-every", type=float, default=0.0, help="seconds (±50%%) per connection")
+    parser.add_argument("--disconnect-mode", choices=("close", "abort"), default="close")
+    parser.add_argument("--write-csv", metavar="DIR", help="write the universe's CSVs and exit")
+    parser.add_argument("--check", action="store_true")
+    args = parser.parse_args()
+
+    if args.check:
+        asyncio.run(_check())
+    else:
+        market = Market(args.underlyings, args.strikes)
+        if args.write_csv:
+            write_csv(market, args.write_csv)
+        else:
+            mock = MockUpstox(market, args.rate, args.frame_ms, args.latency_ms, args.jitter_ms,
+                              args.disconnect_every, args.disconnect_mode)
+            try:
+                asyncio.run(mock.run(args.host, args.port))
+            except KeyboardInterrupt:
+                pass
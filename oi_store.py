@@ -0,0 +1,339 @@
+"""Per-minute OI / volume / value store (SQLite, WAL) fed from the pipeline.
+
+    pipeline.register(OiStore())            # ingest.py: ENABLE_OI_STORE
+    python oi_store.py top [--day 2026-01-20] [-n 20]
+    python oi_store.py surge [--minutes 15] [--pct 20]
+    python oi_store.py underlying RELIANCE [--day ...]
+    python oi_store.py --check              # synthetic day, query timings
+
+Ticks are folded into one row per (instrument, minute) in memory and
+upserted in a single transaction every FLUSH_INTERVAL seconds, together
+with a per-(day, instrument) running total, so "today" queries read one
+row per instrument and window queries read only the minutes in range.
+WAL mode lets reports run from another process while the feed writes.
+"""
+import argparse
+import os
+import sqlite3
+import time
+
+from instruments import grow
+from pipeline import Detector
+
+# =========================================================
+# CONFIG
+# =========================================================
+DB_PATH = "oi_store.sqlite"
+FLUSH_INTERVAL = 5.0     # seconds between batched writes
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS instruments (
+    id INTEGER PRIMARY KEY, key TEXT UNIQUE NOT NULL,
+    underlying TEXT, strike REAL, option_type TEXT);
+CREATE INDEX IF NOT EXISTS instruments_underlying ON instruments (underlying);
+
+-- one row per instrument-minute; minute = epoch seconds of the minute start (exchange time)
+CREATE TABLE IF NOT EXISTS minutes (
+    id INTEGER NOT NULL, minute INTEGER NOT NULL,
+    oi_open REAL, oi REAL, volume INTEGER, value REAL, ltp REAL,
+    PRIMARY KEY (id, minute)) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS minutes_by_minute ON minutes (minute, id, oi_open, oi);
+
+-- running day totals, rewritten (not incremented) on every flush
+CREATE TABLE IF NOT EXISTS days (
+    day TEXT NOT NULL, id INTEGER NOT NULL,
+    oi_open REAL, oi REAL, volume INTEGER, value REAL, ltp REAL,
+    PRIMARY KEY (day, id)) WITHOUT ROWID;
+"""
+
+UPSERT_MINUTE = """
+INSERT INTO minutes VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (id, minute) DO UPDATE SET oi = excluded.oi, volume = excluded.volume,
+    value = excluded.value, ltp = excluded.ltp"""
+UPSERT_DAY = "INSERT OR REPLACE INTO days VALUES (?, ?, ?, ?, ?, ?, ?)"
+
+
+def connect(path=DB_PATH, readonly=False):
+    if readonly:
+        db = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    else:
+        db = sqlite3.connect(path)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")     # WAL + NORMAL: durable across app crashes, fast commits
+        db.executescript(SCHEMA)
+    return db
+
+
+def day_of(minute):
+    return time.strftime("%Y-%m-%d", time.localtime(minute))
+
+
+def day_bounds(day):
+    start = int(time.mktime(time.strptime(day, "%Y-%m-%d")))
+    return start, start + 86400
+
+
+# =========================================================
+# WRITER (PIPELINE STAGE)
+# =========================================================
+class OiStore(Detector):
+    """Folds ticks into per-minute rows and writes them in batches.
+
+    Minute rows hold the OI at the minute's first and last tick, traded
+    volume (vtt deltas; gap ticks only re-baseline) and value (volume × ltp).
+    On a restart the day's totals are read back, so volume keeps adding up.
+    """
+
+    name = "oi_store"
+
+    def __init__(self, path=DB_PATH, flush_interval=FLUSH_INTERVAL):
+        super().__init__()
+        self.db = connect(path)
+        self.interval = flush_interval
+        self.ids = []           # registry iid -> instruments.id
+        self.last_vtt = []
+        self.minute = []        # iid -> [minute, oi_open, oi, volume, value, ltp] (current minute)
+        self.day = []           # iid -> [day, oi_open, oi, volume, value, ltp]
+        self.done = []          # finished minute rows waiting for the next flush
+        self.dirty = set()
+        self.rows_written = 0
+
+    def resize(self, n_instruments):
+        registry = self.pipeline.registry
+        new = range(len(self.ids), n_instruments)
+        rows = [(registry.keys[i], registry.info[i].get("name"), registry.info[i].get("strike") or None,
+                 registry.info[i].get("type") or None) for i in new]
+        with self.db:
+            self.db.executemany("INSERT OR IGNORE INTO instruments (key, underlying, strike, option_type) "
+                                "VALUES (?, ?, ?, ?)", rows)
+        ids = dict(self.db.execute("SELECT key, id FROM instruments"))
+        self.ids.extend(ids[registry.keys[i]] for i in new)
+        grow(self.last_vtt, n_instruments, 0)
+        grow(self.minute, n_instruments, None)
+        grow(self.day, n_instruments, None)
+
+    def on_tick(self, tick):
+        if not tick.has_greeks:
+            return
+        iid = tick.iid
+        ts_ms = tick.ltt or int(tick.ts * 1000)
+        minute = ts_ms // 60_000 * 60
+        prev_vtt = self.last_vtt[iid]
+        self.last_vtt[iid] = tick.vtt
+        qty = tick.vtt - prev_vtt if prev_vtt and tick.vtt > prev_vtt and not tick.gap else 0
+        value = qty * tick.ltp
+
+        row = self.minute[iid]
+        if row is None or minute > row[0]:
+            if row is not None:
+                self.done.append((self.ids[iid], *row))
+            row = self.minute[iid] = [minute, tick.oi, tick.oi, 0, 0.0, tick.ltp]
+            today = day_of(minute)
+            if self.day[iid] is None or self.day[iid][0] != today:
+                self.day[iid] = self._load_day(iid, today) or [today, tick.oi, tick.oi, 0, 0.0, tick.ltp]
+        row[2] = tick.oi
+        row[3] += qty
+        row[4] += value
+        row[5] = tick.ltp
+
+        day = self.day[iid]
+        day[2] = tick.oi
+        day[3] += qty
+        day[4] += value
+        day[5] = tick.ltp
+        self.dirty.add(iid)
+
+    def _load_day(self, iid, day):
+        row = self.db.execute("SELECT oi_open, oi, volume, value, ltp FROM days WHERE day = ? AND id = ?",
+                              (day, self.ids[iid])).fetchone()
+        return [day, *row] if row else None
+
+    def backfill_ids(self):
+        return [iid for iid, row in enumerate(self.minute) if row is not None]
+
+    def on_backfill(self, iid, candles):
+        """Minutes the feed missed, from 1-minute candles (start_ms, o, h, l, c, volume, oi).
+
+        Candles only fill minutes we have no row for; whatever they add is
+        added to that day's totals in the same transaction. Minutes the feed
+        already holds in memory (the live one, or finished but not flushed)
+        are skipped: their ticks are in the totals and flush() writes them.
+        """
+        id_ = self.ids[iid]
+        live = self.minute[iid][0] if self.minute[iid] is not None else None
+        held = {row[1] for row in self.done if row[0] == id_}
+        added = {}      # day -> [volume, value, first oi, (last oi, ltp)]
+        with self.db:
+            for c in sorted(candles):
+                minute, volume, value = c[0] // 1000, c[5], c[5] * c[4]
+                if (live is not None and minute >= live) or minute in held:
+                    continue
+                if not self.db.execute("INSERT OR IGNORE INTO minutes VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                       (id_, minute, c[6], c[6], volume, value, c[4])).rowcount:
+                    continue
+                day = added.setdefault(day_of(minute), [0, 0.0, c[6], None])
+                day[0] += volume
+                day[1] += value
+                day[3] = (c[6], c[4])
+            for day, (volume, value, first, last) in added.items():
+                row = self.day[iid] if self.day[iid] is not None and self.day[iid][0] == day else None
+                row = row or self._load_day(iid, day) or [day, first, last[0], 0, 0.0, last[1]]
+                row[3] += volume
+                row[4] += value
+                self.db.execute(UPSERT_DAY, (day, id_, *row[1:]))
+
+    def on_timer(self, now):
+        self.flush()
+
+    def flush(self):
+        if not self.dirty and not self.done:
+            return
+        minutes = self.done
+        self.done = []
+        minutes.extend((self.ids[i], *self.minute[i]) for i in self.dirty)
+        days = [(self.day[i][0], self.ids[i], *self.day[i][1:]) for i in self.dirty]
+        self.dirty.clear()
+        with self.db:
+            self.db.executemany(UPSERT_MINUTE, minutes)
+            self.db.executemany(UPSERT_DAY, days)
+        self.rows_written += len(minutes)
+
+
+# =========================================================
+# QUERIES
+# =========================================================
+def top_oi_additions(db, day=None, n=20):
+    """Largest OI added over ``day`` (default today): (key, underlying, strike, type, oi_open, oi, added, volume, value)."""
+    return db.execute("""
+        SELECT i.key, i.underlying, i.strike, i.option_type, d.oi_open, d.oi, d.oi - d.oi_open AS added,
+               d.volume, d.value
+        FROM days d JOIN instruments i ON i.id = d.id
+        WHERE d.day = ? ORDER BY added DESC LIMIT ?""", (day or time.strftime("%Y-%m-%d"), n)).fetchall()
+
+
+def oi_surges(db, minutes=15, pct=20.0, until=None, n=50):
+    """Instruments whose OI rose more than ``pct`` % over the last ``minutes`` minutes
+    up to ``until`` (epoch seconds, default now): (key, underlying, strike, type, oi_from, oi, pct)."""
+    until = int(until or time.time())
+    start = until - minutes * 60
+    return db.execute("""
+        WITH w AS (SELECT id, MIN(minute) AS m0, MAX(minute) AS m1 FROM minutes
+                   WHERE minute > ? AND minute <= ? GROUP BY id)
+        SELECT i.key, i.underlying, i.strike, i.option_type, a.oi_open, b.oi,
+               ROUND(100.0 * (b.oi - a.oi_open) / a.oi_open, 2) AS pct
+        FROM w JOIN minutes a ON a.id = w.id AND a.minute = w.m0
+               JOIN minutes b ON b.id = w.id AND b.minute = w.m1
+               JOIN instruments i ON i.id = w.id
+        WHERE a.oi_open > 0 AND b.oi > a.oi_open * (1 + ? / 100.0)
+        ORDER BY pct DESC LIMIT ?""", (start, until, pct, n)).fetchall()
+
+
+def underlying_minutes(db, underlying, day=None):
+    """Per-minute totals across every strike of ``underlying``: (minute, oi, volume, value)."""
+    start, end = day_bounds(day or time.strftime("%Y-%m-%d"))
+    return db.execute("""
+        SELECT m.minute, SUM(m.oi), SUM(m.volume), SUM(m.value)
+        FROM instruments i JOIN minutes m ON m.id = i.id AND m.minute >= ? AND m.minute < ?
+        WHERE i.underlying = ? GROUP BY m.minute ORDER BY m.minute""", (start, end, underlying)).fetchall()
+
+
+# =========================================================
+# SELF-CHECK: SYNTHETIC DAY
+# =========================================================
+def _check(n_instruments=2000, n_minutes=375, path="/tmp/oi_store_check.sqlite"):
+    import random
+
+    from instruments import InstrumentRegistry
+    from pipeline import Pipeline, Tick
+
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    keys = [f"NSE_FO|{50000 + i}" for i in range(n_instruments)]
+    info = {k: {"name": f"SYM{i // 20}", "strike": 100 + i % 20 * 5, "type": "CE" if i % 2 else "PE"}
+            for i, k in enumerate(keys)}
+    pipeline = Pipeline(InstrumentRegistry(keys, info))
+    store = pipeline.register(OiStore(path))
+    day_start = day_bounds(time.strftime("%Y-%m-%d"))[0] + 9 * 3600 + 15 * 60
+    rng = random.Random(7)
+    oi = [rng.uniform(1e4, 1e6) for _ in keys]
+    vtt = [0] * n_instruments
+    t0 = time.perf_counter()
+    n_ticks = 0
+    for m in range(n_minutes):
+        ticks = []
+        for i in set(rng.sample(range(n_instruments), n_instruments // 4)) | {7}:
+            vtt[i] += rng.randint(75, 7500)
+            oi[i] *= 1.5 if (i == 7 and m == n_minutes - 5) else rng.uniform(0.995, 1.006)
+            ltt = (day_start + m * 60 + rng.randint(0, 59)) * 1000
+            ticks.append(Tick(i, keys[i], ltt / 1000, ltt, 100.0, 75, 99.0, vtt[i], oi[i], 0.2, True))
+        pipeline.dispatch(ticks)
+        n_ticks += len(ticks)
+        if m % 5 == 4:
+            store.flush()
+    store.flush()
+    write = time.perf_counter() - t0
+    rows = store.db.execute("SELECT COUNT(*) FROM minutes").fetchone()[0]
+    print(f"wrote {rows:,} minute rows from {n_ticks:,} ticks in {write:.2f}s")
+
+    db = connect(path, readonly=True)
+    until = day_start + n_minutes * 60
+    for label, fn in (("top 20 OI additions today", lambda: top_oi_additions(db)),
+                      ("OI up >20% in 15 min", lambda: oi_surges(db, 15, 20, until)),
+                      ("one underlying, per minute", lambda: underlying_minutes(db, "SYM0"))):
+        fn()
+        t = time.perf_counter()
+        out = fn()
+        print(f"{label:<28} {len(out):>4} rows  {(time.perf_counter() - t) * 1000:7.2f} ms")
+    surge = oi_surges(db, 15, 20, until)
+    assert surge and surge[0][0] == keys[7], surge
+    assert len(top_oi_additions(db)) == 20 and len(underlying_minutes(db, "SYM0")) == n_minutes
+
+    # 10-minute gap, first ticks mid-minute, then the back-fill: the live minute stays the feed's
+    resume = day_start + (n_minutes + 10) * 60
+    for second, qty in ((20, 1000), (40, 500)):
+        vtt[7] += qty
+        tick = Tick(7, keys[7], resume + second, (resume + second) * 1000, 100.0, 75, 99.0, vtt[7], oi[7], 0.2, True)
+        tick.gap = second == 20
+        pipeline.dispatch([tick])
+    store.on_backfill(7, [((day_start + (n_minutes + k) * 60) * 1000, 100, 100, 100, 100.0, 300, oi[7])
+                          for k in range(11)])
+    store.flush()
+    day_volume = store.db.execute("SELECT volume FROM days WHERE id = ?", (store.ids[7],)).fetchone()[0]
+    minute_volume = store.db.execute("SELECT SUM(volume) FROM minutes WHERE id = ?", (store.ids[7],)).fetchone()[0]
+    assert day_volume == minute_volume, (day_volume, minute_volume)
+    print("✅ oi store ok")
+
+
+def _report(args):
+    db = connect(args.db, readonly=True)
+    if args.command == "top":
+        rows = top_oi_additions(db, args.day, args.n)
+        print(f"{'instrument':<18} {'underlying':<12} {'strike':>8} {'':2} {'OI added':>12} {'volume':>12} {'value ₹':>16}")
+        for key, und, strike, typ, _, _, added, volume, value in rows:
+            print(f"{key:<18} {str(und):<12} {strike or 0:>8g} {typ or '':2} {added:>12,.0f} {volume:>12,} {value:>16,.0f}")
+    elif args.command == "surge":
+        for key, und, strike, typ, oi_from, oi_to, pct in oi_surges(db, args.minutes, args.pct, n=args.n):
+            print(f"{key:<18} {str(und):<12} {strike or 0:>8g} {typ or '':2} {oi_from:>12,.0f} → {oi_to:>12,.0f}  +{pct}%")
+    else:
+        for minute, oi, volume, value in underlying_minutes(db, args.underlying, args.day):
+            print(f"{time.strftime('%H:%M', time.localtime(minute))} OI {oi:>14,.0f}  vol {volume:>12,}  ₹{value:>16,.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="OI / volume reports from the minute store")
+    parser.add_argument("command", nargs="?", choices=("top", "surge", "underlying"))
+    parser.add_argument("underlying", nargs="?")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--day", help="YYYY-MM-DD, default today")
+    parser.add_argument("-n", type=int, default=20)
+    parser.add_argument("--minutes", type=int, default=15)
+    parser.add_argument("--pct", type=float, default=20.0)
+    parser.add_argument("--check", action="store_true")
+    args = parser.parse_args()
+    if args.check:
+        _check()
+    elif args.command:
+        _report(args)
+    else:
+        parser.print_help()
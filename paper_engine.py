@@ -0,0 +1,300 @@
+import bisect
+import itertools
+import time
+
+import numpy as np
+
+from instruments import grow, load_lot_sizes
+from pipeline import FIELD_DEPTH, Detector
+
+# =========================================================
+# ORDER MODEL
+# =========================================================
+BUY, SELL = 1, -1
+MARKET, LIMIT, SL, SL_M = "MARKET", "LIMIT", "SL", "SL-M"
+
+OPEN, TRIGGER_PENDING, COMPLETE, CANCELLED, REJECTED = "open", "trigger_pending", "complete", "cancelled", "rejected"
+
+
+class Order:
+    __slots__ = ("oid", "iid", "key", "side", "qty", "order_type", "price", "trigger", "status",
+                 "fill_price", "fill_ts", "placed_ts", "tag", "reason", "rest")
+
+    def __init__(self, oid, iid, key, side, qty, order_type, price, trigger, placed_ts, tag=None):
+        self.oid = oid
+        self.iid = iid
+        self.key = key
+        self.side = side
+        self.qty = qty
+        self.order_type = order_type
+        self.price = price
+        self.trigger = trigger
+        self.status = OPEN
+        self.fill_price = None
+        self.fill_ts = None
+        self.placed_ts = placed_ts
+        self.tag = tag
+        self.reason = None
+        self.rest = None        # sort key while resting in a book side
+
+    def __repr__(self):
+        side = "BUY" if self.side == BUY else "SELL"
+        return f"Order#{self.oid}({side} {self.qty} {self.key} {self.order_type} {self.status})"
+
+
+class _Side:
+    """Resting orders for one instrument and side, kept sorted by (price, oid).
+
+    Crossing orders are found with one bisect, so a tick costs O(log n)
+    plus the orders that actually fill.
+    """
+
+    __slots__ = ("keys", "orders")
+
+    def __init__(self):
+        self.keys = []
+        self.orders = {}
+
+    def add(self, price, order):
+        order.rest = price
+        bisect.insort(self.keys, (price, order.oid))
+        self.orders[order.oid] = order
+
+    def remove(self, price, oid):
+        i = bisect.bisect_left(self.keys, (price, oid))
+        if i < len(self.keys) and self.keys[i] == (price, oid):
+            del self.keys[i]
+        return self.orders.pop(oid, None)
+
+    def pop_at_or_above(self, price):
+        i = bisect.bisect_left(self.keys, (price, -1))
+        hit, self.keys[i:] = self.keys[i:], []
+        return [self.orders.pop(oid) for _, oid in hit]
+
+    def pop_at_or_below(self, price):
+        i = bisect.bisect_right(self.keys, (price, float("inf")))
+        hit, self.keys[:i] = self.keys[:i], []
+        return [self.orders.pop(oid) for _, oid in hit]
+
+
+class _Book:
+    __slots__ = ("buy_limits", "sell_limits", "buy_stops", "sell_stops")
+
+    def __init__(self):
+        self.buy_limits = _Side()
+        self.sell_limits = _Side()
+        self.buy_stops = _Side()
+        self.sell_stops = _Side()
+
+    def __len__(self):
+        return (len(self.buy_limits.orders) + len(self.sell_limits.orders)
+                + len(self.buy_stops.orders) + len(self.sell_stops.orders))
+
+
+# =========================================================
+# PAPER ENGINE
+# =========================================================
+class PaperEngine(Detector):
+    """In-memory matching simulator fed by the live pipeline.
+
+    Market orders take the prevailing ask/bid (firstDepth, else LTP), limit
+    orders rest until the opposite quote crosses them, SL / SL-M orders
+    wait for LTP to pass their trigger. Fills are complete and instant: the
+    simulator does not model queue position or depth exhaustion.
+    Positions and MTM live in NumPy columns indexed by instrument id.
+    """
+
+    name = "paper_engine"
+    fields = (FIELD_DEPTH,)
+
+    def __init__(self, lot_sizes=None, verbose=True, report_interval=None):
+        super().__init__()
+        self.lot_sizes = load_lot_sizes() if lot_sizes is None else lot_sizes
+        self.verbose = verbose
+        self.interval = report_interval
+        self.ids = itertools.count(1)
+        self.orders = {}
+        self.fills = []
+        self.on_fill = []
+        self.books = []
+        self.bid = np.zeros(0)
+        self.ask = np.zeros(0)
+        self.ltp = np.zeros(0)
+        self.net_qty = np.zeros(0, dtype=np.int64)
+        self.avg_price = np.zeros(0)
+        self.realized = np.zeros(0)
+
+    def resize(self, n_instruments):
+        grow(self.books, n_instruments, None)
+        self.bid = grow(self.bid, n_instruments, np.nan)
+        self.ask = grow(self.ask, n_instruments, np.nan)
+        self.ltp = grow(self.ltp, n_instruments, np.nan)
+        self.net_qty = grow(self.net_qty, n_instruments)
+        self.avg_price = grow(self.avg_price, n_instruments)
+        self.realized = grow(self.realized, n_instruments)
+
+    # -------------------------------
+    # ORDER ENTRY
+    # -------------------------------
+    def place_order(self, key, side, qty, order_type=MARKET, price=None, trigger=None, tag=None, now=None):
+        registry = self.pipeline.registry
+        iid = registry.intern(key)
+        if iid >= len(self.books):
+            self.resize(len(registry))
+        order = Order(next(self.ids), iid, key, side, int(qty), order_type, price, trigger, now or time.time(), tag)
+        self.orders[order.oid] = order
+
+        lot = self.lot_sizes.get(key)
+        if lot is None:
+            return self._reject(order, "unknown instrument (not in companies_only.csv)")
+        if order.qty <= 0 or order.qty % lot:
+            return self._reject(order, f"qty must be a positive multiple of lot size {lot}")
+        if order_type in (LIMIT, SL) and price is None:
+            return self._reject(order, f"{order_type} order needs a price")
+        if order_type in (SL, SL_M) and trigger is None:
+            return self._reject(order, f"{order_type} order needs a trigger")
+
+        book = self.books[iid]
+        if book is None:
+            book = self.books[iid] = _Book()
+
+        if order_type in (SL, SL_M):
+            order.status = TRIGGER_PENDING
+            if side == BUY:
+                book.buy_stops.add(trigger, order)
+            else:
+                book.sell_stops.add(trigger, order)
+            self._check_stops(iid, book)
+        else:
+            self._route(iid, book, order)
+        return order
+
+    def cancel_order(self, oid):
+        order = self.orders.get(oid)
+        if order is None or order.status not in (OPEN, TRIGGER_PENDING):
+            return False
+        book = self.books[order.iid]
+        if order.status == TRIGGER_PENDING:
+            side = book.buy_stops if order.side == BUY else book.sell_stops
+        else:
+            side = book.buy_limits if order.side == BUY else book.sell_limits
+        side.remove(order.rest, oid)
+        order.status = CANCELLED
+        return True
+
+    def _reject(self, order, reason):
+        order.status, order.reason = REJECTED, reason
+        if self.verbose:
+            print(f"⛔ {order} rejected: {reason}", flush=True)
+        return order
+
+    def _route(self, iid, book, order):
+        """Fill now if marketable against the current quote, else rest it."""
+        order.status = OPEN
+        ask, bid = self.ask[iid], self.bid[iid]
+        if order.order_type in (MARKET, SL_M):
+            quote = ask if order.side == BUY else bid
+            if quote == quote:          # not NaN: we have a quote
+                self._fill(order, quote)
+            elif order.side == BUY:     # no quote yet: take the first one
+                book.buy_limits.add(float("inf"), order)
+            else:
+                book.sell_limits.add(0.0, order)
+        elif order.side == BUY:
+            if ask <= order.price:
+                self._fill(order, ask)
+            else:
+                book.buy_limits.add(order.price, order)
+        else:
+            if bid >= order.price:
+                self._fill(order, bid)
+            else:
+                book.sell_limits.add(order.price, order)
+
+    # -------------------------------
+    # MATCHING (PER TICK)
+    # -------------------------------
+    def on_tick(self, tick):
+        iid = tick.iid
+        if tick.depth is not None and tick.depth[1] > 0 and tick.depth[3] > 0:
+            bid, ask = tick.depth[1], tick.depth[3]
+        else:
+            bid = ask = tick.ltp
+        self.bid[iid], self.ask[iid], self.ltp[iid] = bid, ask, tick.ltp
+
+        book = self.books[iid]
+        if book is None or not len(book):
+            return
+        self._check_stops(iid, book)
+        for order in book.buy_limits.pop_at_or_above(ask):
+            self._fill(order, ask if order.order_type in (MARKET, SL_M) else min(order.price, ask))
+        for order in book.sell_limits.pop_at_or_below(bid):
+            self._fill(order, bid if order.order_type in (MARKET, SL_M) else max(order.price, bid))
+
+    def _check_stops(self, iid, book):
+        ltp = self.ltp[iid]
+        if ltp != ltp:
+            return
+        for order in book.buy_stops.pop_at_or_below(ltp):
+            self._route(iid, book, order)
+        for order in book.sell_stops.pop_at_or_above(ltp):
+            self._route(iid, book, order)
+
+    def _fill(self, order, price, now=None):
+        iid, qty = order.iid, order.side * order.qty
+        order.status, order.fill_price, order.fill_ts = COMPLETE, float(price), now or time.time()
+
+        pos = int(self.net_qty[iid])
+        avg = self.avg_price[iid]
+        if pos == 0 or (pos > 0) == (qty > 0):
+            # opening / adding: weighted average entry
+            self.avg_price[iid] = (avg * abs(pos) + price * abs(qty)) / (abs(pos) + abs(qty))
+        else:
+            closed = min(abs(pos), abs(qty))
+            self.realized[iid] += closed * (price - avg) * (1 if pos > 0 else -1)
+            if abs(qty) > abs(pos):
+                self.avg_price[iid] = price     # flipped through zero
+            elif abs(qty) == abs(pos):
+                self.avg_price[iid] = 0.0
+        self.net_qty[iid] = pos + qty
+
+        self.fills.append(order)
+        if self.verbose:
+            print(f"🧾 FILL {order} @ {price:.2f} | pos {self.net_qty[iid]} | "
+                  f"MTM ₹{self.mtm(iid):,.2f}", flush=True)
+        for cb in self.on_fill:
+            cb(order)
+
+    # -------------------------------
+    # POSITIONS / P&L
+    # -------------------------------
+    def unrealized(self):
+        """Per-instrument unrealized P&L, one vectorized pass over the book."""
+        mark = np.where(np.isnan(self.ltp), self.avg_price, self.ltp)
+        return self.net_qty * (mark - self.avg_price)
+
+    def mtm(self, iid=None):
+        if iid is None:
+            return float(self.realized.sum() + self.unrealized().sum())
+        ltp = self.ltp[iid]
+        mark = self.avg_price[iid] if ltp != ltp else ltp
+        return float(self.realized[iid] + self.net_qty[iid] * (mark - self.avg_price[iid]))
+
+    def positions(self):
+        keys = self.pipeline.registry.keys
+        open_ids = np.flatnonzero(self.net_qty)
+        unreal = self.unrealized()
+        return [
+            {"key": keys[i], "qty": int(self.net_qty[i]), "avg_price": round(float(self.avg_price[i]), 2),
+             "ltp": float(self.ltp[i]), "unrealized": round(float(unreal[i]), 2),
+             "realized": round(float(self.realized[i]), 2)}
+            for i in open_ids
+        ]
+
+    def on_timer(self, now):
+        if self.fills:
+            print(f"💼 {time.strftime('%H:%M:%S')} | open positions {len(np.flatnonzero(self.net_qty))} | "
+                  f"resting orders {len(self.open_orders())} | MTM ₹{self.mtm():,.2f}", flush=True)
+
+    def open_orders(self):
+        return [o for o in self.orders.values() if o.status in (OPEN, TRIGGER_PENDING)]
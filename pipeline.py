@@ -0,0 +1,414 @@
+import asyncio
+import time
+
+import MarketDataFeedV3_pb2 as pb
+import metrics
+import profiler
+from instruments import InstrumentRegistry
+
+
+# =========================================================
+# SHARED TICK RECORD
+# =========================================================
+class Tick:
+    """One decoded instrument update, shared by every detector in the pipeline.
+
+    ``greeks`` (delta, theta, gamma, vega, rho) and ``depth`` (bidQ, bidP,
+    askQ, askP) are only filled when a registered detector asked for them;
+    so is ``book``, the feed's MarketFullFeed message itself (full_d5 /
+    full_d30 subscriptions: every bidAskQuote level plus tbq/tsq), passed
+    by reference so reading the levels is left to the consumer.
+    ``recv`` is the perf_counter() stamp of the websocket frame it came in.
+    ``gap`` is set on the first tick of an instrument after a feed gap
+    (reconnect snapshot, stalled feed): its vtt/oi deltas span the gap and
+    must re-baseline state rather than count as one burst.
+    """
+
+    __slots__ = ("iid", "key", "ts", "ltt", "ltp", "ltq", "cp", "vtt", "oi", "iv", "has_greeks",
+                 "greeks", "depth", "book", "recv", "gap")
+
+    def __init__(self, iid, key, ts, ltt, ltp, ltq, cp, vtt=0, oi=0.0, iv=0.0, has_greeks=False,
+                 greeks=None, depth=None):
+        self.iid = iid
+        self.key = key
+        self.ts = ts
+        self.ltt = ltt
+        self.ltp = ltp
+        self.ltq = ltq
+        self.cp = cp
+        self.vtt = vtt
+        self.oi = oi
+        self.iv = iv
+        self.has_greeks = has_greeks
+        self.greeks = greeks
+        self.depth = depth
+        self.book = None
+        self.recv = 0.0
+        self.gap = False
+
+    def __repr__(self):
+        return f"Tick({self.key} ltp={self.ltp} ltq={self.ltq} vtt={self.vtt} oi={self.oi})"
+
+
+# =========================================================
+# DECODER (FINGERPRINT FAST PATH)
+# =========================================================
+FIELD_GREEKS = "greeks"
+FIELD_DEPTH = "depth"
+FIELD_BOOK = "book"
+FIELD_UNCHANGED = "unchanged"
+
+SKIPPED = metrics.counter("feed_unchanged_skipped_total", "Feeds dropped because ltt/vtt/oi did not change")
+
+
+class Decoder:
+    """Flattens FeedResponse frames into Ticks, reading only what consumers need.
+
+    A feed whose (ltt, vtt, oi) fingerprint matches the previous one for the
+    same instrument is dropped before anything else is read, unless some
+    consumer asked for ``unchanged`` ticks (or depth/book, which move on their own).
+    """
+
+    def __init__(self, registry, fields=()):
+        self.registry = registry
+        self.fingerprints = []
+        self.configure(fields)
+        self.seen = 0
+        self.skipped = 0
+
+    def configure(self, fields):
+        fields = set(fields)
+        self.want_greeks = FIELD_GREEKS in fields
+        self.want_book = FIELD_BOOK in fields
+        self.want_depth = FIELD_DEPTH in fields or self.want_book
+        self.skip_unchanged = not (FIELD_UNCHANGED in fields or self.want_depth)
+
+    def decode(self, buffer, now=None, recv=None):
+        feed_response = pb.FeedResponse()
+        feed_response.ParseFromString(buffer)
+        now = now or time.time()
+        recv = recv or time.perf_counter()
+        registry = self.registry
+        ids = registry.ids
+        prints = self.fingerprints
+        skip = self.skip_unchanged
+        want_greeks, want_depth, want_book = self.want_greeks, self.want_depth, self.want_book
+        ticks = []
+        skipped = 0
+
+        for key, feed in feed_response.feeds.items():
+            iid = ids.get(key)
+            if iid is None:
+                iid = registry.intern(key)
+            if iid >= len(prints):
+                prints.extend([None] * (len(registry) - len(prints)))
+
+            kind = feed.WhichOneof("FeedUnion")
+            if kind == "firstLevelWithGreeks":
+                flwg = feed.firstLevelWithGreeks
+                ltpc = flwg.ltpc
+                fp = (ltpc.ltt, flwg.vtt, flwg.oi)
+                if skip and prints[iid] == fp:
+                    skipped += 1
+                    continue
+                prints[iid] = fp
+                tick = Tick(iid, key, now, fp[0], ltpc.ltp, ltpc.ltq, ltpc.cp, fp[1], fp[2], flwg.iv, True)
+                if want_greeks:
+                    g = flwg.optionGreeks
+                    tick.greeks = (g.delta, g.theta, g.gamma, g.vega, g.rho)
+                if want_depth:
+                    d = flwg.firstDepth
+                    tick.depth = (d.bidQ, d.bidP, d.askQ, d.askP)
+            elif kind == "ltpc":
+                ltpc = feed.ltpc
+                fp = (ltpc.ltt, ltpc.ltp)
+                if skip and prints[iid] == fp:
+                    skipped += 1
+                    continue
+                prints[iid] = fp
+                tick = Tick(iid, key, now, fp[0], fp[1], ltpc.ltq, ltpc.cp)
+            elif kind == "fullFeed":
+                full = feed.fullFeed
+                if full.HasField("marketFF"):
+                    mff = full.marketFF
+                    ltpc = mff.ltpc
+                    fp = (ltpc.ltt, mff.vtt, mff.oi)
+                    if skip and prints[iid] == fp:
+                        skipped += 1
+                        continue
+                    prints[iid] = fp
+                    tick = Tick(iid, key, now, fp[0], ltpc.ltp, ltpc.ltq, ltpc.cp, fp[1], fp[2], mff.iv, True)
+                    if want_greeks:
+                        g = mff.optionGreeks
+                        tick.greeks = (g.delta, g.theta, g.gamma, g.vega, g.rho)
+                    if want_depth and mff.marketLevel.bidAskQuote:
+                        d = mff.marketLevel.bidAskQuote[0]
+                        tick.depth = (d.bidQ, d.bidP, d.askQ, d.askP)
+                    if want_book:
+                        tick.book = mff
+                else:
+                    ltpc = full.indexFF.ltpc
+                    fp = (ltpc.ltt, ltpc.ltp)
+                    if skip and prints[iid] == fp:
+                        skipped += 1
+                        continue
+                    prints[iid] = fp
+                    tick = Tick(iid, key, now, fp[0], fp[1], ltpc.ltq, ltpc.cp)
+            else:
+                continue
+            tick.recv = recv
+            ticks.append(tick)
+
+        self.seen += len(ticks) + skipped
+        self.skipped += skipped
+        SKIPPED.inc(skipped)
+        return feed_response, ticks
+
+    @property
+    def hit_rate(self):
+        return self.skipped / self.seen if self.seen else 0.0
+
+
+def decode_frame(buffer, registry, now=None, recv=None):
+    """Full decode of one frame: every feed, greeks, depth and book included."""
+    return Decoder(registry, (FIELD_GREEKS, FIELD_BOOK, FIELD_UNCHANGED)).decode(buffer, now, recv)
+
+
+# =========================================================
+# DETECTOR INTERFACE
+# =========================================================
+class Detector:
+    """Base class for strategies plugged into the Pipeline.
+
+    ``on_tick`` runs for every decoded tick; ``end_frame`` once per frame
+    after every detector has seen its ticks (for work batched per frame);
+    ``on_timer`` runs every ``interval`` seconds when interval is set. Alerts go through ``emit``.
+    Per-instrument state is indexed by ``tick.iid``; ``resize`` is called
+    whenever the registry grows so those columns can be extended.
+    ``fields`` lists the optional tick data the detector needs
+    (FIELD_GREEKS, FIELD_DEPTH, FIELD_BOOK, FIELD_UNCHANGED).
+    """
+
+    name = "detector"
+    interval = None
+    fields = ()
+
+    def __init__(self):
+        self.pipeline = None
+
+    def resize(self, n_instruments):
+        pass
+
+    def on_tick(self, tick):
+        pass
+
+    def end_frame(self):
+        pass
+
+    def on_timer(self, now):
+        pass
+
+    def on_backfill(self, iid, candles):
+        """1-minute candles (start_ms, o, h, l, c, volume, oi) covering a feed gap."""
+        pass
+
+    def backfill_ids(self):
+        """iids whose state on_backfill would update; the pipeline fetches candles for these only."""
+        return range(len(self.pipeline.registry))
+
+    def emit(self, alert):
+        if self.pipeline is not None:
+            self.pipeline.emit(alert)
+
+
+# =========================================================
+# PIPELINE
+# =========================================================
+STALL_SECONDS = 5.0          # currentTs jump between frames treated as a gap
+BACKFILL_MIN_SECONDS = 60.0  # shorter gaps are only re-baselined
+ERROR_LOG_INTERVAL = 10.0    # at most one "on_tick failed" line per detector per interval
+
+GAPS = metrics.counter("feed_gaps_total", "Feed gaps (reconnects, stalls) that re-baselined instruments")
+
+
+class Pipeline:
+    """Decode each frame once and fan the ticks out to every registered detector."""
+
+    def __init__(self, registry=None):
+        self.registry = registry if registry is not None else InstrumentRegistry()
+        self.decoder = Decoder(self.registry)
+        self.detectors = []
+        self.tick_detectors = []
+        self.frame_detectors = []
+        self.sinks = []
+        self.timings = {}
+        self.errors = {}            # detector name -> errors counter
+        self.error_log = {}         # detector name -> [last logged (monotonic), errors since]
+        self.sized = 0
+        self.last_ts = 0        # currentTs (ms) of the last decoded frame
+        self.stale = bytearray()    # iid -> 1 until its first tick after a gap
+        self.n_stale = 0
+        self.backfiller = None      # backfill.Backfiller, set to fill long gaps from REST
+
+    def register(self, detector):
+        detector.pipeline = self
+        detector.resize(len(self.registry))
+        self.detectors.append(detector)
+        if type(detector).on_tick is not Detector.on_tick:
+            self.tick_detectors.append(detector)
+        if type(detector).end_frame is not Detector.end_frame:
+            self.frame_detectors.append(detector)
+        self.decoder.configure({f for d in self.detectors for f in d.fields})
+        self.timings[detector.name] = metrics.histogram(
+            f"detector_{detector.name}_seconds", f"Time spent in the {detector.name} detector"
+        )
+        self.errors[detector.name] = metrics.counter(
+            f"detector_{detector.name}_errors_total", f"Ticks the {detector.name} detector raised on"
+        )
+        return detector
+
+    def add_sink(self, sink):
+        """A sink is any callable taking one alert dict."""
+        self.sinks.append(sink)
+        return sink
+
+    def emit(self, alert):
+        metrics.ALERTS.inc()
+        for sink in self.sinks:
+            sink(alert)
+
+    def process(self, buffer, now=None, recv=None):
+        """``recv`` is the perf_counter() stamp taken when the frame arrived."""
+        t0 = time.perf_counter()
+        try:
+            feed_response, ticks = self.decoder.decode(buffer, now, recv or t0)
+        except Exception:
+            metrics.DECODE_ERRORS.inc()
+            return []
+        elapsed = time.perf_counter() - t0
+        metrics.DECODE_TIME.record(elapsed)
+        profiler.DECODE.record(elapsed)
+        return self.accept(ticks, feed_response.currentTs, feed_response.type, len(feed_response.feeds))
+
+    def accept(self, ticks, current_ts, frame_type=pb.live_feed, n_feeds=None):
+        """Everything after decode, split out so decoding can run elsewhere (runmode.py)."""
+        n_feeds = len(ticks) if n_feeds is None else n_feeds
+        metrics.FRAMES.inc()
+        metrics.FEEDS.inc(n_feeds)
+        metrics.FEEDS_PER_FRAME.record(n_feeds)
+        if current_ts and self.last_ts and current_ts - self.last_ts > STALL_SECONDS * 1000:
+            self.mark_stale()
+        self.last_ts = current_ts or self.last_ts
+        metrics.record_lag(current_ts)
+        if ticks:
+            if frame_type == pb.initial_feed:
+                for tick in ticks:      # snapshot after (re)subscribe: baseline only
+                    tick.gap = True
+            self.dispatch(ticks)
+        return ticks
+
+    def dispatch(self, ticks):
+        if len(self.registry) != self.sized:
+            self.sized = len(self.registry)
+            self.stale.extend(bytes(self.sized - len(self.stale)))
+            for detector in self.detectors:
+                detector.resize(self.sized)
+        if self.n_stale:
+            stale = self.stale
+            for tick in ticks:
+                if stale[tick.iid]:
+                    stale[tick.iid] = 0
+                    self.n_stale -= 1
+                    tick.gap = True
+        for detector in self.tick_detectors:
+            on_tick = detector.on_tick
+            t0 = time.perf_counter()
+            for tick in ticks:
+                try:
+                    on_tick(tick)
+                except Exception as e:
+                    self.detector_error(detector, e)
+            elapsed = time.perf_counter() - t0
+            self.timings[detector.name].record(elapsed)
+            profiler.UPDATE.record(elapsed)
+        for detector in self.frame_detectors:
+            t0 = time.perf_counter()
+            try:
+                detector.end_frame()
+            except Exception as e:
+                print(f"⚠️ {detector.name} end_frame failed: {e}", flush=True)
+            elapsed = time.perf_counter() - t0
+            self.timings[detector.name].record(elapsed)
+            profiler.MONITOR.record(elapsed)
+
+    def detector_error(self, detector, exc):
+        """A detector's on_tick raised: count it under the detector, log it rate-limited."""
+        self.errors[detector.name].inc()
+        log = self.error_log.setdefault(detector.name, [0.0, 0])
+        log[1] += 1
+        now = time.monotonic()
+        if now - log[0] >= ERROR_LOG_INTERVAL:
+            print(f"⚠️ {detector.name} on_tick failed ({log[1]}x in the last {ERROR_LOG_INTERVAL:g}s): {exc!r}",
+                  flush=True)
+            log[0], log[1] = now, 0
+
+    # -------------------------------
+    # FEED GAPS
+    # -------------------------------
+    def mark_stale(self):
+        """Every instrument's next tick re-baselines (see Tick.gap)."""
+        GAPS.inc()
+        self.stale[:] = b"\x01" * len(self.stale)
+        self.n_stale = len(self.stale)
+
+    def on_gap(self, gap):
+        """session.UpstoxSession hook: re-baseline, and back-fill long gaps."""
+        self.mark_stale()
+        self.backfill_gap(gap)
+
+    def backfill_gap(self, gap):
+        """Back-fill ``gap`` from REST when it is long enough (and a back-filler is set)."""
+        if self.backfiller is not None and gap.seconds >= BACKFILL_MIN_SECONDS:
+            asyncio.ensure_future(self.backfill(gap.start, gap.end))
+
+    async def backfill(self, start, end, keys=None):
+        consumers = [d for d in self.detectors if type(d).on_backfill is not Detector.on_backfill]
+        if not consumers:
+            return {}
+        if keys is None:    # one REST call per key: only the instruments a consumer holds state for
+            wanted = set()
+            for detector in consumers:
+                wanted.update(detector.backfill_ids())
+            keys = [self.registry.keys[i] for i in sorted(wanted)]
+            if not keys:
+                return {}
+        candles = await self.backfiller.fill(keys, start, end)
+        ids = self.registry.ids
+        for key, rows in candles.items():
+            if rows:
+                for detector in consumers:
+                    detector.on_backfill(ids[key], rows)
+        print(f"🩹 back-filled {sum(map(len, candles.values()))} candles for {len(candles)} instruments "
+              f"({time.strftime('%H:%M', time.localtime(start))}–{time.strftime('%H:%M', time.localtime(end))})",
+              flush=True)
+        return candles
+
+    async def run_timer(self, detector):
+        hist = self.timings[detector.name]
+        while True:
+            await asyncio.sleep(detector.interval)
+            t0 = time.perf_counter()
+            try:
+                detector.on_timer(time.time())
+            except Exception as e:
+                print(f"⚠️ {detector.name} timer failed: {e}", flush=True)
+            elapsed = time.perf_counter() - t0
+            hist.record(elapsed)
+            metrics.DETECTOR_TIME.record(elapsed)
+            profiler.MONITOR.record(elapsed)
+
+    def start_timers(self):
+        return [
+            asyncio.create_task(self.run_timer(d))
+            for d in self.detectors if d.interval
+        ]
@@ -0,0 +1,314 @@
+"""Sampling profiler that can be switched on inside a running feed process.
+
+    profiler.install()                    # once, at startup (gemini5 / ingest / runmode)
+
+    kill -USR2 <pid>                      # profile for PROFILE_SECONDS (again: stop early)
+    curl '127.0.0.1:9108/profile?seconds=20' > gemini5.folded    # with METRICS=1
+
+A daemon thread wakes every PROFILE_INTERVAL, reads every other thread's
+Python stack (sys._current_frames) and counts identical stacks; nothing
+is hooked into the interpreter, so the process runs at full speed between
+samples and pays nothing at all while no profile is running. When the
+window closes it writes profiles/<script>-<pid>-<HHMMSS>.folded, one
+"thread;outer;...;inner count" line per stack (flamegraph.pl, speedscope,
+inferno), and a .json next to it with the stage timers below and the
+hottest functions.
+
+Stages are per-call timers the feed code records into unconditionally
+(a few float adds per frame): DECODE (protobuf parse + field extraction),
+UPDATE (per-tick state), MONITOR (window checks, timers) and PUBLISH
+(RabbitMQ). The profile reports each stage's calls, total, share of the
+window, mean and max over the window.
+
+    python profiler.py --check
+"""
+import json
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+from dotenv import load_dotenv
+
+import metrics
+
+# =========================================================
+# CONFIG
+# =========================================================
+load_dotenv()
+PROFILE_SECONDS = float(os.getenv("PROFILE_SECONDS", "30"))
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.005"))    # 200 Hz
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_SIGNAL = getattr(signal, os.getenv("PROFILE_SIGNAL", "SIGUSR2"), None)
+TOP_FUNCTIONS = 15
+# Leaf functions of a thread that is blocked (event loop select, Event.wait,
+# socket reads): kept in the flamegraph, left out of the busy/top numbers.
+IDLE_LEAVES = {"select", "poll", "wait", "_wait_for_tstate_lock", "readinto", "recv_into", "accept", "sleep"}
+
+
+# =========================================================
+# STAGE TIMERS
+# =========================================================
+class Stage:
+    __slots__ = ("name", "count", "total", "max")
+
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+
+DECODE = Stage("decode")
+UPDATE = Stage("update")
+MONITOR = Stage("monitor")
+PUBLISH = Stage("publish")
+STAGES = (DECODE, UPDATE, MONITOR, PUBLISH)
+
+
+# =========================================================
+# SAMPLER
+# =========================================================
+def _label(code):
+    module = os.path.splitext(os.path.basename(code.co_filename))[0]
+    return f"{module}.{getattr(code, 'co_qualname', code.co_name)}:{code.co_firstlineno}"
+
+
+class Profile:
+    """One sampling window; ``run`` is the sampler thread's body."""
+
+    def __init__(self, seconds=PROFILE_SECONDS, interval=PROFILE_INTERVAL, out_dir=PROFILE_DIR):
+        self.seconds = seconds
+        self.interval = interval
+        self.out_dir = out_dir
+        self.stacks = Counter()     # (thread id, (code, ...) innermost first) -> samples
+        self.names = {}             # thread id -> name, taken while the thread was alive
+        self.samples = 0
+        self.sample_time = 0.0      # spent inside the sampler itself
+        self.stopped = threading.Event()
+        self.done = threading.Event()
+        self.thread = None
+        self.paths = None
+        self.report = None
+
+    def start(self):
+        self.started = time.time()
+        self.t0 = time.perf_counter()
+        self.stage_start = [(s.count, s.total) for s in STAGES]
+        for s in STAGES:
+            s.max = 0.0
+        self.thread = threading.Thread(target=self.run, daemon=True, name="profiler")
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+
+    def run(self):
+        me = threading.get_ident()
+        stacks, names, interval = self.stacks, self.names, self.interval
+        deadline = self.t0 + self.seconds
+        current_frames, perf = sys._current_frames, time.perf_counter
+        try:
+            while not self.stopped.wait(interval):
+                t0 = perf()
+                if t0 >= deadline:
+                    break
+                for tid, frame in current_frames().items():
+                    if tid == me:
+                        continue
+                    if tid not in names:
+                        names.update((t.ident, t.name) for t in threading.enumerate())
+                    codes = []
+                    while frame is not None:
+                        codes.append(frame.f_code)
+                        frame = frame.f_back
+                    stacks[tid, tuple(codes)] += 1
+                self.samples += 1
+                self.sample_time += perf() - t0
+            self.finish()
+        finally:
+            self.done.set()
+
+    def finish(self):
+        wall = time.perf_counter() - self.t0
+        names = self.names
+        labels = {}
+        folded = Counter()
+        own = Counter()
+        busy = 0
+        for (tid, codes), n in self.stacks.items():
+            for code in codes:
+                if code not in labels:
+                    labels[code] = _label(code)
+            path = [names.get(tid, f"thread-{tid}")] + [labels[c] for c in reversed(codes)]
+            folded[";".join(path)] += n
+            if codes and codes[0].co_name not in IDLE_LEAVES:
+                own[labels[codes[0]]] += n
+                busy += n
+        stages = {}
+        for s, (count, total) in zip(STAGES, self.stage_start):
+            calls, spent = s.count - count, s.total - total
+            stages[s.name] = {"calls": calls, "seconds": round(spent, 6), "share": round(spent / wall, 4),
+                              "mean_us": round(spent / calls * 1e6, 2) if calls else 0.0,
+                              "max_ms": round(s.max * 1e3, 3)}
+        self.report = {
+            "pid": os.getpid(), "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+            "seconds": round(wall, 3), "interval": self.interval, "samples": self.samples,
+            "overhead": round(self.sample_time / wall, 5), "busy_samples": busy, "stages": stages,
+            "top": [[name, n] for name, n in own.most_common(TOP_FUNCTIONS)],
+        }
+        self.folded = "".join(f"{path} {n}\n" for path, n in sorted(folded.items()))
+        self.paths = self.write()
+        self.print_summary()
+
+    def write(self):
+        if not self.out_dir:
+            return None
+        os.makedirs(self.out_dir, exist_ok=True)
+        script = os.path.splitext(os.path.basename(sys.argv[0] or "python"))[0] or "python"
+        stem = os.path.join(self.out_dir, f"{script}-{os.getpid()}-{time.strftime('%H%M%S', time.localtime(self.started))}")
+        base, n = stem, 1
+        while os.path.exists(base + ".folded"):
+            n += 1
+            base = f"{stem}~{n}"
+        with open(base + ".folded", "w") as f:
+            f.write(self.folded)
+        with open(base + ".json", "w") as f:
+            json.dump(self.report, f, indent=1)
+        return base + ".folded", base + ".json"
+
+    def print_summary(self):
+        r = self.report
+        where = f" → {self.paths[0]}" if self.paths else ""
+        print(f"🔬 profile: {r['samples']} samples in {r['seconds']:.1f}s "
+              f"(sampler {r['overhead']:.2%} of wall){where}", flush=True)
+        stages = " | ".join(f"{name} {s['share']:.1%} ({s['calls']}x, mean {s['mean_us']:.0f}µs, max {s['max_ms']:.1f}ms)"
+                            for name, s in r["stages"].items() if s["calls"])
+        if stages:
+            print(f"🔬 stages: {stages}", flush=True)
+        for name, n in r["top"][:5]:
+            print(f"🔬   {n / max(1, r['busy_samples']):6.1%} of busy  {name}", flush=True)
+
+
+# =========================================================
+# RUNTIME TOGGLES: SIGNAL + /profile
+# =========================================================
+_lock = threading.Lock()
+_current = None
+
+
+def start(seconds=PROFILE_SECONDS, interval=PROFILE_INTERVAL, out_dir=PROFILE_DIR):
+    """Start a profile unless one is running; returns it (or None)."""
+    global _current
+    with _lock:
+        if _current is not None and not _current.done.is_set():
+            return None
+        _current = Profile(seconds, interval, out_dir).start()
+        print(f"🔬 profiling for {seconds:g}s at {1 / interval:.0f} Hz...", flush=True)
+        return _current
+
+
+def stop():
+    """Stop the running profile early (it still writes its files)."""
+    profile = _current
+    if profile is not None and not profile.done.is_set():
+        profile.stop()
+        return profile
+    return None
+
+
+def toggle(*_):
+    """Signal handler: start a profile, or end the running one."""
+    if stop() is None:
+        start()
+
+
+def _profile_route(query):
+    """GET /profile?seconds=N on the metrics server: blocks for the window, returns the folded stacks."""
+    seconds = float(query.get("seconds", PROFILE_SECONDS))
+    interval = float(query.get("interval", PROFILE_INTERVAL))
+    profile = start(seconds, interval)
+    if profile is None:
+        return 409, "text/plain", b"a profile is already running\n"
+    profile.done.wait()
+    return 200, "text/plain", profile.folded.encode()
+
+
+def install(sig=PROFILE_SIGNAL):
+    """Hook the signal (main thread only) and the /profile route; cheap enough to call everywhere."""
+    metrics.ROUTES["/profile"] = _profile_route
+    if sig is not None and threading.current_thread() is threading.main_thread():
+        signal.signal(sig, toggle)
+        print(f"🔬 profiler: kill -{sig.name[3:]} {os.getpid()} to profile {PROFILE_SECONDS:g}s", flush=True)
+
+
+# =========================================================
+# SELF-CHECK
+# =========================================================
+def _busy_decode(frames, registry):
+    from pipeline import Decoder
+
+    decoder = Decoder(registry)
+    for buf in frames:
+        t0 = time.perf_counter()
+        decoder.decode(buf)
+        DECODE.record(time.perf_counter() - t0)
+
+
+def _check():
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks"))
+    from decode_fastpath import make_frames
+
+    from instruments import InstrumentRegistry
+
+    frames = make_frames(1500, 200, change_prob=0.5)
+    t0 = time.perf_counter()
+    _busy_decode(frames, InstrumentRegistry())
+    base = time.perf_counter() - t0
+
+    # signal path: toggle on, run, toggle off
+    install()
+    os.kill(os.getpid(), PROFILE_SIGNAL)
+    t0 = time.perf_counter()
+    _busy_decode(frames, InstrumentRegistry())
+    profiled = time.perf_counter() - t0
+    os.kill(os.getpid(), PROFILE_SIGNAL)
+    _current.done.wait(5)
+    assert _current.paths and os.path.exists(_current.paths[0]), _current.paths
+    with open(_current.paths[0]) as f:
+        lines = f.read().splitlines()
+    assert any("pipeline.Decoder.decode" in line for line in lines), lines[:3]
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+    report = _current.report
+    assert report["stages"]["decode"]["calls"] >= 1500, report["stages"]
+    print(f"✅ signal toggle ok: {len(lines)} folded stacks, workload {base * 1e3:.0f}ms → "
+          f"{profiled * 1e3:.0f}ms under sampling ({profiled / base - 1:+.1%})")
+
+    # HTTP path, on a throwaway metrics server
+    from http.server import ThreadingHTTPServer
+    from urllib.request import urlopen
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), metrics._MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    worker = threading.Thread(target=_busy_decode, args=(frames, InstrumentRegistry()), name="decode-worker")
+    worker.start()
+    body = urlopen(f"http://127.0.0.1:{server.server_address[1]}/profile?seconds=0.3").read().decode()
+    worker.join()
+    server.shutdown()
+    assert any(line.startswith("decode-worker;") for line in body.splitlines()), body[:200]
+    print(f"✅ /profile ok: {len(body.splitlines())} folded stacks from the decode-worker thread")
+
+
+if __name__ == "__main__":
+    if "--check" in sys.argv:
+        _check()
+    else:
+        print(__doc__)
@@ -0,0 +1,125 @@
+import os
+import time
+from array import array
+
+import numpy as np
+
+from pipeline import Detector
+
+# =========================================================
+# ON-DISK TICK FORMAT
+# =========================================================
+# One directory per session day, one raw little-endian file per column so a
+# day can be appended to while live and np.memmap'ed later without copying:
+#
+#   ticks/2026-01-20/ts.f8  iid.i4  ltt.i8  ltp.f8  ltq.i8  vtt.i8  oi.f8  iv.f8  flags.i4
+#   ticks/2026-01-20/keys.txt       (line n = instrument key of iid n)
+#
+# ``flags`` uses the tick bus bits: FLAG_GREEKS, and FLAG_GAP on the first
+# tick after a reconnect / stall (Tick.gap), whose vtt jump is not a trade.
+# Days recorded before the column existed read back as all zeros.
+TICKS_DIR = "ticks"
+COLUMNS = {
+    "ts": ("d", "<f8"), "iid": ("i", "<i4"), "ltt": ("q", "<i8"), "ltp": ("d", "<f8"),
+    "ltq": ("q", "<i8"), "vtt": ("q", "<i8"), "oi": ("d", "<f8"), "iv": ("d", "<f8"),
+    "flags": ("i", "<i4"),
+}
+OPTIONAL = {"flags"}
+FLAG_GREEKS = 1
+FLAG_GAP = 2
+
+
+def day_dir(day=None, root=TICKS_DIR):
+    return os.path.join(root, day or time.strftime("%Y-%m-%d"))
+
+
+def load_day(path, mmap=True):
+    """Columns of one recorded day as NumPy arrays (memory-mapped by default) + keys."""
+    cols = {}
+    for name, (_, dtype) in COLUMNS.items():
+        fname = os.path.join(path, f"{name}.{dtype[1:]}")
+        if not os.path.exists(fname):
+            if name in OPTIONAL:
+                continue
+            cols[name] = np.zeros(0, dtype=dtype)
+        elif mmap and os.path.getsize(fname):
+            cols[name] = np.memmap(fname, dtype=dtype, mode="r")
+        else:
+            cols[name] = np.fromfile(fname, dtype=dtype)
+    n = min(len(c) for c in cols.values())     # ignore a torn final write
+    cols = {k: v[:n] for k, v in cols.items()}
+    for name in OPTIONAL - set(cols):
+        cols[name] = np.zeros(n, dtype=COLUMNS[name][1])
+    with open(os.path.join(path, "keys.txt")) as f:
+        keys = f.read().splitlines()
+    return cols, keys
+
+
+def list_days(root=TICKS_DIR):
+    if not os.path.isdir(root):
+        return []
+    return sorted(os.path.join(root, d) for d in os.listdir(root) if os.path.exists(os.path.join(root, d, "keys.txt")))
+
+
+# =========================================================
+# RECORDER (PIPELINE STAGE)
+# =========================================================
+class TickRecorder(Detector):
+    """Buffers every tick into typed arrays and appends them to the day's files.
+
+    Ids in the files are the day's own (keys.txt), so a restarted process
+    with a differently ordered registry keeps appending consistently.
+    """
+
+    name = "recorder"
+
+    def __init__(self, root=TICKS_DIR, flush_interval=5.0):
+        super().__init__()
+        self.path = day_dir(root=root)
+        os.makedirs(self.path, exist_ok=True)
+        self.interval = flush_interval
+        self.buffers = {name: array(code) for name, (code, _) in COLUMNS.items()}
+        keys_file = os.path.join(self.path, "keys.txt")
+        self.file_keys = []
+        if os.path.exists(keys_file):
+            with open(keys_file) as f:
+                self.file_keys = f.read().splitlines()
+        self.file_ids_by_key = {k: i for i, k in enumerate(self.file_keys)}
+        self.keys_written = len(self.file_keys)
+        self.file_ids = []      # registry iid -> id in this day's files
+
+    def resize(self, n_instruments):
+        keys = self.pipeline.registry.keys
+        for iid in range(len(self.file_ids), n_instruments):
+            fid = self.file_ids_by_key.get(keys[iid])
+            if fid is None:
+                fid = self.file_ids_by_key[keys[iid]] = len(self.file_keys)
+                self.file_keys.append(keys[iid])
+            self.file_ids.append(fid)
+
+    def on_tick(self, tick):
+        b = self.buffers
+        b["ts"].append(tick.ts)
+        b["iid"].append(self.file_ids[tick.iid])
+        b["ltt"].append(tick.ltt)
+        b["ltp"].append(tick.ltp)
+        b["ltq"].append(tick.ltq)
+        b["vtt"].append(tick.vtt)
+        b["oi"].append(tick.oi)
+        b["iv"].append(tick.iv)
+        b["flags"].append((FLAG_GREEKS if tick.has_greeks else 0) | (FLAG_GAP if tick.gap else 0))
+
+    def on_timer(self, now):
+        self.flush()
+
+    def flush(self):
+        if len(self.file_keys) > self.keys_written:
+            with open(os.path.join(self.path, "keys.txt"), "a") as f:
+                f.writelines(k + "\n" for k in self.file_keys[self.keys_written:])
+            self.keys_written = len(self.file_keys)
+        if not len(self.buffers["ts"]):
+            return
+        for name, (code, dtype) in COLUMNS.items():
+            with open(os.path.join(self.path, f"{name}.{dtype[1:]}"), "ab") as f:
+                self.buffers[name].tofile(f)
+            self.buffers[name] = array(code)
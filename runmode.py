@@ -0,0 +1,525 @@
+"""Production run modes for the feed (event loop, decode placement, CPU pinning).
+
+    python runmode.py run   --decode thread --feed-cpus 2 --detector-cpus 3
+    python runmode.py run   --decode process --feed-cpus 2 --detector-cpus 3
+    python runmode.py bench [--frames 4000] [--rate 1000]
+
+``--decode`` picks where protobuf decode happens:
+  inline   on the event loop, in the websocket callback (ingest.py default)
+  thread   on a decode thread; ticks come back to the loop in batches
+  process  in a separate feed process that publishes ticks on the
+           shared-memory tick bus; this process only runs detectors
+
+In process mode the feed process holds the websocket in ingest.FEED_MODE;
+the SubscriptionPlanner (PLAN_SUBSCRIPTIONS) runs here and its sub /
+change_mode / unsub go to the feed process over a queue. Gaps are flagged
+on the bus in tick order and also queued back here for the REST back-fill,
+and ticks go through Pipeline.accept per frame. Bus records carry no depth
+or book, so order flow and the paper engine refuse to start with it.
+
+``--loop auto`` uses uvloop when it is installed. ``bench`` replays a burst
+of synthetic frames through each configuration (each in a fresh process)
+and reports recv→alert latency for the energy-surge detector.
+"""
+import argparse
+import asyncio
+import gc
+import json
+import multiprocessing as mp
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+
+import MarketDataFeedV3_pb2 as pb
+import metrics
+import profiler
+from instruments import InstrumentRegistry
+from pipeline import FIELD_UNCHANGED, GAPS, Decoder, Tick
+
+# =========================================================
+# CONFIG
+# =========================================================
+LOOP = os.getenv("FEED_LOOP", "auto")               # auto | uvloop | asyncio
+DECODE = os.getenv("FEED_DECODE", "inline")         # inline | thread | process
+FEED_CPUS = os.getenv("FEED_CPUS", "")              # e.g. "2" or "2-3"
+DETECTOR_CPUS = os.getenv("DETECTOR_CPUS", "")
+BUS_NAME = "upstox_feed"
+BUS_POLL = 0.0002        # detector-process poll interval when the bus is empty
+
+DECODE_BATCH = metrics.histogram("decode_batch_frames", "Frames per decode-thread handoff", scale=1)
+
+
+def parse_cpus(text):
+    """'2' / '2,3' / '2-5' → set of CPU ids (empty = don't pin)."""
+    cpus = set()
+    for part in filter(None, (p.strip() for p in (text or "").split(","))):
+        lo, _, hi = part.partition("-")
+        cpus.update(range(int(lo), int(hi or lo) + 1))
+    return cpus
+
+
+def pin(cpus, label):
+    """Pin the calling thread (pid 0 on Linux) to ``cpus``."""
+    if not cpus:
+        return
+    if not hasattr(os, "sched_setaffinity"):
+        print(f"⚠️ CPU pinning not supported here; {label} not pinned", flush=True)
+        return
+    os.sched_setaffinity(0, cpus)
+    print(f"📌 {label} pinned to CPUs {sorted(cpus)}", flush=True)
+
+
+def use_loop(name=LOOP):
+    """Install uvloop's policy when asked/available; returns the loop in use."""
+    if name in ("auto", "uvloop"):
+        try:
+            import uvloop
+        except ImportError:
+            if name == "uvloop":
+                print("⚠️ uvloop not installed, using asyncio", flush=True)
+            return "asyncio"
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+        return "uvloop"
+    return "asyncio"
+
+
+def tune_gc():
+    """Move start-up objects out of the GC's reach and make young collections rarer."""
+    gc.collect()
+    gc.freeze()
+    gc.set_threshold(50_000, 20, 20)
+
+
+# =========================================================
+# DECODE ON A THREAD
+# =========================================================
+class ThreadDecoder:
+    """Decodes frames on a worker thread and hands ticks back in batches.
+
+    ``submit`` (the session's on_message) only appends to a list. The worker
+    swaps out everything queued, decodes it and returns the whole batch with
+    one call_soon_threadsafe, where Pipeline.accept runs frame by frame, so
+    detectors keep running on the loop thread only.
+    """
+
+    def __init__(self, pipeline, cpus=None):
+        self.pipeline = pipeline
+        self.decoder = pipeline.decoder
+        self.cpus = cpus
+        self.loop = None
+        self.pending = []
+        self.submitted = 0      # frames handed in (under cond)
+        self.delivered = 0      # frames decoded and dispatched, or dropped as undecodable (loop thread)
+        self.cond = threading.Condition()
+        self.thread = threading.Thread(target=self._run, name="decoder", daemon=True)
+
+    def start(self, loop=None):
+        self.loop = loop or asyncio.get_running_loop()
+        self.thread.start()
+        return self
+
+    def submit(self, buffer, recv=None):
+        with self.cond:
+            self.pending.append((buffer, recv or time.perf_counter()))
+            self.submitted += 1
+            self.cond.notify()
+
+    def _run(self):
+        pin(self.cpus, "decode thread")
+        decode = self.decoder.decode
+        while True:
+            with self.cond:
+                while not self.pending:
+                    self.cond.wait()
+                batch, self.pending = self.pending, []
+            out = []
+            for buffer, recv in batch:
+                t0 = time.perf_counter()
+                try:
+                    feed_response, ticks = decode(buffer, None, recv)
+                except Exception:
+                    metrics.DECODE_ERRORS.inc()
+                    continue
+                metrics.DECODE_TIME.record(time.perf_counter() - t0)
+                out.append((ticks, feed_response.currentTs, feed_response.type, len(feed_response.feeds)))
+            DECODE_BATCH.record(len(batch))
+            self.loop.call_soon_threadsafe(self._deliver, out, len(batch))
+
+    def _deliver(self, out, n_frames):
+        accept = self.pipeline.accept
+        for ticks, current_ts, frame_type, n_feeds in out:
+            accept(ticks, current_ts, frame_type, n_feeds)
+        self.delivered += n_frames
+
+    async def drain(self, poll=0.005):
+        """Until every submitted frame, including a batch still being decoded, reached the pipeline."""
+        while True:
+            with self.cond:
+                submitted = self.submitted
+            if self.delivered >= submitted:
+                return
+            await asyncio.sleep(poll)
+
+
+# =========================================================
+# DECODE IN A FEED PROCESS (TICK BUS HANDOFF)
+# =========================================================
+# What a bus record carries (tick_bus.TICK_DTYPE): no greeks tuple, depth or book.
+BUS_FIELDS = {FIELD_UNCHANGED}
+
+
+class BusPublisher:
+    """on_message / on_gap for the feed process: decode, flag gaps, publish on the bus.
+
+    Gaps are also put on ``gaps`` (a multiprocessing queue) so the detector
+    process can back-fill them; re-baselining happens here, in tick order.
+    """
+
+    def __init__(self, registry, writer, fields=(), gaps=None):
+        self.registry = registry
+        self.writer = writer
+        self.decoder = Decoder(registry, fields)
+        self.gaps = gaps
+        self.stale = set()
+        self.last_ts = 0        # currentTs (ms) of the last frame, the session's feed_clock
+
+    def on_gap(self, gap):
+        self.stale.update(range(len(self.registry)))
+        if self.gaps is not None:
+            self.gaps.put(gap)
+
+    def on_message(self, buffer, recv=None):
+        try:
+            feed_response, ticks = self.decoder.decode(buffer, None, recv)
+        except Exception:
+            metrics.DECODE_ERRORS.inc()
+            return
+        self.last_ts = feed_response.currentTs or self.last_ts
+        initial = feed_response.type == pb.initial_feed
+        stale, publish = self.stale, self.writer.publish_tick
+        for tick in ticks:
+            if initial or tick.iid in stale:
+                stale.discard(tick.iid)
+                tick.gap = True
+            publish(tick)
+
+
+async def _apply_commands(session, commands, poll=0.05):
+    """Feed process: replay the detector process's sub / change_mode / unsub on the real session."""
+    while True:
+        try:
+            method, keys, mode = commands.get_nowait()
+        except queue.Empty:
+            await asyncio.sleep(poll)
+            continue
+        if method == "unsub":
+            await session.unsubscribe(keys)
+        elif method == "change_mode":
+            await session.change_mode(keys, mode)
+        else:
+            await session.subscribe(keys, mode)
+
+
+def _feed_main(keys, bus_name, cpus, ready, replay=None, drain_timeout=30.0, fields=(), mode="option_greeks",
+               commands=None, gaps=None, token=None):
+    """Feed process: websocket (or a replayed burst) → decode → tick bus."""
+    from tick_bus import TickBusWriter
+
+    pin(cpus, "feed process")
+    loop_name = use_loop()
+    tune_gc()
+    registry = InstrumentRegistry(keys)
+    writer = TickBusWriter(bus_name, registry=registry)
+    publisher = BusPublisher(registry, writer, fields, gaps)
+    ready.set()
+    try:
+        if replay is not None:
+            asyncio.run(_replay(publisher.on_message, *replay))
+            # the segment goes with close(): first let the detector process read all of it
+            if not writer.drain(drain_timeout):
+                print(f"⚠️ tick bus reader still behind after {drain_timeout:g}s", flush=True)
+        else:
+            from session import UpstoxSession
+
+            print(f"🛰️ feed process ({loop_name}) streaming {len(keys)} instruments", flush=True)
+            # planned: the detector process's planner subscribes everything through ``commands``
+            session = UpstoxSession(() if commands is not None else keys, mode, on_message=publisher.on_message,
+                                    on_gap=publisher.on_gap, feed_clock=lambda: publisher.last_ts, token=token,
+                                    guid="feed")
+
+            async def main():
+                if commands is not None:
+                    asyncio.create_task(_apply_commands(session, commands))
+                await session.run()
+            asyncio.run(main())
+    finally:
+        writer.close()
+
+
+def feed_session(commands):
+    """Detector-process stand-in for the feed process's UpstoxSession, for the
+    SubscriptionPlanner: same bookkeeping, the messages go over ``commands``."""
+    from session import UpstoxSession
+
+    class FeedSession(UpstoxSession):
+        async def _send(self, keys, mode, method):
+            if keys:
+                commands.put((method, list(keys), mode))
+
+    return FeedSession(guid="feed")
+
+
+class BusSource:
+    """Detector-process side: records from the tick bus → Ticks → Pipeline.accept."""
+
+    def __init__(self, pipeline, reader, gaps=None):
+        self.pipeline = pipeline
+        self.reader = reader
+        self.gaps = gaps
+        self.ids = []       # bus iid → pipeline iid
+
+    def _iid(self, bus_iid):
+        ids = self.ids
+        while bus_iid >= len(ids):
+            ids.append(self.pipeline.registry.intern(self.reader.key(len(ids))))
+        return ids[bus_iid]
+
+    def ticks(self, records):
+        keys = self.pipeline.registry.keys
+        out = []
+        for _, bus_iid, flags, ts, ltt, ltp, ltq, vtt, oi, iv, recv in records.tolist():
+            iid = self._iid(bus_iid)
+            tick = Tick(iid, keys[iid], ts, ltt, ltp, ltq, 0.0, vtt, oi, iv, bool(flags & 1))
+            tick.recv = recv
+            tick.gap = bool(flags & 2)
+            out.append(tick)
+        return out
+
+    async def run(self, poll=BUS_POLL):
+        if self.gaps is not None:
+            asyncio.create_task(self._backfill_gaps())
+        reader, accept = self.reader, self.pipeline.accept
+        while True:
+            records = reader.poll()
+            if len(records):
+                # one accept per source frame (its ticks share the recv stamp), as inline decode
+                # does, so end_frame detectors see the same frame boundaries; the bus has the
+                # decode time, not currentTs, which is close enough for last_ts and stalls
+                recv = records["recv"]
+                cuts = np.flatnonzero(recv[1:] != recv[:-1]) + 1
+                for frame in np.split(records, cuts) if len(cuts) else (records,):
+                    accept(self.ticks(frame), int(frame["ts"][0] * 1000))
+            else:
+                await asyncio.sleep(poll)
+
+    async def _backfill_gaps(self, poll=0.1):
+        # the feed process already flagged the post-gap ticks; only the REST back-fill is left
+        while True:
+            try:
+                gap = self.gaps.get_nowait()
+            except queue.Empty:
+                await asyncio.sleep(poll)
+                continue
+            GAPS.inc()
+            self.pipeline.backfill_gap(gap)
+
+
+def start_feed_process(keys, bus_name=BUS_NAME, cpus=None, replay=None, fields=(), mode="option_greeks",
+                       commands=None, gaps=None, token=None):
+    """Spawn the feed process and attach a reader once its bus exists."""
+    from tick_bus import TickBusReader
+
+    ctx = mp.get_context("spawn")
+    ready = ctx.Event()
+    proc = ctx.Process(target=_feed_main, args=(keys, bus_name, cpus, ready, replay),
+                       kwargs={"fields": fields, "mode": mode, "commands": commands, "gaps": gaps,
+                               "token": token}, daemon=True)
+    proc.start()
+    if not ready.wait(30):
+        raise RuntimeError("feed process did not start")
+    return proc, TickBusReader(bus_name)
+
+
+# =========================================================
+# RUN
+# =========================================================
+def run(decode=DECODE, loop=LOOP, feed_cpus=None, detector_cpus=None):
+    import ingest
+    from sinks import RabbitMQSink
+
+    loop_name = use_loop(loop)
+    pipeline, keys = ingest.build_pipeline()
+    if not keys:
+        print("no instrument keys")
+        return
+    fields = {f for d in pipeline.detectors for f in d.fields}
+    if decode == "process" and fields - BUS_FIELDS:
+        users = sorted({d.name for d in pipeline.detectors if set(d.fields) - BUS_FIELDS})
+        sys.exit(f"--decode process: the tick bus carries no {', '.join(sorted(fields - BUS_FIELDS))} "
+                 f"({', '.join(users)} need it); use --decode inline or thread")
+    mq_sink = pipeline.alerts.add_sink(RabbitMQSink()) if ingest.USE_RABBITMQ else None
+    metrics.start()
+    profiler.install()
+    print(f"⚙️ run mode: loop={loop_name} decode={decode}", flush=True)
+
+    if decode == "process":
+        ctx = mp.get_context("spawn")
+        commands = ctx.Queue() if ingest.PLAN_SUBSCRIPTIONS else None
+        gaps = ctx.Queue()
+        proc, reader = start_feed_process(keys, cpus=feed_cpus, fields=fields, mode=ingest.FEED_MODE,
+                                          commands=commands, gaps=gaps, token=ingest.ACCESS_TOKEN)
+        pin(detector_cpus, "detector process")
+        tune_gc()
+
+        async def main():
+            ingest.start_background(pipeline, mq_sink)
+            if ingest.BACKFILL_GAPS:
+                from backfill import Backfiller
+                pipeline.backfiller = Backfiller(ingest.ACCESS_TOKEN)
+            if commands is not None:
+                await ingest.start_planner(pipeline, feed_session(commands), keys, ingest.FEED_MODE)
+            await BusSource(pipeline, reader, gaps).run()
+    else:
+        pin(detector_cpus, "event loop")
+        tune_gc()
+
+        async def main():
+            on_message = None
+            if decode == "thread":
+                on_message = ThreadDecoder(pipeline, feed_cpus).start().submit
+            await ingest.fetch_market_data(pipeline, keys, mq_sink, on_message=on_message)
+
+    asyncio.run(main())
+
+
+# =========================================================
+# BENCHMARK: REPLAYED BURST → recv→alert LATENCY
+# =========================================================
+BENCH_CONFIGS = (
+    ("inline", "asyncio"), ("inline", "uvloop"),
+    ("thread", "asyncio"), ("thread", "uvloop"),
+    ("process", "asyncio"), ("process", "uvloop"),
+)
+BENCH_INSTRUMENTS = 200
+BENCH_MIN_VALUE = 150_000
+# frames/s (x 40 feeds) every mode keeps up with; above it p50 measures backlog, not latency
+BENCH_RATE = 1000
+BACKLOG_P50_MS = 50
+
+
+def _bench_frames(n_frames):
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks"))
+    from decode_fastpath import make_frames
+
+    return make_frames(n_frames, BENCH_INSTRUMENTS, change_prob=0.5)
+
+
+async def _replay(submit, n_frames, rate, lead=0.5):
+    """Deliver frames on a fixed schedule starting ``lead`` seconds after they are
+    built; each frame's recv stamp is its scheduled arrival (perf_counter, shared
+    across processes on Linux), so time spent queued behind a slow consumer
+    counts as latency."""
+    frames = _bench_frames(n_frames)
+    t0 = time.perf_counter() + lead
+    while time.perf_counter() < t0:
+        await asyncio.sleep(0.001)
+    for i, buf in enumerate(frames):
+        arrival = t0 + i / rate
+        ahead = arrival - time.perf_counter()
+        if ahead > 0:
+            await asyncio.sleep(ahead)
+        submit(buf, recv=arrival)
+        await asyncio.sleep(0)          # a real ws.recv() yields per message
+
+
+def _bench_one(decode, loop, n_frames, rate, feed_cpus, detector_cpus):
+    from detectors import EnergySurgeDetector
+    from pipeline import Pipeline
+
+    loop_name = use_loop(loop)
+    if loop != "auto" and loop_name != loop:
+        return {"decode": decode, "loop": loop, "skipped": "uvloop not installed"}
+    keys = [f"NSE_FO|{100000 + i}" for i in range(BENCH_INSTRUMENTS)]
+    info = {k: {"name": k, "strike": 0, "type": "CE"} for k in keys}
+    pipeline = Pipeline(InstrumentRegistry(keys, info))
+    pipeline.register(EnergySurgeDetector(min_value=BENCH_MIN_VALUE))
+    latency = metrics.Histogram("recv_alert")
+    pipeline.add_sink(lambda alert: latency.record(time.perf_counter() - alert["stamps"]["recv"]))
+    tune_gc()
+
+    async def main():
+        if decode == "process":
+            proc, reader = start_feed_process(keys, f"{BUS_NAME}_bench", feed_cpus,
+                                              replay=(n_frames, rate))
+            pin(detector_cpus, "detector process")
+            task = asyncio.create_task(BusSource(pipeline, reader).run())
+            await asyncio.to_thread(proc.join)
+            task.cancel()
+            return reader.overruns, reader.lost
+        pin(detector_cpus, "event loop")
+        if decode == "thread":
+            decoder = ThreadDecoder(pipeline, feed_cpus).start()
+            await _replay(decoder.submit, n_frames, rate)
+            await decoder.drain()
+        else:
+            await _replay(pipeline.process, n_frames, rate)
+        return 0, 0
+
+    t = time.perf_counter()
+    overruns, lost = asyncio.run(main())
+    elapsed = time.perf_counter() - t
+    return {"decode": decode, "loop": loop_name, "alerts": latency.count, "overruns": overruns, "lost": lost,
+            "p50_ms": latency.percentile(50) * 1e3, "p99_ms": latency.percentile(99) * 1e3,
+            "max_ms": latency.max * 1e3, "elapsed_s": elapsed}
+
+
+def bench(n_frames=4000, rate=BENCH_RATE, feed_cpus="", detector_cpus=""):
+    print(f"🔥 replaying {n_frames} frames x 40 feeds at {rate:,}/s over {BENCH_INSTRUMENTS} instruments\n")
+    print(f"{'decode':<8} {'loop':<8} {'alerts':>7} {'p50':>9} {'p99':>9} {'max':>9} {'lost':>6}")
+    results = []
+    for decode, loop in BENCH_CONFIGS:
+        cmd = [sys.executable, os.path.abspath(__file__), "_bench_one", "--decode", decode, "--loop", loop,
+               "--frames", str(n_frames), "--rate", str(rate),
+               "--feed-cpus", feed_cpus, "--detector-cpus", detector_cpus]
+        proc = subprocess.run(cmd, capture_output=True, text=True)
+        lines = [ln for ln in proc.stdout.splitlines() if ln.startswith("{")]
+        if not lines:
+            print(f"{decode:<8} {loop:<8} failed: {proc.stderr.strip().splitlines()[-1:]}")
+            continue
+        r = json.loads(lines[-1])
+        results.append(r)
+        if "skipped" in r:
+            print(f"{decode:<8} {loop:<8} skipped ({r['skipped']})")
+        else:
+            print(f"{decode:<8} {loop:<8} {r['alerts']:>7} {r['p50_ms']:>7.2f}ms {r['p99_ms']:>7.2f}ms "
+                  f"{r['max_ms']:>7.2f}ms {r['lost']:>6}")
+    saturated = [f"{r['decode']}/{r['loop']}" for r in results if r.get("p50_ms", 0) > BACKLOG_P50_MS]
+    if saturated:
+        print(f"\n⚠️ p50 over {BACKLOG_P50_MS} ms for {', '.join(saturated)}: backlogged at {rate:,}/s, "
+              f"the numbers are queueing, not latency; lower --rate to compare modes")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Feed run modes and latency benchmark")
+    parser.add_argument("command", choices=("run", "bench", "_bench_one"))
+    parser.add_argument("--decode", choices=("inline", "thread", "process"), default=DECODE)
+    parser.add_argument("--loop", choices=("auto", "uvloop", "asyncio"), default=LOOP)
+    parser.add_argument("--feed-cpus", default=FEED_CPUS, help="CPUs for the decode thread / feed process")
+    parser.add_argument("--detector-cpus", default=DETECTOR_CPUS, help="CPUs for the detector loop/process")
+    parser.add_argument("--frames", type=int, default=4000)
+    parser.add_argument("--rate", type=float, default=BENCH_RATE, help="replayed frames per second")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        run(args.decode, args.loop, parse_cpus(args.feed_cpus), parse_cpus(args.detector_cpus))
+    elif args.command == "bench":
+        bench(args.frames, args.rate, args.feed_cpus, args.detector_cpus)
+    else:
+        print(json.dumps(_bench_one(args.decode, args.loop, args.frames, args.rate,
+                                    parse_cpus(args.feed_cpus), parse_cpus(args.detector_cpus))))
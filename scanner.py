@@ -0,0 +1,341 @@
+"""Cross-sectional scanner: every underlying ranked by option activity, once a second.
+
+Per underlying the scanner follows the spot (ltpc) and its current ATM
+call and put (option_greeks). Ticks only update flat per-underlying
+slots; once a second one vectorized pass over the whole matrix computes
+
+    spot_chg   spot % change vs previous close
+    ce_value   ATM call value traded over the lookback (₹)
+    pe_value   ATM put value traded over the lookback (₹)
+    oi_chg     ATM call+put OI % change over the lookback
+    iv_chg     ATM mean IV change over the lookback (vol points)
+
+z-scores each column across all names, and ranks them by the weighted
+sum of |z|. The top-N goes to the sinks (print, RabbitMQ 'scanner_top' →
+bridge.py → index.html).
+
+    python LIVE_LOGGING_OF_ALL_COMPANIES.py     # live
+    python scanner.py --check                   # synthetic market, timing
+"""
+import json
+import time
+
+import numpy as np
+
+import metrics
+from instruments import grow
+from ladders import LadderManager
+from pipeline import Detector
+
+# =========================================================
+# CONFIG
+# =========================================================
+SCAN_INTERVAL = 1.0      # seconds between ranking passes
+LOOKBACK = 60            # scans (seconds) behind value / OI / IV changes
+TOP_N = 20
+FEATURES = ("spot_chg", "ce_value", "pe_value", "oi_chg", "iv_chg")
+WEIGHTS = np.array([1.0, 1.5, 1.5, 1.0, 0.5])       # per feature, applied to |z|
+QUEUE_NAME = "scanner_top"
+CONTENT_TYPE = "application/json"
+MESSAGE_TYPE = "scanner.top.v1"
+
+SPOT, CE_OI, PE_OI, CE_IV, PE_IV = range(5)         # level columns kept in the history ring
+CE, PE = 0, 1
+
+SCAN_TIME = metrics.histogram("scanner_pass_seconds", "One vectorized ranking pass over every underlying")
+
+
+class CrossSectionScanner(Detector):
+    """Ranks underlyings by ATM option activity (see module docstring).
+
+    ``option_map`` is instruments.load_option_map()'s underlying →
+    [(strike, ce_key, pe_key)]. ATM tracking is a ladders.LadderManager
+    (pass one with a subscriber to have the option legs subscribed as the
+    ATM moves); ``on_atm(underlying_key, old_keys, new_keys)`` is called on
+    every move as well. The OI/IV history of an underlying restarts from
+    the new strike's first ticks.
+    """
+
+    name = "scanner"
+
+    def __init__(self, option_map, underlying_info=None, interval=SCAN_INTERVAL, lookback=LOOKBACK, top_n=TOP_N,
+                 weights=WEIGHTS, on_atm=None, ladders=None):
+        super().__init__()
+        self.underlyings = sorted(k for k in option_map if option_map[k])
+        self.symbols = [(underlying_info or {}).get(k, k) for k in self.underlyings]
+        self.u_index = {k: u for u, k in enumerate(self.underlyings)}
+        self.ladders = ladders if ladders is not None else LadderManager(option_map)
+        self.interval = interval
+        self.lookback = lookback
+        self.top_n = top_n
+        self.weights = np.asarray(weights, dtype=float)
+        self.on_atm = on_atm
+        self.sinks = []
+
+        n = len(self.underlyings)
+        nan = float("nan")
+        # tick path: flat Python lists (plain float stores); scans turn them into arrays
+        self.spot = [nan] * n
+        self.cp = [nan] * n
+        self.oi = [nan] * (2 * n)       # slot = 2u + CE/PE
+        self.iv = [nan] * (2 * n)
+        self.value = [0.0] * (2 * n)    # traded since the last scan
+        self.atm = [None] * n           # u -> (strike, ce_key, pe_key)
+        self.rebased = set()
+        # scan side: history rings, one row per scan
+        self.levels = np.full((lookback, n, 5), np.nan)
+        self.first = np.full((n, 5), np.nan)       # first level seen since start / the last ATM move
+        self.values = np.zeros((lookback, n, 2))
+        self.cursor = 0
+        self.scans = 0
+        self.last = None
+
+        self.u_of = []          # registry iid -> underlying index (spot keys), else -1
+        self.slot = []          # registry iid -> 2u + CE/PE while it is an ATM option, else -1
+        self.last_vtt = []
+
+    def add_sink(self, sink):
+        self.sinks.append(sink)
+        return sink
+
+    def resize(self, n_instruments):
+        keys = self.pipeline.registry.keys
+        for iid in range(len(self.u_of), n_instruments):
+            self.u_of.append(self.u_index.get(keys[iid], -1))
+        grow(self.slot, n_instruments, -1)
+        grow(self.last_vtt, n_instruments, 0)
+
+    # -------------------------------
+    # TICK PATH
+    # -------------------------------
+    def on_tick(self, tick):
+        iid = tick.iid
+        u = self.u_of[iid]
+        if u >= 0:
+            self.spot[u] = tick.ltp
+            if tick.cp:
+                self.cp[u] = tick.cp
+            ladder = self.ladders.update(self.underlyings[u], tick.ltp)
+            if ladder is not None:
+                self._move_atm(u, ladder.atm)
+            return
+        s = self.slot[iid]
+        if s < 0:
+            return
+        prev = self.last_vtt[iid]
+        self.last_vtt[iid] = tick.vtt
+        if prev and tick.vtt > prev and not tick.gap:
+            self.value[s] += (tick.vtt - prev) * tick.ltp
+        if tick.oi:
+            self.oi[s] = tick.oi
+        if tick.iv:
+            self.iv[s] = tick.iv
+
+    def _move_atm(self, u, atm):
+        registry = self.pipeline.registry
+        old = self.atm[u]
+        self.atm[u] = atm
+        old_keys = [k for k in (old[1], old[2]) if k] if old else []
+        new_keys = [k for k in (atm[1], atm[2]) if k]
+        for key in old_keys:
+            iid = registry.ids.get(key)
+            if iid is not None and iid < len(self.slot):
+                self.slot[iid] = -1
+        for side, key in ((CE, atm[1]), (PE, atm[2])):
+            s = 2 * u + side
+            self.oi[s] = self.iv[s] = float("nan")
+            if key:
+                iid = registry.intern(key)
+                self.resize(len(registry))
+                self.slot[iid] = s
+                self.last_vtt[iid] = 0      # vtt went on while it was not ATM: the first tick only re-baselines
+        self.rebased.add(u)
+        if self.on_atm is not None:
+            self.on_atm(self.underlyings[u], old_keys, new_keys)
+
+    # -------------------------------
+    # ONE VECTORIZED PASS PER SECOND
+    # -------------------------------
+    def on_timer(self, now):
+        t0 = time.perf_counter()
+        snapshot = self.scan(now)
+        SCAN_TIME.record(time.perf_counter() - t0)
+        for sink in self.sinks:
+            sink(snapshot)
+
+    def scan(self, now=None):
+        n = len(self.underlyings)
+        h = self.cursor
+        if self.rebased:
+            rows = list(self.rebased)
+            self.levels[:, rows, CE_OI:] = np.nan      # OI/IV history belonged to the old strike
+            self.first[rows, CE_OI:] = np.nan
+            self.rebased.clear()
+        oi = np.array(self.oi).reshape(n, 2)
+        iv = np.array(self.iv).reshape(n, 2)
+        spot = np.array(self.spot)
+        level = np.column_stack((spot, oi, iv))
+        value = np.array(self.value).reshape(n, 2)
+        self.value = [0.0] * (2 * n)
+
+        # ``lookback`` scans ago, or the first level seen when history is shorter than that
+        self.first = np.where(np.isnan(self.first), level, self.first)
+        past = np.where(np.isnan(self.levels[h]), self.first, self.levels[h])
+        self.levels[h] = level
+        self.values[h] = value
+        self.cursor = (h + 1) % self.lookback
+        self.scans += 1
+
+        traded = self.values.sum(axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            oi_now, oi_then = level[:, CE_OI] + level[:, PE_OI], past[:, CE_OI] + past[:, PE_OI]
+            features = np.column_stack((
+                (spot / np.array(self.cp) - 1.0) * 100.0,
+                traded[:, CE],
+                traded[:, PE],
+                (oi_now / oi_then - 1.0) * 100.0,
+                (level[:, CE_IV] + level[:, PE_IV]) / 2 - (past[:, CE_IV] + past[:, PE_IV]) / 2,
+            ))
+            features[~np.isfinite(features)] = np.nan
+            valid = ~np.isnan(features)
+            count = valid.sum(axis=0)
+            filled = np.where(valid, features, 0.0)
+            mean = filled.sum(axis=0) / count
+            std = np.sqrt(np.where(valid, (filled - mean) ** 2, 0.0).sum(axis=0) / count)
+            z = (features - mean) / np.where(std > 0, std, np.nan)
+        z = np.nan_to_num(z)
+        score = np.abs(z) @ self.weights
+
+        k = min(self.top_n, n)
+        top = np.argpartition(-score, k - 1)[:k] if k < n else np.arange(n)
+        top = top[np.argsort(-score[top], kind="stable")]
+        rows = []
+        for rank, u in enumerate(top.tolist(), 1):
+            f = features[u]
+            atm = self.atm[u]
+            rows.append({
+                "rank": rank, "underlying": self.underlyings[u], "symbol": self.symbols[u],
+                "score": round(float(score[u]), 3), "spot": _num(spot[u]), "atm": atm[0] if atm else None,
+                **{name: _num(f[j]) for j, name in enumerate(FEATURES)},
+                "z": [round(float(x), 2) for x in z[u]],
+            })
+        self.last = {"type": "scanner", "ts_ns": time.time_ns(), "lookback": self.lookback,
+                     "features": FEATURES, "rows": rows}
+        return self.last
+
+
+def _num(x, digits=2):
+    return None if x != x else round(float(x), digits)
+
+
+# =========================================================
+# SINKS
+# =========================================================
+def encode_latest(batch):
+    """RabbitMQSink encoder: only the newest ranking in a backlog matters."""
+    return json.dumps(batch[-1]).encode("utf-8")
+
+
+def rabbitmq_sink(host="localhost"):
+    from sinks import RabbitMQSink
+
+    return RabbitMQSink(host, QUEUE_NAME, encode=encode_latest, content_type=CONTENT_TYPE, message_type=MESSAGE_TYPE)
+
+
+class PrintTop:
+    """Prints the top ``n`` every ``every`` seconds."""
+
+    def __init__(self, n=10, every=5.0):
+        self.n = n
+        self.every = every
+        self.next_at = 0.0
+
+    def __call__(self, snapshot):
+        now = time.time()
+        if now < self.next_at or not snapshot["rows"]:
+            return
+        self.next_at = now + self.every
+        print(f"\n{time.strftime('%H:%M:%S')} | top {self.n} by option activity ({snapshot['lookback']}s)")
+        print(f"{'#':>3} {'symbol':<14} {'score':>6} {'spot %':>7} {'ATM':>8} {'CE ₹':>12} {'PE ₹':>12} "
+              f"{'OI %':>7} {'IV Δ':>6}")
+        for r in snapshot["rows"][:self.n]:
+            print(f"{r['rank']:>3} {r['symbol']:<14} {r['score']:>6.2f} {_fmt(r['spot_chg'], 7)} {r['atm'] or '-':>8} "
+                  f"{_fmt(r['ce_value'], 12, 0)} {_fmt(r['pe_value'], 12, 0)} {_fmt(r['oi_chg'], 7)} "
+                  f"{_fmt(r['iv_chg'], 6)}")
+        print("-" * 80, flush=True)
+
+
+def _fmt(x, width, digits=2):
+    return f"{'-':>{width}}" if x is None else f"{x:>{width},.{digits}f}"
+
+
+# =========================================================
+# SELF-CHECK: SYNTHETIC MARKET
+# =========================================================
+def _check(n_underlyings=200, strikes=30, seconds=90):
+    import random
+
+    from instruments import InstrumentRegistry
+    from pipeline import Pipeline, Tick
+
+    rng = random.Random(3)
+    option_map, info = {}, {}
+    for u in range(n_underlyings):
+        key = f"NSE_EQ|INE{u:06d}"
+        info[key] = f"SYM{u}"
+        option_map[key] = [(1000.0 + 10 * s, f"NSE_FO|{u}CE{s}", f"NSE_FO|{u}PE{s}") for s in range(strikes)]
+    moved = []
+    pipeline = Pipeline(InstrumentRegistry(list(option_map)))
+    scanner = pipeline.register(CrossSectionScanner(option_map, info, lookback=30,
+                                                    on_atm=lambda k, old, new: moved.append(k)))
+    spot = {k: 1145.0 + rng.uniform(-3, 3) for k in option_map}
+    vtt, oi = {}, {}
+    hot = "NSE_EQ|INE000042"
+    timings = []
+    t = 1_700_000_000.0
+    for sec in range(seconds):
+        ticks = []
+        for key in option_map:
+            spot[key] *= 1 + rng.gauss(0, 0.0002)
+            ticks.append(Tick(pipeline.registry.intern(key), key, t, int(t * 1000), spot[key], 0, 1140.0))
+        pipeline.dispatch(ticks)
+        ticks = []
+        for u, key in enumerate(scanner.underlyings):
+            for side in (1, 2):
+                okey = scanner.atm[u][side]
+                burst = key == hot and sec > seconds - 20
+                vtt[okey] = vtt.get(okey, 0) + rng.randint(0, 20) * 75 * (40 if burst else 1)
+                oi[okey] = oi.get(okey, 1e5) * (1.01 if burst else 1 + rng.gauss(0, 0.0005))
+                ticks.append(Tick(pipeline.registry.ids[okey], okey, t, int(t * 1000), 20.0, 75, 19.0,
+                                  vtt[okey], oi[okey], 0.2 + (0.05 if burst else 0.0), True))
+        pipeline.dispatch(ticks)
+        t0 = time.perf_counter()
+        snapshot = scanner.scan(t)
+        timings.append(time.perf_counter() - t0)
+        t += 1
+    PrintTop(5)(snapshot)
+
+    # ATM away and back: the volume traded meanwhile must not land in one scan
+    key = scanner.underlyings[0]
+    strike, ce_key, _ = scanner.atm[0]
+    for price in (strike + 20, strike):
+        pipeline.dispatch([Tick(pipeline.registry.ids[key], key, t, int(t * 1000), price, 0, 1140.0)])
+    assert scanner.atm[0][1] == ce_key
+    vtt[ce_key] += 1_000_000
+    pipeline.dispatch([Tick(pipeline.registry.ids[ce_key], ce_key, t, int(t * 1000), 20.0, 75, 19.0,
+                            vtt[ce_key], oi[ce_key], 0.2, True)])
+    assert scanner.value[CE] == 0.0, scanner.value[CE]
+    assert snapshot["rows"][0]["underlying"] == hot, snapshot["rows"][0]
+    assert len(moved) >= n_underlyings
+    timings.sort()
+    print(f"✅ scanner ok: {n_underlyings} underlyings, pass p50 {timings[len(timings) // 2] * 1e6:.0f} µs "
+          f"/ max {timings[-1] * 1e6:.0f} µs; message {len(encode_latest([snapshot])):,} B")
+
+
+if __name__ == "__main__":
+    import sys
+
+    if "--check" in sys.argv:
+        _check()
+    else:
+        print(__doc__)
@@ -0,0 +1,353 @@
+"""Reconnecting Upstox market-data session.
+
+    session = UpstoxSession(keys, on_message=pipeline.process, feed_clock=lambda: pipeline.last_ts)
+    await session.run()
+
+Authorization runs in a worker thread on a pooled HTTP session, and a
+fresh authorized URI is fetched in the background once we are connected,
+so a reconnect normally skips the REST round trip. Reconnects back off
+with full jitter starting at a few milliseconds, resubscribe in chunks,
+and report the tick gap they caused (``Gap``) to ``on_gap``.
+
+    python session.py --check     # against a local server that drops connections
+"""
+import asyncio
+import json
+import os
+import random
+import ssl
+import time
+
+import requests
+import websockets
+from dotenv import load_dotenv
+
+import metrics
+
+load_dotenv()
+
+# =========================================================
+# CONFIG
+# =========================================================
+BASE_URL = os.getenv("UPSTOX_BASE_URL", "https://api.upstox.com").rstrip("/")    # mock_upstox.py for load tests
+AUTHORIZE_URL = f"{BASE_URL}/v3/feed/market-data-feed/authorize"
+AUTH_TTL = 20.0          # seconds an authorized URI is reused before re-authorizing
+BACKOFF_BASE = 0.005     # first retry after ≤5 ms
+BACKOFF_MAX = 5.0
+STABLE_AFTER = 10.0      # connected this long → backoff resets
+SUB_CHUNK = 100          # instrument keys per sub message
+
+RECONNECTS = metrics.counter("feed_reconnects_total", "Websocket reconnects")
+RECONNECT_GAP = metrics.histogram("feed_reconnect_gap_seconds", "Time without ticks across a reconnect")
+AUTHORIZE_TIME = metrics.histogram("feed_authorize_seconds", "Market-data-feed authorize round trip")
+FEED_BYTES = metrics.counter("feed_bytes_total", "Websocket payload bytes received")
+
+
+class Gap:
+    """Ticks missed across one reconnect.
+
+    ``start``/``end`` are wall-clock seconds of the last frame before the
+    drop and the first frame after; ``feed_start``/``feed_end`` are the
+    feed's own currentTs (ms) at those frames when a ``feed_clock`` is given.
+    """
+
+    __slots__ = ("start", "end", "feed_start", "feed_end", "attempts", "reason")
+
+    def __init__(self, start, end, feed_start, feed_end, attempts, reason):
+        self.start = start
+        self.end = end
+        self.feed_start = feed_start
+        self.feed_end = feed_end
+        self.attempts = attempts
+        self.reason = reason
+
+    @property
+    def seconds(self):
+        if self.feed_start and self.feed_end:
+            return (self.feed_end - self.feed_start) / 1000.0
+        return self.end - self.start
+
+    def __repr__(self):
+        return f"Gap({self.seconds:.3f}s, attempts={self.attempts}, reason={self.reason!r})"
+
+
+def chunked_sub_messages(keys, mode, guid="sub", method="sub", chunk=SUB_CHUNK):
+    """Encoded sub/unsub/change_mode messages of at most ``chunk`` keys each."""
+    keys = list(keys)
+    msgs = []
+    for i in range(0, len(keys), chunk):
+        data = {"instrumentKeys": keys[i:i + chunk]}
+        if mode is not None:
+            data["mode"] = mode
+        msgs.append(json.dumps({"guid": f"{guid}-{i // chunk}", "method": method, "data": data}).encode("utf-8"))
+    return msgs
+
+
+# =========================================================
+# SESSION
+# =========================================================
+class UpstoxSession:
+    """One market-data websocket that keeps itself connected and subscribed.
+
+    ``on_message(buffer, recv=...)`` is called for every frame with the
+    perf_counter() receipt stamp; ``on_gap(gap)`` just before the first
+    frame following a reconnect (``feed_end`` is filled in after it).
+    Subscriptions are tracked per mode, so whatever was subscribed is
+    replayed on the next connection. ``keys`` may be a {key: mode} mapping
+    to start with mixed modes (subscriptions.py).
+    """
+
+    def __init__(self, keys=(), mode="option_greeks", on_message=None, on_gap=None, feed_clock=None,
+                 token=None, authorize=None, guid="session", ssl_verify=False):
+        self.token = token or os.getenv("token")
+        self.on_message = on_message
+        self.on_gap = on_gap
+        self.feed_clock = feed_clock
+        self.guid = guid
+        self.subscriptions = {}     # mode -> ordered keys
+        if isinstance(keys, dict):
+            for key, key_mode in keys.items():
+                self.subscriptions.setdefault(key_mode, []).append(key)
+        elif keys:
+            self.subscriptions[mode] = list(dict.fromkeys(keys))
+        self._authorize_fn = authorize or self._authorize_upstox
+        self._http = None
+        self._auth_uri = None
+        self._auth_at = 0.0
+        self._prefetch = None
+        self.ws = None
+        self.connected = asyncio.Event()
+        self.reconnects = 0
+        self.gaps = []
+        self.bytes_in = 0
+        self.ssl_ctx = ssl.create_default_context()
+        if not ssl_verify:
+            self.ssl_ctx.check_hostname = False
+            self.ssl_ctx.verify_mode = ssl.CERT_NONE
+
+    # -------------------------------
+    # AUTHORIZATION (OFF THE LOOP)
+    # -------------------------------
+    def _authorize_upstox(self):
+        if self._http is None:
+            self._http = requests.Session()      # keep-alive: reconnects reuse the TLS connection
+            self._http.headers.update({"Accept": "application/json", "Authorization": f"Bearer {self.token}"})
+        r = self._http.get(AUTHORIZE_URL, timeout=10)
+        r.raise_for_status()
+        return r.json()["data"]["authorized_redirect_uri"]
+
+    async def _fetch_uri(self):
+        t0 = time.perf_counter()
+        uri = await asyncio.to_thread(self._authorize_fn)
+        AUTHORIZE_TIME.record(time.perf_counter() - t0)
+        self._auth_uri, self._auth_at = uri, time.monotonic()
+        return uri
+
+    async def authorize(self, fresh=False):
+        """Authorized websocket URI; a prefetched one is used while still within AUTH_TTL."""
+        if self._prefetch is not None:
+            try:
+                await self._prefetch
+            except Exception:
+                pass
+            self._prefetch = None
+        if not fresh and self._auth_uri and time.monotonic() - self._auth_at < AUTH_TTL:
+            uri, self._auth_uri = self._auth_uri, None      # single use
+            return uri
+        await self._fetch_uri()
+        uri, self._auth_uri = self._auth_uri, None
+        return uri
+
+    def _prefetch_uri(self):
+        if self._prefetch is None or self._prefetch.done():
+            self._prefetch = asyncio.ensure_future(self._fetch_uri())
+
+    # -------------------------------
+    # SUBSCRIPTIONS
+    # -------------------------------
+    async def subscribe(self, keys, mode="option_greeks"):
+        keys = list(dict.fromkeys(keys))
+        new = set(keys)
+        for other, held in self.subscriptions.items():
+            if other != mode:
+                held[:] = [k for k in held if k not in new]
+        current = self.subscriptions.setdefault(mode, [])
+        have = set(current)
+        current.extend(k for k in keys if k not in have)
+        await self._send(keys, mode, "sub")
+
+    async def change_mode(self, keys, mode):
+        """Move already-subscribed keys to ``mode`` without resubscribing them."""
+        move = set(keys)
+        for other, held in self.subscriptions.items():
+            if other != mode:
+                held[:] = [k for k in held if k not in move]
+        current = self.subscriptions.setdefault(mode, [])
+        have = set(current)
+        keys = [k for k in dict.fromkeys(keys) if k not in have]
+        current.extend(keys)
+        await self._send(keys, mode, "change_mode")
+
+    def modes(self):
+        """{key: mode} for everything subscribed."""
+        return {k: mode for mode, keys in self.subscriptions.items() for k in keys}
+
+    async def unsubscribe(self, keys):
+        drop = set(keys)
+        for held in self.subscriptions.values():
+            held[:] = [k for k in held if k not in drop]
+        await self._send(list(drop), None, "unsub")
+
+    async def _send(self, keys, mode, method):
+        if self.ws is None or not keys:
+            return      # replayed on (re)connect
+        for msg in chunked_sub_messages(keys, mode, self.guid, method):
+            await self.ws.send(msg)
+
+    async def _resubscribe(self, ws):
+        for mode, keys in self.subscriptions.items():
+            if not keys:
+                continue
+            for msg in chunked_sub_messages(keys, mode, self.guid):
+                await ws.send(msg)
+
+    # -------------------------------
+    # CONNECTION LOOP
+    # -------------------------------
+    async def run(self):
+        attempts, fresh = 0, False
+        last_recv, last_feed, reason = None, None, None
+        while True:
+            try:
+                uri = await self.authorize(fresh=fresh)
+                fresh = False
+                ssl_ctx = self.ssl_ctx if uri.startswith("wss:") else None
+                async with websockets.connect(uri, ssl=ssl_ctx, ping_interval=20, ping_timeout=20,
+                                              close_timeout=1, max_size=None) as ws:
+                    self.ws = ws
+                    self.connected.set()
+                    await self._resubscribe(ws)
+                    keys = sum(len(k) for k in self.subscriptions.values())
+                    print(f"🔌 connected, {keys} instruments subscribed"
+                          + (f" (attempt {attempts})" if attempts else ""), flush=True)
+                    self._prefetch_uri()
+                    up_at = time.monotonic()
+                    first = True
+                    async for msg in ws:
+                        recv = time.perf_counter()
+                        self.bytes_in += len(msg)
+                        FEED_BYTES.inc(len(msg))
+                        gap = None
+                        if first:
+                            first = False
+                            if last_recv is not None:
+                                # Reported before the frame is handled so consumers can
+                                # re-baseline ahead of the first post-gap ticks.
+                                gap = Gap(last_recv, time.time(), last_feed, None, attempts, reason)
+                                if self.on_gap is not None:
+                                    self.on_gap(gap)
+                        if self.on_message is not None:
+                            self.on_message(msg, recv=recv)
+                        if gap is not None:
+                            self._record_gap(gap)
+                        last_recv = time.time()
+                        if self.feed_clock is not None:
+                            last_feed = self.feed_clock()
+                        if attempts and time.monotonic() - up_at > STABLE_AFTER:
+                            attempts = 0
+                    reason = "closed by server"
+            except asyncio.CancelledError:
+                raise
+            except websockets.InvalidStatus as e:
+                reason = f"handshake rejected ({e.response.status_code})"
+                fresh = True        # the cached URI may have expired
+            except Exception as e:
+                reason = f"{type(e).__name__}: {e}"
+            finally:
+                self.ws = None
+                self.connected.clear()
+
+            attempts += 1
+            self.reconnects += 1
+            RECONNECTS.inc()
+            delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempts - 1)))
+            print(f"❌ feed dropped ({reason}); retry {attempts} in {delay * 1000:.0f} ms", flush=True)
+            await asyncio.sleep(delay)
+
+    def _record_gap(self, gap):
+        if self.feed_clock is not None:
+            gap.feed_end = self.feed_clock()
+        self.gaps.append(gap)
+        RECONNECT_GAP.record(gap.seconds)
+        print(f"🕳️ reconnected after {gap.seconds * 1000:.0f} ms without ticks ({gap.attempts} attempts)", flush=True)
+
+
+# =========================================================
+# SELF-CHECK: LOCAL SERVER THAT DROPS CONNECTIONS
+# =========================================================
+async def _check(n_keys=250, frames_per_conn=50, drops=5):
+    """Serve frames over ws://localhost, hang up every ``frames_per_conn``
+    frames, and verify the session reconnects, resubscribes every key in
+    chunks and reports each gap."""
+    subs_per_conn = []
+    authorizations = []
+
+    async def handler(ws):
+        got = []
+        expected = n_keys
+        while len(got) < expected:
+            msg = json.loads(await ws.recv())
+            got.extend(msg["data"]["instrumentKeys"])
+        subs_per_conn.append(len(got))
+        try:
+            for i in range(frames_per_conn):
+                await ws.send(json.dumps({"ts": time.time() * 1000, "i": i}).encode())
+                await asyncio.sleep(0.001)
+        except websockets.ConnectionClosed:
+            return
+        await ws.close()
+
+    async with websockets.serve(handler, "127.0.0.1", 0) as server:
+        port = server.sockets[0].getsockname()[1]
+
+        def authorize():
+            authorizations.append(time.perf_counter())
+            return f"ws://127.0.0.1:{port}/feed"
+
+        frames = []
+        clock = {"ts": None}
+
+        def on_message(buffer, recv=None):
+            clock["ts"] = json.loads(buffer)["ts"]
+            frames.append(recv)
+
+        keys = [f"NSE_FO|{i}" for i in range(n_keys)]
+        session = UpstoxSession(keys, on_message=on_message, feed_clock=lambda: clock["ts"], authorize=authorize)
+        task = asyncio.create_task(session.run())
+        t0 = time.perf_counter()
+        while len(session.gaps) < drops and time.perf_counter() - t0 < 10:
+            await asyncio.sleep(0.01)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    gaps = [g.seconds * 1000 for g in session.gaps]
+    ok = (len(session.gaps) >= drops and all(n == n_keys for n in subs_per_conn)
+          and len(frames) >= frames_per_conn * drops)
+    print(f"\n{'✅' if ok else '❌'} {len(subs_per_conn)} connections, {session.reconnects} reconnects, "
+          f"{len(frames)} frames, {len(authorizations)} authorize calls")
+    print(f"   resubscribed {n_keys} keys in chunks of {SUB_CHUNK} on every connection: "
+          f"{all(n == n_keys for n in subs_per_conn)}")
+    if gaps:
+        print(f"   gap ms: min {min(gaps):.1f} / max {max(gaps):.1f} / mean {sum(gaps) / len(gaps):.1f}")
+    return ok
+
+
+if __name__ == "__main__":
+    import sys
+
+    if "--check" in sys.argv:
+        raise SystemExit(0 if asyncio.run(_check()) else 1)
+    print(__doc__)
@@ -0,0 +1,75 @@
+import asyncio
+import time
+
+import metrics
+import profiler
+from alert_schema import CONTENT_TYPE, MAX_BATCH, MESSAGE_TYPE, encode_batch
+
+
+# =========================================================
+# ALERT SINKS (callables taking one alert dict)
+# =========================================================
+def print_sink(alert):
+    episode = f" | #{alert['alert_id']} {alert['status']} x{alert['count']}" if alert.get("alert_id") else ""
+    print(f" [📤 ALERT] {alert.get('ticker')} {alert.get('option_type')} | {alert.get('category')} | "
+          f"₹{alert.get('value', 0):,.0f} | OI: {alert.get('oi', 0):,.0f} | {alert.get('timestamp')}{episode}", flush=True)
+
+
+class RabbitMQSink:
+    """Queues alerts from the detectors and publishes them from one async worker.
+
+    Whatever is queued when the worker wakes goes out as one msgpack batch
+    (alert_schema), up to MAX_BATCH alerts per AMQP message. Other payloads
+    (scanner rankings) pass their own ``encode(batch)`` and content type.
+    """
+
+    def __init__(self, host='localhost', queue_name='insider_alerts', encode=encode_batch,
+                 content_type=CONTENT_TYPE, message_type=MESSAGE_TYPE):
+        self.host = host
+        self.queue_name = queue_name
+        self.encode = encode
+        self.content_type = content_type
+        self.message_type = message_type
+        self.connection = None
+        self.channel = None
+        self.properties = None
+        self.queue = asyncio.Queue()
+
+    def __call__(self, alert):
+        self.queue.put_nowait(alert)
+
+    def connect(self):
+        import pika
+        try:
+            self.connection = pika.BlockingConnection(pika.ConnectionParameters(host=self.host))
+            self.channel = self.connection.channel()
+            self.channel.queue_declare(queue=self.queue_name)
+            self.properties = pika.BasicProperties(content_type=self.content_type, type=self.message_type)
+            return True
+        except Exception as e:
+            print(f"❌ RabbitMQ Connection Error: {e}", flush=True)
+            return False
+
+    async def run(self):
+        print("📮 Alert Worker (RabbitMQ) started...", flush=True)
+        if not self.connect():
+            print("⚠️ RabbitMQ offline. Alerts will be logged but not sent.", flush=True)
+
+        while True:
+            batch = [await self.queue.get()]
+            while len(batch) < MAX_BATCH and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            try:
+                if self.channel and not self.channel.is_closed:
+                    t0 = time.perf_counter()
+                    self.channel.basic_publish(exchange='', routing_key=self.queue_name, body=self.encode(batch),
+                                               properties=self.properties)
+                    elapsed = time.perf_counter() - t0
+                    metrics.PUBLISH_TIME.record(elapsed)
+                    profiler.PUBLISH.record(elapsed)
+            except Exception as e:
+                print(f"⚠️ Failed to publish: {e}. Attempting reconnect...", flush=True)
+                self.connect()
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
@@ -0,0 +1,178 @@
+"""Cold-start report for the feed processes: import cost and time to subscribe.
+
+    python startup.py            # report
+    python startup.py --check    # report, exit non-zero when over budget
+
+Imports: each module in IMPORT_MODULES is imported by a fresh
+``python -X importtime`` (best of IMPORT_RUNS) and the report lists its
+cumulative import time, the costliest direct imports and which heavy
+modules came along. HEAVY modules are not allowed on any feed path;
+NUMPY_FREE modules must not pull numpy either. FEED_SCRIPTS are also
+parsed (not run: STORING_OI_VALUES.py subscribes on import) so a
+module-level ``import pandas`` in one of them fails the check.
+
+Subscribe: mock_upstox.py runs in this process on a free port; every
+script in SUBSCRIBE_RUNS is started against it (UPSTOX_BASE_URL, the
+mock's CSVs in a temp dir) and timed from spawn to session.py's
+"connected, N instruments subscribed" line.
+"""
+import ast
+import asyncio
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# =========================================================
+# CONFIG
+# =========================================================
+IMPORT_MODULES = ("ingest", "gemini5", "LIVE_LOGGING_OF_ALL_COMPANIES", "session", "pipeline", "upstox_paper")
+FEED_SCRIPTS = ("ingest.py", "gemini5.py", "STORING_OI_VALUES.py", "LIVE_LOGGING_OF_ALL_COMPANIES.py",
+                "upstox_paper.py", "runmode.py", "session.py", "pipeline.py", "detectors.py", "instruments.py",
+                "sinks.py", "metrics.py", "profiler.py")
+HEAVY = ("pandas", "pika", "PyQt5", "pyqtgraph", "aiohttp", "streamlit", "matplotlib")
+NUMPY_FREE = ("ingest", "gemini5", "session", "pipeline", "upstox_paper")
+SUBSCRIBE_RUNS = {
+    "upstox_paper.py run surge": ["upstox_paper.py", "run", "surge", "--sink", "none", "--no-backfill"],
+    "gemini5.py": ["gemini5.py"],
+    "STORING_OI_VALUES.py": ["STORING_OI_VALUES.py"],
+    "ingest.py": ["ingest.py"],
+}
+IMPORT_RUNS = 3
+IMPORT_BUDGET_MS = float(os.getenv("STARTUP_IMPORT_BUDGET_MS", "400"))     # per module, cumulative
+SUBSCRIBE_BUDGET = float(os.getenv("STARTUP_SUBSCRIBE_BUDGET", "3.0"))     # seconds, spawn → subscribed
+SUBSCRIBE_TIMEOUT = 30.0
+TOP_IMPORTS = 5
+
+LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( +)(\S+)")
+
+
+# =========================================================
+# IMPORT TIME
+# =========================================================
+def import_profile(module, cwd=HERE, env=None):
+    """{'total': µs, 'children': [(µs, name)] direct imports, 'modules': set} for one fresh import."""
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=cwd, env=env,
+                         capture_output=True, text=True)
+    if out.returncode:
+        raise RuntimeError(f"import {module} failed:\n{out.stderr[-2000:]}")
+    rows = [(int(m[2]), len(m[3]), m[4]) for m in map(LINE.match, out.stderr.splitlines()) if m]
+    end = next(i for i, r in enumerate(rows) if r[2] == module)
+    total, level = rows[end][0], rows[end][1]
+    # the module's line comes after its subtree: the run of deeper lines right above it
+    start = end
+    while start > 0 and rows[start - 1][1] > level:
+        start -= 1
+    subtree = rows[start:end]
+    children = sorted(((cum, name) for cum, depth, name in subtree if depth == level + 2), reverse=True)
+    return {"total": total, "children": children, "modules": {name for _, _, name in subtree}}
+
+
+def best_profile(module, cwd=HERE, env=None, runs=IMPORT_RUNS):
+    return min((import_profile(module, cwd, env) for _ in range(runs)), key=lambda p: p["total"])
+
+
+def top_level_heavy(path):
+    """Heavy modules imported at module level (not inside a function) by the script at ``path``."""
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read(), path)
+    found = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            names = [a.name for a in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.level == 0:
+            names = [node.module or ""]
+        else:
+            continue
+        found += [n for n in names if n.split(".")[0] in HEAVY]
+    return found
+
+
+# =========================================================
+# TIME TO SUBSCRIBE
+# =========================================================
+async def _time_to_subscribe(argv, env, cwd):
+    t0 = time.perf_counter()
+    proc = await asyncio.create_subprocess_exec(sys.executable, *[os.path.join(HERE, argv[0])] + argv[1:],
+                                                cwd=cwd, env=env, stdout=asyncio.subprocess.PIPE,
+                                                stderr=asyncio.subprocess.STDOUT)
+    tail = []
+    try:
+        while True:
+            line = await asyncio.wait_for(proc.stdout.readline(), max(0.1, SUBSCRIBE_TIMEOUT - (time.perf_counter() - t0)))
+            if not line:
+                raise RuntimeError(f"{argv[0]} exited before subscribing:\n" + "".join(tail))
+            text = line.decode(errors="replace")
+            tail = (tail + [text])[-20:]
+            if "instruments subscribed" in text:
+                return time.perf_counter() - t0
+    except asyncio.TimeoutError:
+        raise RuntimeError(f"{argv[0]} not subscribed after {SUBSCRIBE_TIMEOUT:g}s:\n" + "".join(tail)) from None
+    finally:
+        if proc.returncode is None:
+            proc.kill()
+        await proc.wait()
+
+
+async def subscribe_times(mock, env, cwd, runs=SUBSCRIBE_RUNS):
+    server = await mock.start("127.0.0.1", 0)
+    env = dict(env, UPSTOX_BASE_URL=mock.base_url)
+    try:
+        return {label: await _time_to_subscribe(argv, env, cwd) for label, argv in runs.items()}
+    finally:
+        server.close()
+        await server.wait_closed()
+
+
+# =========================================================
+# REPORT
+# =========================================================
+def main(check=False):
+    from mock_upstox import MockUpstox, write_csv
+
+    failures = []
+    mock = MockUpstox(rate=2000)
+    tmp = tempfile.TemporaryDirectory()
+    write_csv(mock.market, tmp.name)    # the scripts read their CSVs from the working directory
+    env = dict(os.environ, token="startup", METRICS="0", PROFILE_SIGNAL="", PYTHONUNBUFFERED="1",
+               PYTHONPATH=os.pathsep.join(filter(None, (HERE, os.getenv("PYTHONPATH")))))
+
+    print(f"⏱️ import time (best of {IMPORT_RUNS}, budget {IMPORT_BUDGET_MS:g} ms)")
+    for module in IMPORT_MODULES:
+        p = best_profile(module, tmp.name, env)
+        heavy = sorted({m.split(".")[0] for m in p["modules"]} & set(HEAVY))
+        numpy = "numpy" in p["modules"]
+        top = ", ".join(f"{name} {us / 1000:.0f}" for us, name in p["children"][:TOP_IMPORTS])
+        flags = "".join([f" ❌ heavy: {', '.join(heavy)}" if heavy else "",
+                         " ❌ numpy" if numpy and module in NUMPY_FREE else " (numpy)" if numpy else ""])
+        print(f"  {module:<32} {p['total'] / 1000:7.1f} ms  ← {top}{flags}")
+        if p["total"] / 1000 > IMPORT_BUDGET_MS:
+            failures.append(f"import {module} took {p['total'] / 1000:.0f} ms")
+        if heavy:
+            failures.append(f"import {module} pulls {', '.join(heavy)}")
+        if numpy and module in NUMPY_FREE:
+            failures.append(f"import {module} pulls numpy")
+    for script in FEED_SCRIPTS:
+        heavy = top_level_heavy(os.path.join(HERE, script))
+        if heavy:
+            failures.append(f"{script} imports {', '.join(heavy)} at module level")
+    print(f"⏱️ spawn → subscribed against mock_upstox (budget {SUBSCRIBE_BUDGET:g} s)")
+    for label, seconds in asyncio.run(subscribe_times(mock, env, tmp.name)).items():
+        print(f"  {label:<32} {seconds * 1000:7.0f} ms")
+        if seconds > SUBSCRIBE_BUDGET:
+            failures.append(f"{label} subscribed after {seconds:.2f} s")
+    tmp.cleanup()
+    for failure in failures:
+        print(f"❌ {failure}")
+    if not failures:
+        print("✅ startup within budget")
+    if check and failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(check="--check" in sys.argv)
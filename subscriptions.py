@@ -0,0 +1,300 @@
+"""Per-key subscription modes for one UpstoxSession.
+
+    planner = SubscriptionPlanner(session)
+    await planner.assign(keys)          # ltpc for spot/index, option_greeks for options
+    pipeline.alerts.add_sink(planner)   # strikes under alert go to full depth for a while
+    asyncio.create_task(planner.run())  # ...and back down when they go quiet
+
+Every change is a diff between the modes the session holds and the modes
+wanted, sent as at most one sub / change_mode / unsub batch per mode
+(chunked by session.SUB_CHUNK), so the feed only carries depth and greeks
+for the keys that need them.
+
+    python subscriptions.py --check     # against a local server, prints bytes per mode
+"""
+import asyncio
+import time
+from collections import OrderedDict
+
+# =========================================================
+# CONFIG
+# =========================================================
+LTPC = "ltpc"
+OPTION_GREEKS = "option_greeks"
+FULL = "full"            # full_d5 in the proto's RequestMode: 5 levels of depth, tbq/tsq, greeks
+FULL_D30 = "full_d30"    # 30 levels (Upstox Plus)
+
+HOT_MODE = FULL
+HOT_BUDGET = 20          # keys held in HOT_MODE at once; the stalest is demoted first
+HOT_TTL = 120.0          # seconds a key stays upgraded after its last alert
+EXPIRE_EVERY = 1.0
+
+SPOT_PREFIXES = ("NSE_EQ|", "BSE_EQ|", "NSE_INDEX|", "BSE_INDEX|", "MCX_INDEX|")
+
+
+def base_mode(key):
+    """Cheapest mode that still carries what the detectors read for ``key``."""
+    return LTPC if key.startswith(SPOT_PREFIXES) else OPTION_GREEKS
+
+
+def diff_modes(current, desired):
+    """(sub, change, unsub) turning ``current`` {key: mode} into ``desired``;
+    sub/change are {mode: [keys]} so each mode goes out as one batch."""
+    sub, change = {}, {}
+    for key, mode in desired.items():
+        have = current.get(key)
+        if have is None:
+            sub.setdefault(mode, []).append(key)
+        elif have != mode:
+            change.setdefault(mode, []).append(key)
+    unsub = [k for k in current if k not in desired]
+    return sub, change, unsub
+
+
+class SubscriptionPlanner:
+    """Keeps a session's per-key modes at base mode, plus up to ``budget``
+    keys in ``hot_mode`` while they keep alerting.
+
+    Callable as an alert sink: an alert (``new``/``update``) promotes its
+    ``instrument_key``; ``expire`` demotes keys ``ttl`` seconds after their
+    last alert. Changes are applied by one task at a time, so a burst of
+    alerts turns into a single change_mode batch.
+    """
+
+    def __init__(self, session, hot_mode=HOT_MODE, budget=HOT_BUDGET, ttl=HOT_TTL, base=base_mode):
+        self.session = session
+        self.hot_mode = hot_mode
+        self.budget = budget
+        self.ttl = ttl
+        self.base_fn = base
+        self.base = {}                  # key -> base mode
+        self.hot = OrderedDict()        # key -> expiry, oldest alert first
+        self.promotions = 0
+        self.demotions = 0
+        self._task = None
+        self._pending = False
+
+    # -------------------------------
+    # WHAT WE WANT
+    # -------------------------------
+    def desired(self):
+        hot = self.hot
+        return {k: self.hot_mode if k in hot else mode for k, mode in self.base.items()}
+
+    def counts(self, modes=None):
+        out = {}
+        for mode in (modes or self.desired()).values():
+            out[mode] = out.get(mode, 0) + 1
+        return out
+
+    def add(self, keys, mode=None):
+        """Track ``keys`` at ``mode`` (default: base_mode per key); applied in the background."""
+        for key in keys:
+            self.base[key] = mode or self.base_fn(key)
+        self.schedule()
+
+    def remove(self, keys):
+        for key in keys:
+            self.base.pop(key, None)
+            self.hot.pop(key, None)
+        self.schedule()
+
+    async def assign(self, keys, mode=None):
+        """add() and wait until it is applied."""
+        for key in keys:
+            self.base[key] = mode or self.base_fn(key)
+        await self.apply()
+
+    async def drop(self, keys):
+        for key in keys:
+            self.base.pop(key, None)
+            self.hot.pop(key, None)
+        await self.apply()
+
+    def promote(self, key, now=None):
+        if key not in self.base:
+            return False
+        now = now or time.time()
+        if key in self.hot:
+            self.hot.move_to_end(key)
+        else:
+            if len(self.hot) >= self.budget:
+                self.hot.popitem(last=False)
+                self.demotions += 1
+            self.promotions += 1
+        self.hot[key] = now + self.ttl
+        self.schedule()
+        return True
+
+    def expire(self, now=None):
+        now = now or time.time()
+        hot = self.hot
+        expired = 0
+        while hot and next(iter(hot.values())) <= now:
+            hot.popitem(last=False)
+            expired += 1
+        if expired:
+            self.demotions += expired
+            self.schedule()
+        return expired
+
+    def __call__(self, alert):
+        if alert.get("status") != "final" and alert.get("instrument_key"):
+            self.promote(alert["instrument_key"])
+
+    # -------------------------------
+    # APPLYING IT
+    # -------------------------------
+    def schedule(self):
+        """Apply soon; repeated calls while a change is in flight collapse into one more pass."""
+        if self._task is not None and not self._task.done():
+            self._pending = True
+            return
+        try:
+            self._task = asyncio.get_running_loop().create_task(self._apply_loop())
+        except RuntimeError:
+            pass    # no loop yet: picked up by the next assign/apply
+
+    async def _apply_loop(self):
+        while True:
+            self._pending = False
+            await self.apply()
+            if not self._pending:
+                return
+
+    async def apply(self):
+        session = self.session
+        sub, change, unsub = diff_modes(session.modes(), self.desired())
+        if unsub:
+            await session.unsubscribe(unsub)
+        for mode, keys in sub.items():
+            await session.subscribe(keys, mode)
+        for mode, keys in change.items():
+            await session.change_mode(keys, mode)
+        if sub or change or unsub:
+            counts = " ".join(f"{m}={n}" for m, n in sorted(self.counts().items()))
+            print(f"🎚️ modes: {counts}", flush=True)
+        return sub, change, unsub
+
+    async def run(self, every=EXPIRE_EVERY):
+        while True:
+            await asyncio.sleep(every)
+            self.expire()
+
+
+# =========================================================
+# SELF-CHECK: LOCAL SERVER
+# =========================================================
+def _feed_frame(mode, key="NSE_FO|1"):
+    """One instrument's feed in ``mode`` with every field filled, serialized."""
+    import MarketDataFeedV3_pb2 as pb
+
+    fr = pb.FeedResponse(type=pb.live_feed, currentTs=1_700_000_000_123)
+    feed = fr.feeds[key]
+    ltpc = dict(ltp=123.45, ltt=1_700_000_000_100, ltq=75, cp=120.5)
+    greeks = dict(delta=0.51, theta=-12.3, gamma=0.0012, vega=8.1, rho=0.9)
+    if mode == LTPC:
+        feed.ltpc.CopyFrom(pb.LTPC(**ltpc))
+    elif mode == OPTION_GREEKS:
+        f = feed.firstLevelWithGreeks
+        f.ltpc.CopyFrom(pb.LTPC(**ltpc))
+        f.firstDepth.CopyFrom(pb.Quote(bidQ=1500, bidP=123.4, askQ=900, askP=123.5))
+        f.optionGreeks.CopyFrom(pb.OptionGreeks(**greeks))
+        f.vtt, f.oi, f.iv = 1_234_567, 456_789.0, 0.1534
+    else:
+        m = feed.fullFeed.marketFF
+        m.ltpc.CopyFrom(pb.LTPC(**ltpc))
+        for k in range(30 if mode == FULL_D30 else 5):
+            m.marketLevel.bidAskQuote.add(bidQ=1500 + k, bidP=123.4 - k * 0.05, askQ=900 + k, askP=123.5 + k * 0.05)
+        m.optionGreeks.CopyFrom(pb.OptionGreeks(**greeks))
+        m.marketOHLC.ohlc.add(interval="1d", open=110.0, high=130.0, low=105.0, close=123.45, vol=1_234_567,
+                              ts=1_700_000_000_000)
+        m.atp, m.vtt, m.oi, m.iv, m.tbq, m.tsq = 121.7, 1_234_567, 456_789.0, 0.1534, 123_456.0, 98_765.0
+    return fr.SerializeToString()
+
+
+def _decode_us(buffer, n=20_000):
+    from instruments import InstrumentRegistry
+    from pipeline import FIELD_GREEKS, FIELD_UNCHANGED, Decoder
+
+    decoder = Decoder(InstrumentRegistry(), (FIELD_GREEKS, FIELD_UNCHANGED))
+    t0 = time.perf_counter()
+    for _ in range(n):
+        decoder.decode(buffer)
+    return (time.perf_counter() - t0) / n * 1e6
+
+
+async def _check(n_spot=200, n_options=400, budget=5):
+    import json
+
+    import websockets
+
+    from session import UpstoxSession
+
+    received = []
+
+    async def handler(ws):
+        try:
+            async for raw in ws:
+                received.append(json.loads(raw))
+        except websockets.ConnectionClosed:
+            pass
+
+    async with websockets.serve(handler, "127.0.0.1", 0) as server:
+        port = server.sockets[0].getsockname()[1]
+        spot = [f"NSE_EQ|INE{i:06d}" for i in range(n_spot)]
+        options = [f"NSE_FO|{40000 + i}" for i in range(n_options)]
+        session = UpstoxSession(authorize=lambda: f"ws://127.0.0.1:{port}/feed", guid="plan")
+        planner = SubscriptionPlanner(session, budget=budget, ttl=0.3)
+        await planner.assign(spot + options)        # before connecting: recorded, sent on connect
+        task = asyncio.create_task(session.run())
+        await session.connected.wait()
+        await asyncio.sleep(0.05)
+        first = list(received)
+
+        for i in range(budget + 2):                 # two more than the budget: oldest demoted
+            planner({"instrument_key": options[i], "status": "new"})
+        await asyncio.sleep(0.05)
+        upgraded = list(received[len(first):])
+        assert planner.counts()[FULL] == budget, planner.counts()
+        planner.expire(time.time() + 1)
+        await asyncio.sleep(0.05)
+        downgraded = list(received[len(first) + len(upgraded):])
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    def summary(msgs):
+        return [(m["method"], m["data"].get("mode"), len(m["data"]["instrumentKeys"])) for m in msgs]
+
+    print(f"connect  → {summary(first)}")
+    print(f"alerts   → {summary(upgraded)}")
+    print(f"expiry   → {summary(downgraded)}")
+    assert {(m, mode) for m, mode, _ in summary(first)} == {("sub", LTPC), ("sub", OPTION_GREEKS)}
+    assert all(m == "change_mode" for m, _, _ in summary(upgraded + downgraded))
+    assert session.modes() == {**{k: LTPC for k in spot}, **{k: OPTION_GREEKS for k in options}}
+
+    print(f"\n{'mode':<14} {'bytes':>6} {'decode µs':>10}   (one instrument update)")
+    cost = {}
+    for mode in (LTPC, OPTION_GREEKS, FULL, FULL_D30):
+        buffer = _feed_frame(mode)
+        cost[mode] = (len(buffer), _decode_us(buffer))
+        print(f"{mode:<14} {cost[mode][0]:>6} {cost[mode][1]:>10.2f}")
+    mix = {LTPC: n_spot, OPTION_GREEKS: n_options - budget, FULL: budget}
+    for i, label in ((0, "bytes"), (1, "decode")):
+        flat = (n_spot + n_options) * cost[OPTION_GREEKS][i]
+        planned = sum(n * cost[mode][i] for mode, n in mix.items())
+        print(f"{label:<7} per round of updates: all option_greeks {flat:,.0f} → planned {planned:,.0f} "
+              f"({planned / flat:.0%}) with {n_spot} spot, {budget} strikes at full depth")
+    print("✅ planner ok")
+
+
+if __name__ == "__main__":
+    import sys
+
+    if "--check" in sys.argv:
+        asyncio.run(_check())
+    else:
+        print(__doc__)
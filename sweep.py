@@ -0,0 +1,163 @@
+"""Multi-day, multi-core parameter sweep for the energy-surge detector.
+
+    python sweep.py                                   # every recorded day, default grid
+    python sweep.py ticks/2026-01-2* --windows 2,3,5 --thresholds 5e4,1e5,2e5 --workers 8
+    python sweep.py --out sweeps/wide.jsonl           # rerun resumes where it stopped
+
+Jobs are (day, window, check_interval-block) shards: every threshold /
+price-move / absorption point inside a shard reuses the same window sums.
+Workers memory-map the day's prepared columns (backtest.DayData), so
+nothing is pickled to them but the job tuple. Each finished shard is
+appended to the results file as it completes; a rerun skips shards that
+are already there.
+"""
+import argparse
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from backtest import (ABSORPTION_MOVES, CHECK_INTERVALS, HORIZONS, MIN_PRICE_MOVES, THRESHOLDS, WINDOWS,
+                      DayData, _floats, evaluate)
+from recorder import list_days
+
+# =========================================================
+# CONFIG
+# =========================================================
+RESULTS_FILE = os.path.join("sweeps", "energy_surge.jsonl")
+CHECK_BLOCK = 4          # check intervals per shard
+RANK_HORIZON = 60        # edge_{h}s used for the final leaderboard
+TOP_N = 15
+
+
+# =========================================================
+# WORKER SIDE
+# =========================================================
+_DAYS = {}      # per-worker DayData cache: memmaps stay open across shards
+
+
+def _day(path):
+    day = _DAYS.get(path)
+    if day is None:
+        day = _DAYS[path] = DayData(path)
+    return day
+
+
+def run_shard(job):
+    """Evaluate one (day, window, check-interval block) shard; returns (job_id, rows)."""
+    job_id, path, window, check_intervals, thresholds, min_moves, absorptions, horizons = job
+    day = _day(path)
+    rows = []
+    for ci in check_intervals:
+        # each (window, check interval) belongs to exactly one shard: its sums are
+        # computed once here and shared by the whole threshold / move grid
+        rows.extend(evaluate(day, window, ci, thresholds, absorptions, horizons,
+                             sums=day.window_sums(window, ci), min_moves=min_moves))
+    return job_id, rows
+
+
+# =========================================================
+# DRIVER SIDE
+# =========================================================
+def make_jobs(days, windows, check_intervals, thresholds, min_moves, absorptions, horizons, block=CHECK_BLOCK):
+    """Shard ids are stable strings, so a rerun with the same grid can resume."""
+    grid = f"t={','.join(map(str, thresholds))};m={','.join(map(str, min_moves))};" \
+           f"a={','.join(map(str, absorptions))};h={','.join(map(str, horizons))}"
+    blocks = [tuple(check_intervals[i:i + block]) for i in range(0, len(check_intervals), block)]
+    jobs = []
+    for path, window, cis in itertools.product(days, windows, blocks):
+        job_id = f"{os.path.basename(os.path.normpath(path))}|w={window}|ci={','.join(map(str, cis))}|{grid}"
+        jobs.append((job_id, path, window, cis, thresholds, min_moves, absorptions, horizons))
+    return jobs
+
+
+def load_results(path):
+    """{job id: rows} from an existing results file; a torn last line is ignored."""
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path) as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue
+            done[rec["job"]] = rec["rows"]
+    return done
+
+
+def sweep(days, windows=WINDOWS, check_intervals=CHECK_INTERVALS, thresholds=THRESHOLDS,
+          min_moves=MIN_PRICE_MOVES, absorptions=ABSORPTION_MOVES, horizons=HORIZONS,
+          workers=None, out=RESULTS_FILE, block=CHECK_BLOCK):
+    jobs = make_jobs(days, windows, check_intervals, thresholds, min_moves, absorptions, horizons, block)
+    done = load_results(out)
+    rows = [row for j in jobs if j[0] in done for row in done[j[0]]]
+    todo = [j for j in jobs if j[0] not in done]
+    print(f"🧮 {len(jobs)} shards ({len(jobs) - len(todo)} already in {out}), "
+          f"{len(days)} days, workers={workers or os.cpu_count()}", flush=True)
+    if not todo:
+        return rows
+
+    # Sort/derive every day once up front so workers only ever memory-map it.
+    for path in sorted({j[1] for j in todo}):
+        DayData(path)
+
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    t0 = time.perf_counter()
+    with open(out, "a") as f, ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(run_shard, job) for job in todo]
+        for n, fut in enumerate(as_completed(futures), 1):
+            job_id, shard_rows = fut.result()
+            f.write(json.dumps({"job": job_id, "rows": shard_rows}) + "\n")
+            f.flush()
+            rows.extend(shard_rows)
+            print(f"   [{n}/{len(todo)}] {job_id.split('|t=')[0]} ({time.perf_counter() - t0:.1f}s)", flush=True)
+    return rows
+
+
+def leaderboard(rows, horizon=RANK_HORIZON, top=TOP_N):
+    """Aggregate rows across days per setting, ranked by alert-weighted edge."""
+    params = ("window", "check_interval", "min_value", "min_move", "absorption")
+    agg = {}
+    for r in rows:
+        edge = r.get(f"edge_{horizon}s")
+        k = tuple(r.get(p, 0.0) for p in params)
+        a = agg.setdefault(k, [0, 0, 0.0, 0])
+        a[0] += 1
+        a[1] += r["alerts"]
+        directional = r["buying"] + r["selling"]
+        if edge == edge and directional:    # skip NaN edges
+            a[2] += edge * directional
+            a[3] += directional
+    ranked = sorted(agg.items(), key=lambda kv: kv[1][2] / kv[1][3] if kv[1][3] else float("-inf"), reverse=True)
+
+    print(f"\n🏆 top {top} by edge_{horizon}s (alert-weighted across days)")
+    print(f"{'window':>6} {'check':>5} {'min_value':>10} {'move':>5} {'absorb':>6} {'days':>4} {'alerts':>7} "
+          f"{'edge':>9}")
+    for (w, ci, mv, mm, ab), (n_days, alerts, edge_sum, n_dir) in ranked[:top]:
+        edge = edge_sum / n_dir if n_dir else float("nan")
+        print(f"{w:>6} {ci:>5} {mv:>10,.0f} {mm:>5} {ab:>6} {n_days:>4} {alerts:>7} {edge * 1e4:>7.1f}bp")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sweep energy-surge parameters over recorded days")
+    parser.add_argument("days", nargs="*", help="ticks/YYYY-MM-DD dirs (default: every recorded day)")
+    parser.add_argument("--windows", type=_floats, default=WINDOWS)
+    parser.add_argument("--check-intervals", type=_floats, default=CHECK_INTERVALS)
+    parser.add_argument("--thresholds", type=_floats, default=THRESHOLDS)
+    parser.add_argument("--min-moves", type=_floats, default=MIN_PRICE_MOVES)
+    parser.add_argument("--absorptions", type=_floats, default=ABSORPTION_MOVES)
+    parser.add_argument("--workers", type=int, default=None, help="process pool size (default: all cores)")
+    parser.add_argument("--block", type=int, default=CHECK_BLOCK, help="check intervals per shard")
+    parser.add_argument("--out", default=RESULTS_FILE, help="JSONL results file (appended, resumable)")
+    args = parser.parse_args()
+
+    days = args.days or list_days()
+    if not days:
+        raise SystemExit("no recorded days under ticks/ (enable ENABLE_RECORDER in ingest.py)")
+    t0 = time.perf_counter()
+    rows = sweep(days, args.windows, args.check_intervals, args.thresholds, args.min_moves, args.absorptions,
+                 workers=args.workers, out=args.out, block=args.block)
+    leaderboard(rows)
+    print(f"\n⏱️ {len(rows)} rows in {time.perf_counter() - t0:.2f}s → {args.out}")
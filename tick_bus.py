@@ -0,0 +1,267 @@
+import os
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from instruments import InstrumentRegistry
+from pipeline import Detector
+
+# =========================================================
+# SHARED-MEMORY TICK RING (1 PRODUCER, N CONSUMERS)
+# =========================================================
+# Layout of the segment:
+#   header   : 8 x uint64  [magic, capacity, write_seq, n_names, max_names, max_readers, 0, 0]
+#   readers  : max_readers x 2 x uint64  [pid, read_seq] (pid 0 = free)
+#   names    : max_names x NAME_BYTES  (instrument id -> "NSE_FO|148243")
+#   records  : capacity x TICK_DTYPE
+#
+# The producer fills a slot, stamps its ``seq`` and only then bumps
+# ``write_seq``. Readers keep their own cursor and use the per-slot ``seq`` to
+# tell a record that was overwritten while they copied it (overrun) from a
+# good one, so nothing is ever locked. Each reader also publishes its cursor
+# in its own reader slot; a producer that is about to unlink the segment can
+# wait for the slowest live reader to catch up (TickBusWriter.drain).
+BUS_NAME = "upstox_ticks"
+MAGIC = 0x5550535458424553
+CAPACITY = 1 << 16
+MAX_NAMES = 4096
+MAX_READERS = 16
+NAME_BYTES = 32
+
+HDR_MAGIC, HDR_CAPACITY, HDR_WRITE_SEQ, HDR_NAMES, HDR_MAX_NAMES, HDR_MAX_READERS = range(6)
+HEADER_BYTES = 8 * 8
+READER_PID, READER_SEQ = 0, 1
+
+# ``recv`` is the producer's perf_counter() frame stamp; on Linux that is
+# CLOCK_MONOTONIC, so consumers in other processes can measure latency from it.
+TICK_DTYPE = np.dtype([
+    ("seq", "u8"), ("iid", "i4"), ("flags", "i4"), ("ts", "f8"), ("ltt", "i8"),
+    ("ltp", "f8"), ("ltq", "i8"), ("vtt", "i8"), ("oi", "f8"), ("iv", "f8"), ("recv", "f8"),
+])
+
+FLAG_GREEKS = 1
+FLAG_GAP = 2         # Tick.gap: first tick after a feed gap, re-baseline only
+
+
+def _views(buf, capacity, max_names, max_readers):
+    header = np.ndarray((8,), dtype="u8", buffer=buf)
+    readers = np.ndarray((max_readers, 2), dtype="u8", buffer=buf, offset=HEADER_BYTES)
+    offset = HEADER_BYTES + readers.nbytes
+    names = np.ndarray((max_names,), dtype=f"S{NAME_BYTES}", buffer=buf, offset=offset)
+    records = np.ndarray((capacity,), dtype=TICK_DTYPE, buffer=buf, offset=offset + max_names * NAME_BYTES)
+    return header, readers, names, records
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+# =========================================================
+# PRODUCER
+# =========================================================
+class TickBusWriter:
+    def __init__(self, name=BUS_NAME, capacity=CAPACITY, max_names=MAX_NAMES, registry=None, max_readers=MAX_READERS):
+        if capacity & (capacity - 1):
+            raise ValueError("capacity must be a power of two")
+        size = HEADER_BYTES + max_readers * 16 + max_names * NAME_BYTES + capacity * TICK_DTYPE.itemsize
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # Left over from a crashed producer: take it over.
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        self.capacity = capacity
+        self.mask = capacity - 1
+        self.header, self.readers, self.names, self.records = _views(self.shm.buf, capacity, max_names, max_readers)
+        self.records[:] = 0
+        self.readers[:] = 0
+        self.header[:] = 0
+        self.header[HDR_CAPACITY] = capacity
+        self.header[HDR_MAX_NAMES] = max_names
+        self.header[HDR_MAX_READERS] = max_readers
+        self.header[HDR_MAGIC] = MAGIC
+        self.seq_col = self.records["seq"]
+        self.seq = 0
+        # Record ids are the pipeline's interned ids when a registry is shared.
+        self.registry = registry if registry is not None else InstrumentRegistry()
+        self.n_names = 0
+
+    def intern(self, key):
+        iid = self.registry.intern(key)
+        if iid >= self.n_names:
+            self._sync_names()
+        return iid
+
+    def _sync_names(self):
+        keys = self.registry.keys
+        if len(keys) > len(self.names):
+            raise OverflowError("tick bus name table is full")
+        for iid in range(self.n_names, len(keys)):
+            self.names[iid] = keys[iid].encode()
+        self.n_names = len(keys)
+        self.header[HDR_NAMES] = self.n_names
+
+    def publish(self, iid, ts, ltt, ltp, ltq, vtt=0, oi=0.0, iv=0.0, flags=0, recv=0.0):
+        self.seq += 1
+        slot = self.seq & self.mask
+        self.seq_col[slot] = 0      # seqlock: invalid while the payload is half written
+        self.records[slot] = (0, iid, flags, ts, ltt, ltp, ltq, vtt, oi, iv, recv)
+        self.seq_col[slot] = self.seq
+        self.header[HDR_WRITE_SEQ] = self.seq
+
+    def publish_tick(self, tick):
+        if tick.iid >= self.n_names:
+            self._sync_names()
+        flags = (FLAG_GREEKS if tick.has_greeks else 0) | (FLAG_GAP if tick.gap else 0)
+        self.publish(tick.iid, tick.ts, tick.ltt, tick.ltp, tick.ltq,
+                     tick.vtt, tick.oi, tick.iv, flags, tick.recv)
+
+    def drain(self, timeout=10.0, poll=0.001):
+        """Wait until every live reader's cursor reaches everything published; False on timeout."""
+        deadline = time.monotonic() + timeout
+        while True:
+            behind = [int(pid) for pid, seq in self.readers.tolist() if pid and seq < self.seq]
+            if not [pid for pid in behind if _alive(pid)]:
+                return True
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(poll)
+
+    def close(self):
+        del self.header, self.readers, self.names, self.records, self.seq_col
+        self.shm.close()
+        self.shm.unlink()
+
+
+class TickBusPublisher(Detector):
+    """Pipeline stage that mirrors every decoded tick onto the shared-memory bus."""
+
+    name = "tick_bus"
+
+    def __init__(self, writer=None):
+        super().__init__()
+        self.writer = writer or TickBusWriter()
+
+    def on_tick(self, tick):
+        self.writer.publish_tick(tick)
+
+
+# =========================================================
+# CONSUMER
+# =========================================================
+class TickBusReader:
+    def __init__(self, name=BUS_NAME, from_start=False):
+        self.shm = shared_memory.SharedMemory(name=name)
+        # Readers must not unlink the segment when they exit.
+        resource_tracker.unregister(self.shm._name, "shared_memory")
+        header = np.ndarray((8,), dtype="u8", buffer=self.shm.buf)
+        if header[HDR_MAGIC] != MAGIC:
+            raise RuntimeError(f"{name} is not a tick bus segment")
+        self.capacity = int(header[HDR_CAPACITY])
+        self.mask = self.capacity - 1
+        self.header, self.readers, self.names, self.records = _views(
+            self.shm.buf, self.capacity, int(header[HDR_MAX_NAMES]), int(header[HDR_MAX_READERS]))
+        self.seq_col = self.records["seq"]
+        self.cursor = 0 if from_start else int(self.header[HDR_WRITE_SEQ])
+        self.overruns = 0
+        self.lost = 0
+        self._keys = []
+        self.slot = self._claim()
+        self.position = self.readers[self.slot]     # [pid, read_seq], this reader's own
+
+    def _claim(self):
+        """A free reader slot (or one whose process died), marked with our pid.
+        Not atomic: readers in different processes must not attach at the same instant."""
+        pid = os.getpid()
+        for slot, (owner, _) in enumerate(self.readers.tolist()):
+            if owner == 0 or not _alive(owner):
+                self.readers[slot] = (pid, self.cursor)
+                return slot
+        raise OverflowError(f"tick bus has no free reader slot ({len(self.readers)} readers)")
+
+    def key(self, iid):
+        while iid >= len(self._keys):
+            if len(self._keys) >= int(self.header[HDR_NAMES]):
+                return None
+            self._keys.append(self.names[len(self._keys)].decode())
+        return self._keys[iid]
+
+    def id_of(self, key):
+        for iid in range(int(self.header[HDR_NAMES])):
+            if self.key(iid) == key:
+                return iid
+        return None
+
+    def poll(self, max_records=4096):
+        """Copy out everything published since the last poll (oldest first)."""
+        head = int(self.header[HDR_WRITE_SEQ])
+        start = self.cursor
+        if head - start > self.capacity:
+            self._overrun(head - self.capacity - start)
+            start = head - self.capacity
+        end = min(head, start + max_records)
+        if end <= start:
+            self.position[READER_SEQ] = start
+            return self.records[:0].copy()
+
+        lo, hi = (start + 1) & self.mask, (end & self.mask) + 1
+        if lo < hi:
+            out = self.records[lo:hi].copy()
+        else:
+            out = np.concatenate((self.records[lo:], self.records[:hi]))
+
+        # Seqlock check: a slot is good only if its seq was the expected one before
+        # the copy (the copied seq field, read first) and still is after it. A
+        # slot the producer lapped mid-copy has a newer (or zero) seq afterwards,
+        # so an old seq paired with a new payload is dropped.
+        expected = np.arange(start + 1, end + 1, dtype="u8")
+        after = self.seq_col[expected & np.uint64(self.mask)]
+        good = (out["seq"] == expected) & (after == expected)
+        if not good.all():
+            lapped = int(np.flatnonzero(~good)[-1]) + 1
+            self._overrun(lapped)
+            out = out[lapped:]
+        self.cursor = end
+        self.position[READER_SEQ] = end
+        return out
+
+    def _overrun(self, lost):
+        self.overruns += 1
+        self.lost += lost
+
+    def close(self):
+        self.position[:] = 0
+        del self.header, self.readers, self.position, self.names, self.records, self.seq_col
+        self.shm.close()
+
+
+def follow(reader, interval=0.001):
+    """Blocking generator of record batches, for thread/process consumers."""
+    while True:
+        batch = reader.poll()
+        if len(batch):
+            yield batch
+        else:
+            time.sleep(interval)
+
+
+if __name__ == "__main__":
+    # Quick monitor: python tick_bus.py  (while ingest.py publishes)
+    reader = TickBusReader()
+    last = time.time()
+    count = 0
+    for batch in follow(reader):
+        count += len(batch)
+        now = time.time()
+        if now - last >= 1:
+            print(f"🚌 {count / (now - last):,.0f} ticks/s | overruns={reader.overruns} lost={reader.lost}", flush=True)
+            count, last = 0, now
@@ -0,0 +1,68 @@
+class TimerWheel:
+    """Hashed timing wheel keyed by instrument id (or any hashable).
+
+    ``schedule`` is O(1) and replaces the key's previous deadline (the old
+    entry is dropped lazily when its slot comes round); ``advance(now)``
+    only visits the slots that elapsed since the last call, so its cost is
+    proportional to elapsed time plus timers actually due, not to the
+    number of keys being tracked. Deadlines further out than one rotation
+    (``resolution * slots`` seconds) simply stay in their slot for another
+    lap.
+    """
+
+    __slots__ = ("resolution", "n_slots", "slots", "deadlines", "cursor")
+
+    def __init__(self, resolution=0.05, slots=512):
+        self.resolution = resolution
+        self.n_slots = slots
+        self.slots = [[] for _ in range(slots)]
+        self.deadlines = {}     # key -> current deadline
+        self.cursor = None      # last slot tick processed
+
+    def __len__(self):
+        return len(self.deadlines)
+
+    def __contains__(self, key):
+        return key in self.deadlines
+
+    def schedule(self, key, when):
+        self.deadlines[key] = when
+        t = int(when / self.resolution)
+        if self.cursor is not None and t <= self.cursor:
+            t = self.cursor + 1         # already-passed slot: fire on the next advance
+        self.slots[t % self.n_slots].append((when, key))
+
+    def cancel(self, key):
+        return self.deadlines.pop(key, None) is not None
+
+    def deadline(self, key):
+        return self.deadlines.get(key)
+
+    def advance(self, now):
+        """Keys whose deadline is ≤ ``now``, each reported once."""
+        t_now = int(now / self.resolution)
+        if self.cursor is None:
+            self.cursor = t_now - self.n_slots
+        steps = min(t_now - self.cursor, self.n_slots)
+        if steps <= 0:
+            return []
+        due = []
+        deadlines = self.deadlines
+        for t in range(t_now - steps + 1, t_now + 1):
+            i = t % self.n_slots
+            slot = self.slots[i]
+            if not slot:
+                continue
+            keep = []
+            for entry in slot:
+                when, key = entry
+                if deadlines.get(key) != when:
+                    continue            # cancelled or rescheduled
+                if when <= now:
+                    del deadlines[key]
+                    due.append(key)
+                else:
+                    keep.append(entry)  # a later lap
+            self.slots[i] = keep
+        self.cursor = t_now - 1     # the current slot may still hold later deadlines
+        return due
@@ -0,0 +1,266 @@
+"""One entry point for the live feed: detectors, thresholds and sinks come from flags.
+
+    python upstox_paper.py run surge --window 3 --min-value 1e5 --sink rabbitmq
+    python upstox_paper.py run surge oi bars --no-coalesce --sink print
+    python upstox_paper.py run --preset gemini3
+    python upstox_paper.py run orderflow --mode full_d30 --dry-run
+    python upstox_paper.py list
+
+Stands in for the gemini*.py forks: ``--preset gemini..gemini5`` sets the
+window / threshold / sink / coalescing each of them hard-coded, and any
+other flag overrides it. Feed, decode and sink stages are ingest.py's
+(UpstoxSession with reconnects, one Decoder, Pipeline, RabbitMQSink); the
+watch list is read once from atm_option_table.csv (--keys) and interned in
+one InstrumentRegistry. Only the modules of the detectors and sinks asked
+for are imported (pika only once the RabbitMQ sink connects), and ``list``
+/ ``--help`` import nothing from the feed at all. ``--dry-run`` builds the
+pipeline, prints it with the import cost and exits; stages that open files or
+shared memory (oi-store, recorder, tick-bus) are left out of it.
+"""
+import argparse
+import os
+import sys
+import time
+
+# =========================================================
+# CONFIG
+# =========================================================
+DEFAULTS = {
+    "window": 3.0, "check_interval": 0.5, "min_value": 1e5, "absorption_move": 0.05,
+    "sinks": ["print"], "coalesce": True, "cooldown": None, "hysteresis": None,
+}
+# The gemini*.py forks, as flags (the scripts themselves are unchanged)
+PRESETS = {
+    "gemini": {"window": 3.0, "check_interval": 3.0, "min_value": 2e5, "absorption_move": 0.05,
+               "sinks": ["print"], "coalesce": False},
+    "gemini2": {"window": 3.0, "check_interval": 3.0, "min_value": 2e5, "absorption_move": 0.05,
+                "sinks": ["print"], "coalesce": False},
+    "gemini3": {"window": 5.0, "check_interval": 0.5, "min_value": 1e5, "absorption_move": 0.00001,
+                "sinks": ["print"], "coalesce": False},
+    "gemini4": {"window": 3.0, "check_interval": 0.5, "min_value": 1e5, "absorption_move": 0.00001,
+                "sinks": ["print", "rabbitmq"], "coalesce": False},
+    "gemini5": {"window": 3.0, "check_interval": 0.5, "min_value": 1e5, "absorption_move": 0.00001,
+                "sinks": ["print", "rabbitmq"], "coalesce": True, "cooldown": 5.0, "hysteresis": 0.5},
+}
+SINKS = ("print", "rabbitmq", "none")
+# stages that create something outside the process when built; --dry-run leaves them out
+OPENS = {"oi-store": "oi_store.sqlite", "recorder": "ticks/<day>/", "tick-bus": "a shared-memory segment"}
+MODES = ("ltpc", "option_greeks", "full", "full_d30")
+
+
+# =========================================================
+# DETECTORS (each builder imports its own module)
+# =========================================================
+def _surge(cfg, ctx):
+    from detectors import EnergySurgeDetector
+    return EnergySurgeDetector(cfg.window, cfg.check_interval, cfg.min_value, cfg.absorption_move)
+
+
+def _oi(cfg, ctx):
+    from detectors import OiIncreaseDetector
+    return OiIncreaseDetector()
+
+
+def _bars(cfg, ctx):
+    from detectors import BarBuilder
+    return BarBuilder()
+
+
+def _atm(cfg, ctx):
+    from detectors import AtmChangeLogger
+    return AtmChangeLogger(ctx["option_map"], ctx["underlying_info"])
+
+
+def _orderflow(cfg, ctx):
+    from orderflow import OrderFlowDetector
+    return OrderFlowDetector(depth=30 if cfg.mode == "full_d30" else 5)
+
+
+def _oi_store(cfg, ctx):
+    from oi_store import OiStore
+    return OiStore()
+
+
+def _recorder(cfg, ctx):
+    from recorder import TickRecorder
+    return TickRecorder()
+
+
+def _tick_bus(cfg, ctx):
+    from tick_bus import TickBusPublisher, TickBusWriter
+    return TickBusPublisher(TickBusWriter(registry=ctx["registry"]))
+
+
+def _paper(cfg, ctx):
+    from paper_engine import PaperEngine
+    return PaperEngine(report_interval=30)
+
+
+DETECTORS = {
+    "surge": (_surge, "energy surge: traded value over --window ≥ --min-value (the gemini*.py rule)"),
+    "oi": (_oi, "OI increase per option (STORING_OI_VALUES.py)"),
+    "bars": (_bars, "1-minute OHLCV bars"),
+    "atm": (_atm, "ATM strike changes; also subscribes every underlying in companies_only.csv"),
+    "orderflow": (_orderflow, "aggressor side / book imbalance from depth; needs --mode full or full_d30"),
+    "oi-store": (_oi_store, "per-minute OI/volume/value into oi_store.sqlite"),
+    "recorder": (_recorder, "ticks to ticks/YYYY-MM-DD/ for backtest.py"),
+    "tick-bus": (_tick_bus, "mirror ticks into shared memory (tick_bus.TickBusReader)"),
+    "paper": (_paper, "paper order simulator (paper_engine.py)"),
+    "trader": (None, "alerts → paper orders (auto_trader.py); adds paper"),
+}
+
+
+# =========================================================
+# CONFIG RESOLUTION: defaults < --preset < flags
+# =========================================================
+def resolve(args):
+    cfg = dict(DEFAULTS)
+    if args.preset:
+        cfg.update(PRESETS[args.preset])
+    for name in DEFAULTS:
+        value = getattr(args, name, None)
+        if value is not None:
+            cfg[name] = value
+    detectors = list(dict.fromkeys(args.detectors or ["surge"]))
+    unknown = [d for d in detectors if d not in DETECTORS]
+    if unknown:
+        sys.exit(f"unknown detector(s) {', '.join(unknown)}; python upstox_paper.py list")
+    if "trader" in detectors and "paper" not in detectors:
+        detectors.insert(detectors.index("trader"), "paper")
+    cfg["detectors"] = detectors
+    cfg["sinks"] = [] if "none" in cfg["sinks"] else list(dict.fromkeys(cfg["sinks"]))
+    cfg["mode"] = args.mode or ("full" if "orderflow" in detectors else "option_greeks")
+    if "orderflow" in detectors and not cfg["mode"].startswith("full"):
+        sys.exit("orderflow needs depth: --mode full or --mode full_d30")
+    for name in ("plan", "backfill", "queue", "keys", "companies", "metrics", "dry_run"):
+        cfg[name] = getattr(args, name)
+    return argparse.Namespace(**cfg)
+
+
+# =========================================================
+# PIPELINE
+# =========================================================
+def build(cfg):
+    """Pipeline, subscribed keys and the RabbitMQ sink (or None) for a resolved config."""
+    from instruments import InstrumentRegistry, load_instrument_map, load_option_map, load_watch_keys
+    from pipeline import Pipeline
+
+    keys = load_watch_keys(cfg.keys)
+    option_map, underlying_info = load_option_map(cfg.companies) if "atm" in cfg.detectors else ({}, {})
+    keys = keys + sorted(set(option_map) - set(keys))
+    pipeline = Pipeline(InstrumentRegistry(keys, load_instrument_map(keys, cfg.companies)))
+    ctx = {"registry": pipeline.registry, "option_map": option_map, "underlying_info": underlying_info}
+
+    engine = None
+    for name in cfg.detectors:
+        builder = DETECTORS[name][0]
+        if builder is not None and not (cfg.dry_run and name in OPENS):
+            detector = pipeline.register(builder(cfg, ctx))
+            if name == "paper":
+                engine = detector
+
+    pipeline.alerts = pipeline
+    if cfg.coalesce:
+        from coalescer import AlertCoalescer
+        options = {k: v for k, v in (("cooldown", cfg.cooldown), ("hysteresis", cfg.hysteresis)) if v is not None}
+        pipeline.alerts = pipeline.add_sink(AlertCoalescer(**options))
+    mq_sink = None
+    if "print" in cfg.sinks:
+        from sinks import print_sink
+        pipeline.alerts.add_sink(print_sink)
+    if "rabbitmq" in cfg.sinks:
+        from sinks import RabbitMQSink
+        mq_sink = pipeline.alerts.add_sink(RabbitMQSink(queue_name=cfg.queue))
+    if "trader" in cfg.detectors:
+        from auto_trader import AutoTrader
+        pipeline.trader = pipeline.add_sink(AutoTrader(engine))
+    return pipeline, keys, mq_sink
+
+
+def describe(cfg, pipeline, keys):
+    names = ", ".join(d.name for d in pipeline.detectors)
+    alerts = "coalesced" if pipeline.alerts is not pipeline else "raw"
+    print(f"🧩 {len(keys)} keys, mode {cfg.mode}{' (planned)' if cfg.plan else ''} → [{names}] → "
+          f"{alerts} alerts → {', '.join(cfg.sinks) or 'no sink'}", flush=True)
+    if cfg.dry_run:
+        for name in (n for n in cfg.detectors if n in OPENS):
+            print(f"🧩 {name}: not built on a dry run (it opens {OPENS[name]})", flush=True)
+    if "surge" in cfg.detectors:
+        print(f"🧩 surge: window {cfg.window:g}s, min value ₹{cfg.min_value:,.0f}, "
+              f"move {cfg.absorption_move:g}, sweep {cfg.check_interval:g}s", flush=True)
+
+
+def run(args):
+    cfg = resolve(args)
+    if cfg.metrics:
+        os.environ["METRICS"] = "1"     # read when metrics.py is first imported
+    t0 = time.perf_counter()
+    pipeline, keys, mq_sink = build(cfg)
+    describe(cfg, pipeline, keys)
+    if cfg.dry_run:
+        heavy = sorted(m for m in ("pandas", "numpy", "pika", "aiohttp", "websockets", "requests") if m in sys.modules)
+        print(f"🧩 built in {(time.perf_counter() - t0) * 1e3:.0f} ms, {len(sys.modules)} modules loaded "
+              f"({', '.join(heavy) or 'none of the heavy ones'})", flush=True)
+        return
+    if not keys:
+        print("no instrument keys")
+        return
+
+    import asyncio
+
+    import ingest
+    import metrics
+    import profiler
+
+    metrics.start()
+    profiler.install()
+    try:
+        asyncio.run(ingest.fetch_market_data(pipeline, keys, mq_sink, mode=cfg.mode,
+                                             plan=cfg.plan, backfill=cfg.backfill))
+    except KeyboardInterrupt:
+        print("\n👋 stopped", flush=True)
+
+
+def list_detectors():
+    print("detectors (python upstox_paper.py run NAME [NAME ...]):")
+    for name, (_, text) in DETECTORS.items():
+        print(f"  {name:<10} {text}")
+    print("presets (--preset NAME; flags override):")
+    for name, p in PRESETS.items():
+        print(f"  {name:<10} window {p['window']:g}s, min value ₹{p['min_value']:,.0f}, "
+              f"sinks {'+'.join(p['sinks'])}{', coalesced' if p['coalesce'] else ''}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Upstox paper-trading feed: one websocket, chosen detectors and sinks")
+    commands = parser.add_subparsers(dest="command", required=True)
+    r = commands.add_parser("run", help="stream the watch list through the chosen detectors")
+    r.add_argument("detectors", nargs="*", metavar="DETECTOR", help="see `list` (default: surge)")
+    r.add_argument("--preset", choices=sorted(PRESETS), help="settings of one of the gemini*.py scripts")
+    r.add_argument("--window", type=float, help="surge window in seconds")
+    r.add_argument("--check-interval", type=float, help="surge idle-window sweep in seconds")
+    r.add_argument("--min-value", type=float, help="traded value (₹) within the window that counts as a surge")
+    r.add_argument("--absorption-move", type=float, help="price move below which a surge is absorption")
+    r.add_argument("--sink", dest="sinks", action="append", choices=SINKS, help="repeatable (default: print)")
+    r.add_argument("--queue", default="insider_alerts", help="RabbitMQ queue")
+    r.add_argument("--coalesce", dest="coalesce", action="store_true", default=None)
+    r.add_argument("--no-coalesce", dest="coalesce", action="store_false")
+    r.add_argument("--cooldown", type=float, help="seconds of quiet before a coalesced alert is final")
+    r.add_argument("--hysteresis", type=float, help="value growth that republishes a coalesced alert")
+    r.add_argument("--mode", choices=MODES, help="feed mode for options (default option_greeks, full for orderflow)")
+    r.add_argument("--no-plan", dest="plan", action="store_false", help="subscribe every key in --mode")
+    r.add_argument("--no-backfill", dest="backfill", action="store_false")
+    r.add_argument("--keys", default="atm_option_table.csv", help="watch list (GETTING_ATM+2_ATM-2.py output)")
+    r.add_argument("--companies", default="companies_only.csv")
+    r.add_argument("--metrics", action="store_true", help="same as METRICS=1")
+    r.add_argument("--dry-run", action="store_true", help="build and print the pipeline, don't connect")
+    commands.add_parser("list", help="detectors and presets")
+    args = parser.parse_args(argv)
+    if args.command == "list":
+        list_detectors()
+    else:
+        run(args)
+
+
+if __name__ == "__main__":
+    main()